@@ -7,9 +7,18 @@ import base64
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import get_config
 from models.base import db
 from services.crypto_service import init_crypto_service
+from services.audit_sink import init_audit_sink
+from services.metrics import init_metrics
+from services.sri_service import init_cola_sri
+from services.qr_service import init_qr_service
+from services.almacen_xml import init_almacen_xml
+from services.verificacion_publica import init_verificacion_publica
+from services.token_verificacion import init_tokens_verificacion
+from services.pool_bd import init_pool_bd, estadisticas_pool
 
 # Importar blueprints
 from routes.auth_routes import auth_bp
@@ -40,9 +49,23 @@ def create_app(config_name=None):
         config_class = get_config()
         app.config.from_object(config_class)
     
+    # La ventana Merkle se espera dentro de la transacción de la factura: con
+    # numeración sin huecos la fila del contador queda bloqueada mientras tanto
+    # y las facturas concurrentes nunca comparten raíz
+    if app.config.get('FIRMA_MERKLE') and app.config.get('FACTURA_BLOQUE_SECUENCIAL', 1) == 1:
+        raise ValueError("FIRMA_MERKLE requiere FACTURA_BLOQUE_SECUENCIAL > 1 "
+                         "(con 1 la espera de la ventana retiene el bloqueo del secuencial)")
+    
+    # ✅ IP real del cliente detrás de un proxy inverso (límite por IP de la verificación)
+    if app.config.get('PROXY_X_FOR'):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_X_FOR'])
+    
     # ✅ Inicializar base de datos
     db.init_app(app)
     
+    # ✅ Límite de tiempo por consulta en cada conexión del pool
+    init_pool_bd(app)
+    
     # ✅ Configurar CORS correctamente
     CORS(app,
          origins=app.config['CORS_ORIGINS'],
@@ -66,6 +89,27 @@ def create_app(config_name=None):
         except Exception as e:
             print(f"❌ Error inicializando CryptoService: {str(e)}")
     
+    # ✅ Inicializar escritor de auditoría por lotes
+    init_audit_sink(app)
+    
+    # ✅ Métricas en proceso (/metrics)
+    init_metrics(app)
+    
+    # ✅ Cola de autorización SRI (worker en segundo plano)
+    init_cola_sri(app)
+    
+    # ✅ QR de verificación bajo demanda (caché LRU)
+    init_qr_service(app)
+    
+    # ✅ Almacén de XML firmados comprimidos
+    init_almacen_xml(app)
+    
+    # ✅ Caché y limitador de la verificación pública (QR)
+    init_verificacion_publica(app)
+    
+    # ✅ Tokens firmados en el QR (verificación sin BD)
+    init_tokens_verificacion(app)
+    
     # ✅ Registrar blueprints con prefijos correctos
     app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
     app.register_blueprint(user_bp, url_prefix='/api/v1/users')
@@ -77,7 +121,10 @@ def create_app(config_name=None):
     print("   - /api/v1/users (CRUD usuarios - solo ADMIN)")
     print("   - /api/v1/clientes (CRUD clientes)")
     print("   - /api/v1/facturas (Facturas con RSA, QR y SRI)")
+    print("   - /api/v1/facturas/:id/qr (QR bajo demanda en SVG o PNG)")
     print("   - /api/v1/facturas/verificar/:hash (Verificación pública de QR)")
+    print("   - /api/v1/facturas/verificar-token/:token (Verificación del QR sin BD)")
+    print("   - /metrics (Métricas en formato Prometheus)")
     
     # ========================================================================
     # MANEJADORES DE ERRORES JWT
@@ -136,9 +183,11 @@ def create_app(config_name=None):
     @app.route('/health')
     def health():
         """Endpoint de salud para monitoreo"""
+        # Estado del pool antes de tomar la conexión del propio health check
+        pool = estadisticas_pool()
         try:
             # Verificar conexión a BD
-            db.session.execute('SELECT 1')
+            db.session.execute(db.text('SELECT 1'))
             db_status = 'connected'
         except Exception as e:
             print(f"❌ Error en health check: {str(e)}")
@@ -147,7 +196,8 @@ def create_app(config_name=None):
         return jsonify({
             'success': True,
             'status': 'healthy',
-            'database': db_status
+            'database': db_status,
+            'pool': pool
         })
     
     # ========================================================================
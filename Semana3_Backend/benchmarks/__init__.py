@@ -0,0 +1,3 @@
+"""
+Benchmarks del backend (ejecutar desde Semana3_Backend con python -m benchmarks.<modulo>)
+"""
@@ -0,0 +1,81 @@
+"""
+Benchmark: algoritmos de firma de facturas
+Firmas y verificaciones por segundo (un núcleo) de RSA-2048 PSS, ECDSA
+P-256 y Ed25519 sobre el hash hex de una factura, como en _firmar_hash.
+
+Uso:
+    python -m benchmarks.firmas
+    python -m benchmarks.firmas --segundos 2
+"""
+import argparse
+import hashlib
+import time
+
+from cryptography.hazmat.primitives import serialization
+
+from services.firmantes import FIRMANTES
+
+
+def _por_segundo(funcion, segundos):
+    """Operaciones por segundo ejecutando funcion durante ~segundos"""
+    operaciones = 0
+    inicio = time.perf_counter()
+    limite = inicio + segundos
+    while True:
+        for _ in range(20):
+            funcion()
+        operaciones += 20
+        ahora = time.perf_counter()
+        if ahora >= limite:
+            return operaciones / (ahora - inicio)
+
+
+def ejecutar(segundos):
+    """
+    Ejecutar el benchmark
+
+    Returns:
+        list: Un dict por algoritmo con firmas/s, verificaciones/s,
+              bytes de firma y ms para generar la clave
+    """
+    datos = hashlib.sha256(b'factura').hexdigest().encode('utf-8')
+    resultados = []
+    for algoritmo, firmante in FIRMANTES.items():
+        inicio = time.perf_counter()
+        private_pem, public_pem = firmante.generar_par_claves()
+        generar = time.perf_counter() - inicio
+
+        privada = serialization.load_pem_private_key(private_pem.encode('utf-8'), password=None)
+        publica = serialization.load_pem_public_key(public_pem.encode('utf-8'))
+        firma = firmante.firmar(privada, datos)
+
+        resultados.append({
+            'algoritmo': algoritmo,
+            'firmas': _por_segundo(lambda: firmante.firmar(privada, datos), segundos),
+            'verificaciones': _por_segundo(lambda: firmante.verificar(publica, firma, datos), segundos),
+            'bytes_firma': len(firma),
+            'generar_ms': generar * 1000
+        })
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de algoritmos de firma')
+    parser.add_argument('--segundos', type=float, default=1.0, help='Duración de cada medición')
+    args = parser.parse_args()
+
+    resultados = ejecutar(args.segundos)
+
+    print("=" * 82)
+    print(f"{'Algoritmo':<12} {'Firmas/s':>10} {'vs RSA':>8} {'Verif./s':>10} {'vs RSA':>8} "
+          f"{'Bytes firma':>12} {'Generar (ms)':>13}")
+    print("=" * 82)
+    rsa = next(r for r in resultados if r['algoritmo'] == 'rsa')
+    for r in resultados:
+        print(f"{r['algoritmo']:<12} {r['firmas']:>10.0f} {r['firmas'] / rsa['firmas']:>7.1f}x "
+              f"{r['verificaciones']:>10.0f} {r['verificaciones'] / rsa['verificaciones']:>7.1f}x "
+              f"{r['bytes_firma']:>12} {r['generar_ms']:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+"""
+Benchmark: suite de micro-benchmarks de CryptoService y FacturaService
+Mide AES-GCM (cifrar, descifrar, descifrado en lote de clientes), firma y
+verificación RSA, SHA-256 y QR, y de FacturaService calcular_totales,
+generar_xml_factura, firmar_xml y _generar_clave_acceso. Los casos se
+parametrizan por cantidad de items (factura) y de registros (clientes).
+
+Cada caso se repite varias veces con timeit (autorange) y se reporta la
+mediana por operación. Los resultados se guardan en JSON con el commit y el
+entorno, y el modo comparar marca regresiones por encima de un umbral
+(código de salida 1, para usarlo en CI).
+
+Uso:
+    python -m benchmarks.suite --salida base.json
+    python -m benchmarks.suite --items 1 10 100 --registros 1 100 1000 --salida nuevo.json
+    python -m benchmarks.suite --comparar base.json --umbral 10
+    python -m benchmarks.suite --comparar base.json --resultados nuevo.json
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from datetime import datetime
+
+from models.cliente import Cliente
+from services.crypto_service import CryptoService
+from services.factura_service import FacturaService
+
+
+FACTURA_DATA = {
+    'numero_factura': '001-001-000000001',
+    'fecha_emision': datetime(2025, 1, 15, 10, 30),
+    'subtotal': 100.0,
+    'iva': 15.0,
+    'total': 115.0,
+    'empresa_ruc': '1234567890001',
+    'empresa_razon_social': 'Sistema de Facturación Electrónica S.A.'
+}
+
+DATOS_CLIENTE = 'Ana María|Pérez Gómez|Av. Amazonas N24-03 y Colón, Quito|0991234567|ana.perez@correo.ec'
+
+VERSION_FORMATO = 1
+
+
+# ============================================================================
+# CASOS
+# ============================================================================
+
+def _items(cantidad):
+    return [
+        {'producto_id': i, 'codigo': f'P{i:05d}', 'nombre': f'Producto de prueba {i}',
+         'cantidad': (i % 7) + 1, 'precio_unitario': 1.25 + (i % 50), 'iva_porcentaje': 15}
+        for i in range(cantidad)
+    ]
+
+
+def _cliente_cifrado(crypto, indice=0):
+    """Cliente en memoria (sin BD) cifrado igual que en cliente_routes"""
+    cifrado = crypto.cifrar_aes_gcm(DATOS_CLIENTE)
+    return Cliente(
+        id=indice + 1, tipo_identificacion='CEDULA', identificacion=f'17{indice:08d}',
+        nombres_enc=cifrado['ciphertext'], apellidos_enc=b'', direccion_enc=b'',
+        telefono_enc=b'', email_enc=b'', iv=cifrado['iv'], tag=cifrado['tag'], activo=True
+    )
+
+
+def construir_casos(cantidades_items, cantidades_registros):
+    """
+    Casos del benchmark
+
+    Returns:
+        list: tuplas (nombre, parametros, funcion sin argumentos)
+    """
+    crypto = CryptoService(base64.b64encode(os.urandom(32)).decode('ascii'))
+    private_pem, public_pem = crypto.generar_par_claves_rsa()
+    mensaje = 'a' * 64  # Hash hex de una factura, lo que se firma
+    firma = crypto.firmar_rsa(mensaje, private_pem)
+    cifrado = crypto.cifrar_aes_gcm(DATOS_CLIENTE)
+
+    servicio = FacturaService.sin_bd({'private_key': private_pem, 'public_key': public_pem})
+    servicio.crypto_service = crypto
+
+    casos = [
+        ('aes_cifrar', {}, lambda: crypto.cifrar_aes_gcm(DATOS_CLIENTE)),
+        ('aes_descifrar', {}, lambda: crypto.descifrar_aes_gcm(
+            cifrado['iv'], cifrado['ciphertext'], cifrado['tag'])),
+        ('rsa_firmar', {}, lambda: crypto.firmar_rsa(mensaje, private_pem)),
+        ('rsa_verificar', {}, lambda: crypto.verificar_firma_rsa(mensaje, firma, public_pem)),
+        ('sha256', {}, lambda: crypto.calcular_hash_sha256(
+            {**FACTURA_DATA, 'fecha_emision': FACTURA_DATA['fecha_emision'].isoformat()})),
+        ('qr_png', {}, lambda: crypto.generar_qr(
+            'http://localhost:5173/verificar/' + 'a' * 64)),
+        ('clave_acceso', {}, lambda: servicio._generar_clave_acceso(FACTURA_DATA)),
+    ]
+
+    for registros in cantidades_registros:
+        clientes = [_cliente_cifrado(crypto, i) for i in range(registros)]
+        casos.append(('decrypt_clientes', {'registros': registros},
+                      lambda clientes=clientes: crypto.decrypt_clientes(clientes)))
+
+    cliente = _cliente_cifrado(crypto)
+    for cantidad in cantidades_items:
+        items = _items(cantidad)
+        casos.append(('calcular_totales', {'items': cantidad},
+                      lambda items=items: servicio.calcular_totales(items)))
+        casos.append(('generar_xml_factura', {'items': cantidad},
+                      lambda items=items: servicio.generar_xml_factura(FACTURA_DATA, cliente, items)))
+        casos.append(('firmar_xml', {'items': cantidad},
+                      lambda items=items: servicio.firmar_xml(
+                          servicio.generar_xml_factura(FACTURA_DATA, cliente, items))))
+    return casos
+
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+
+def medir(funcion, repeticiones, minimo_segundos=0.05):
+    """
+    Tiempo por operación (µs) de funcion
+
+    Calibra el número de llamadas por repetición para que cada una dure al
+    menos minimo_segundos y devuelve mediana, mínimo y dispersión.
+    """
+    temporizador = timeit.Timer(funcion)
+    llamadas = 1
+    while True:
+        if temporizador.timeit(llamadas) >= minimo_segundos:
+            break
+        llamadas *= 2 if llamadas < 1000 else 10
+
+    tiempos = [t / llamadas * 1e6 for t in temporizador.repeat(repeat=repeticiones, number=llamadas)]
+    mediana = statistics.median(tiempos)
+    return {
+        'mediana_us': mediana,
+        'minimo_us': min(tiempos),
+        'desviacion_us': statistics.stdev(tiempos) if len(tiempos) > 1 else 0.0,
+        'ops_s': 1e6 / mediana,
+        'llamadas': llamadas,
+        'repeticiones': repeticiones
+    }
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def entorno():
+    """Commit y máquina de la ejecución (para comparar solo lo comparable)"""
+    return {
+        'commit': _commit_actual(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'procesador': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count()
+    }
+
+
+def ejecutar(cantidades_items, cantidades_registros, repeticiones, filtro=None):
+    """
+    Ejecutar la suite
+
+    Args:
+        filtro: Nombres de casos a ejecutar (None = todos)
+
+    Returns:
+        dict: {'version', 'entorno': {...}, 'resultados': [un dict por caso]}
+    """
+    resultados = []
+    for nombre, parametros, funcion in construir_casos(cantidades_items, cantidades_registros):
+        if filtro and nombre not in filtro:
+            continue
+        resultados.append({'caso': nombre, 'parametros': parametros, **medir(funcion, repeticiones)})
+
+    return {
+        'version': VERSION_FORMATO,
+        'entorno': entorno(),
+        'resultados': resultados
+    }
+
+
+# ============================================================================
+# COMPARACIÓN
+# ============================================================================
+
+def _clave(resultado):
+    parametros = ','.join(f"{k}={v}" for k, v in sorted(resultado['parametros'].items()))
+    return f"{resultado['caso']}[{parametros}]" if parametros else resultado['caso']
+
+
+def comparar(base, nuevo, umbral, metrica='mediana_us'):
+    """
+    Comparar dos ejecuciones por una métrica de tiempo (menor es mejor)
+
+    Args:
+        base, nuevo: dicts devueltos por ejecutar (o leídos del JSON)
+        umbral: Fracción de empeoramiento tolerada (0.10 = 10%)
+        metrica: Campo de cada resultado a comparar (p. ej. 'p95_ms' en benchmarks.carga)
+
+    Returns:
+        list: Un dict por caso presente en ambas con base, nuevo,
+              cambio (fracción, positivo = más lento) y estado
+              ('REGRESION', 'MEJORA' o 'OK')
+    """
+    anteriores = {_clave(r): r for r in base['resultados']}
+    filas = []
+    for resultado in nuevo['resultados']:
+        anterior = anteriores.get(_clave(resultado))
+        if anterior is None:
+            continue
+        if not anterior.get(metrica) or resultado.get(metrica) is None:
+            continue
+        cambio = resultado[metrica] / anterior[metrica] - 1
+        if cambio > umbral:
+            estado = 'REGRESION'
+        elif cambio < -umbral:
+            estado = 'MEJORA'
+        else:
+            estado = 'OK'
+        filas.append({
+            'clave': _clave(resultado),
+            'base': anterior[metrica],
+            'nuevo': resultado[metrica],
+            'cambio': cambio,
+            'estado': estado
+        })
+    return filas
+
+
+def _imprimir_resultados(ejecucion):
+    print("=" * 78)
+    print(f"{'Caso':<36} {'Mediana (µs)':>13} {'Mínimo (µs)':>12} {'±':>6} {'Ops/s':>8}")
+    print("=" * 78)
+    for r in ejecucion['resultados']:
+        dispersion = r['desviacion_us'] / r['mediana_us'] * 100
+        print(f"{_clave(r):<36} {r['mediana_us']:>13.2f} {r['minimo_us']:>12.2f} "
+              f"{dispersion:>5.1f}% {r['ops_s']:>8.0f}")
+
+
+def imprimir_comparacion(filas, base, nuevo, umbral, unidad='µs'):
+    print()
+    print(f"Comparación {base['entorno'].get('commit')} → {nuevo['entorno'].get('commit')} "
+          f"(umbral {umbral * 100:.0f}%)")
+    print("=" * 78)
+    print(f"{'Caso':<36} {f'Base ({unidad})':>11} {f'Nuevo ({unidad})':>11} {'Cambio':>8}  {'Estado':<9}")
+    print("=" * 78)
+    for f in filas:
+        marca = '❌ ' if f['estado'] == 'REGRESION' else ('✅ ' if f['estado'] == 'MEJORA' else '')
+        print(f"{f['clave']:<36} {f['base']:>11.2f} {f['nuevo']:>11.2f} "
+              f"{f['cambio'] * 100:>+7.1f}%  {marca}{f['estado']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks de CryptoService y FacturaService')
+    parser.add_argument('--items', type=int, nargs='+', default=[1, 10, 100, 1000],
+                        help='Cantidades de items por factura')
+    parser.add_argument('--registros', type=int, nargs='+', default=[1, 100, 1000],
+                        help='Cantidades de clientes para el descifrado en lote')
+    parser.add_argument('--repeticiones', type=int, default=7)
+    parser.add_argument('--casos', nargs='+', help='Ejecutar solo estos casos')
+    parser.add_argument('--salida', help='Guardar los resultados en este archivo JSON')
+    parser.add_argument('--comparar', metavar='BASE_JSON', help='Comparar contra una ejecución anterior')
+    parser.add_argument('--resultados', metavar='NUEVO_JSON',
+                        help='Con --comparar: usar este JSON en vez de ejecutar la suite')
+    parser.add_argument('--umbral', type=float, default=10.0,
+                        help='Porcentaje de empeoramiento que cuenta como regresión')
+    args = parser.parse_args()
+
+    if args.resultados:
+        with open(args.resultados, encoding='utf-8') as archivo:
+            nuevo = json.load(archivo)
+    else:
+        nuevo = ejecutar(args.items, args.registros, args.repeticiones, args.casos)
+        _imprimir_resultados(nuevo)
+        if args.salida:
+            with open(args.salida, 'w', encoding='utf-8') as archivo:
+                json.dump(nuevo, archivo, indent=2, ensure_ascii=False)
+            print(f"💾 Resultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+        umbral = args.umbral / 100
+        filas = comparar(base, nuevo, umbral)
+        imprimir_comparacion(filas, base, nuevo, umbral)
+        regresiones = [f for f in filas if f['estado'] == 'REGRESION']
+        if regresiones:
+            print(f"❌ {len(regresiones)} regresión(es) por encima del {args.umbral:.0f}%")
+            sys.exit(1)
+        print("✅ Sin regresiones")
+
+
+if __name__ == '__main__':
+    main()
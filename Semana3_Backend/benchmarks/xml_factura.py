@@ -0,0 +1,193 @@
+"""
+Benchmark: generación del XML de factura
+Compara el constructor anterior (SubElement por nodo + pretty print) con la
+plantilla precompilada (modo árbol) y la escritura en streaming, para
+facturas de 10, 1.000 y 10.000 detalles. La firma RSA se excluye (costo
+constante por factura) para medir solo construcción, hash y serialización.
+
+Uso:
+    python -m benchmarks.xml_factura
+    python -m benchmarks.xml_factura --items 10 1000 10000 --repeticiones 5
+"""
+import argparse
+import hashlib
+import time
+from datetime import datetime
+from decimal import Decimal
+from lxml import etree
+
+from services.factura_service import FacturaService
+from services.xml_factura import FacturaStreaming, NS_DS
+
+
+FACTURA_DATA = {
+    'numero_factura': '001-001-000000001',
+    'fecha_emision': datetime(2025, 1, 15, 10, 30),
+    'subtotal': 100.0,
+    'iva': 15.0,
+    'total': 115.0,
+    'empresa_ruc': '1234567890001',
+    'empresa_razon_social': 'Sistema de Facturación Electrónica S.A.'
+}
+
+CLIENTE_DATOS = {
+    'tipo_identificacion': 'CEDULA',
+    'identificacion': '1712345678',
+    'nombres': 'Ana',
+    'apellidos': 'Pérez',
+    'direccion': 'Av. Amazonas N24-03'
+}
+
+FIRMA_FICTICIA = 'A' * 344  # Largo de una firma RSA-2048 en base64
+
+
+def construir_xml_anterior(servicio, factura_data, cliente_datos, items):
+    """Constructor anterior a la plantilla: un SubElement por nodo"""
+    root = etree.Element("factura", version="1.0.0")
+
+    info_tributaria = etree.SubElement(root, "infoTributaria")
+    etree.SubElement(info_tributaria, "ambiente").text = "1"
+    etree.SubElement(info_tributaria, "tipoEmision").text = "1"
+    etree.SubElement(info_tributaria, "razonSocial").text = factura_data.get('empresa_razon_social', 'Mi Empresa S.A.')
+    etree.SubElement(info_tributaria, "nombreComercial").text = "Mi Empresa"
+    etree.SubElement(info_tributaria, "ruc").text = factura_data.get('empresa_ruc', '1234567890001')
+    etree.SubElement(info_tributaria, "claveAcceso").text = servicio._generar_clave_acceso(factura_data)
+    etree.SubElement(info_tributaria, "codDoc").text = "01"
+    etree.SubElement(info_tributaria, "estab").text = factura_data['numero_factura'].split('-')[0]
+    etree.SubElement(info_tributaria, "ptoEmi").text = factura_data['numero_factura'].split('-')[1]
+    etree.SubElement(info_tributaria, "secuencial").text = factura_data['numero_factura'].split('-')[2]
+    etree.SubElement(info_tributaria, "dirMatriz").text = "Av. Principal 123, Quito"
+
+    info_factura = etree.SubElement(root, "infoFactura")
+    etree.SubElement(info_factura, "fechaEmision").text = factura_data['fecha_emision'].strftime('%d/%m/%Y')
+    etree.SubElement(info_factura, "dirEstablecimiento").text = "Av. Principal 123"
+    etree.SubElement(info_factura, "obligadoContabilidad").text = "SI"
+    etree.SubElement(info_factura, "tipoIdentificacionComprador").text = cliente_datos['tipo_identificacion']
+    etree.SubElement(info_factura, "razonSocialComprador").text = f"{cliente_datos['nombres']} {cliente_datos['apellidos']}"
+    etree.SubElement(info_factura, "identificacionComprador").text = cliente_datos['identificacion']
+    etree.SubElement(info_factura, "direccionComprador").text = cliente_datos['direccion']
+    etree.SubElement(info_factura, "totalSinImpuestos").text = f"{factura_data['subtotal']:.2f}"
+    etree.SubElement(info_factura, "totalDescuento").text = "0.00"
+
+    totales_impuestos = etree.SubElement(info_factura, "totalConImpuestos")
+    total_impuesto = etree.SubElement(totales_impuestos, "totalImpuesto")
+    etree.SubElement(total_impuesto, "codigo").text = "2"
+    etree.SubElement(total_impuesto, "codigoPorcentaje").text = "2"
+    etree.SubElement(total_impuesto, "baseImponible").text = f"{factura_data['subtotal']:.2f}"
+    etree.SubElement(total_impuesto, "valor").text = f"{factura_data['iva']:.2f}"
+
+    etree.SubElement(info_factura, "propina").text = "0.00"
+    etree.SubElement(info_factura, "importeTotal").text = f"{factura_data['total']:.2f}"
+    etree.SubElement(info_factura, "moneda").text = "DOLAR"
+
+    detalles = etree.SubElement(root, "detalles")
+    for idx, item in enumerate(items, 1):
+        detalle = etree.SubElement(detalles, "detalle")
+        etree.SubElement(detalle, "codigoPrincipal").text = item.get('codigo', f"PROD{idx:03d}")
+        etree.SubElement(detalle, "descripcion").text = item['nombre']
+        etree.SubElement(detalle, "cantidad").text = str(item['cantidad'])
+        etree.SubElement(detalle, "precioUnitario").text = f"{item['precio_unitario']:.2f}"
+        etree.SubElement(detalle, "descuento").text = "0.00"
+        subtotal_item = Decimal(str(item['cantidad'])) * Decimal(str(item['precio_unitario']))
+        etree.SubElement(detalle, "precioTotalSinImpuesto").text = f"{subtotal_item:.2f}"
+
+    return root
+
+
+def _firmar_anterior(root):
+    """Pipeline anterior: serializar, hashear, re-parsear, agregar firma, serializar"""
+    xml_content = etree.tostring(root, pretty_print=True, xml_declaration=True, encoding='UTF-8')
+    hash_sha256 = hashlib.sha256(xml_content).hexdigest()
+    root = etree.fromstring(xml_content)
+    signature = etree.SubElement(root, f"{{{NS_DS}}}Signature", nsmap={'ds': NS_DS})
+    etree.SubElement(signature, f"{{{NS_DS}}}SignatureValue").text = FIRMA_FICTICIA
+    etree.SubElement(signature, f"{{{NS_DS}}}DigestValue").text = hash_sha256
+    return etree.tostring(root, pretty_print=True, xml_declaration=True, encoding='UTF-8').decode('utf-8')
+
+
+def _crear_servicio(streaming_min):
+    """Servicio sin BD con la firma RSA sustituida por un valor fijo"""
+    servicio = FacturaService.sin_bd(
+        {'private_key': '', 'public_key': ''},
+        xml_compacto=False,
+        xml_streaming_min=streaming_min
+    )
+    servicio._firmar_hash = lambda hash_sha256: FIRMA_FICTICIA
+    return servicio
+
+
+def _items(cantidad):
+    return [
+        {'codigo': f'P{i:05d}', 'nombre': f'Producto de prueba {i}',
+         'cantidad': (i % 7) + 1, 'precio_unitario': 1.25 + (i % 50)}
+        for i in range(cantidad)
+    ]
+
+
+def _medir(funcion, repeticiones):
+    """Mejor tiempo (s) y tamaño de salida (bytes)"""
+    mejor = float('inf')
+    salida = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        salida = funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, len(salida.encode('utf-8'))
+
+
+def ejecutar(cantidades, repeticiones):
+    """
+    Ejecutar el benchmark
+
+    Returns:
+        list: Un dict por (cantidad de items, variante) con segundos y bytes
+    """
+    servicio_arbol = _crear_servicio(streaming_min=float('inf'))
+    servicio_streaming = _crear_servicio(streaming_min=0)
+
+    variantes = {
+        'anterior': lambda s, items: _firmar_anterior(
+            construir_xml_anterior(s, FACTURA_DATA, CLIENTE_DATOS, items)),
+        'plantilla': lambda s, items: servicio_arbol.firmar_xml(
+            servicio_arbol._construir_xml(FACTURA_DATA, CLIENTE_DATOS, items))['xml_firmado'],
+        'plantilla_compacto': lambda s, items: servicio_arbol.firmar_xml(
+            servicio_arbol._construir_xml(FACTURA_DATA, CLIENTE_DATOS, items), compacto=True)['xml_firmado'],
+        'streaming': lambda s, items: servicio_streaming.firmar_xml(
+            servicio_streaming._construir_xml(FACTURA_DATA, CLIENTE_DATOS, items))['xml_firmado'],
+    }
+    assert isinstance(servicio_streaming._construir_xml(FACTURA_DATA, CLIENTE_DATOS, _items(1)), FacturaStreaming)
+
+    resultados = []
+    for cantidad in cantidades:
+        items = _items(cantidad)
+        # Menos repeticiones para facturas enormes
+        reps = max(1, repeticiones if cantidad < 10000 else repeticiones // 2)
+        for nombre, funcion in variantes.items():
+            segundos, tamano = _medir(lambda: funcion(servicio_arbol, items), reps)
+            resultados.append({'items': cantidad, 'variante': nombre,
+                               'segundos': segundos, 'bytes': tamano})
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de generación de XML de facturas')
+    parser.add_argument('--items', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    resultados = ejecutar(args.items, args.repeticiones)
+
+    print("=" * 70)
+    print(f"{'Items':>8}  {'Variante':<20} {'Tiempo (ms)':>12} {'vs anterior':>12} {'KB':>10}")
+    print("=" * 70)
+    base = {}
+    for r in resultados:
+        if r['variante'] == 'anterior':
+            base[r['items']] = r['segundos']
+        relativo = r['segundos'] / base[r['items']]
+        print(f"{r['items']:>8}  {r['variante']:<20} {r['segundos'] * 1000:>12.3f} "
+              f"{relativo:>11.2f}x {r['bytes'] / 1024:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
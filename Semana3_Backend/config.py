@@ -26,6 +26,24 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
     
+    # Pool de conexiones (por proceso: con gunicorn el total es workers × (tamaño + overflow))
+    DB_POOL_SIZE = config('DB_POOL_SIZE', default=10, cast=int)
+    DB_MAX_OVERFLOW = config('DB_MAX_OVERFLOW', default=20, cast=int)
+    DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=30, cast=int)  # Segundos esperando conexión libre
+    DB_POOL_RECYCLE = config('DB_POOL_RECYCLE', default=1800, cast=int)  # Segundos (-1 = nunca)
+    DB_POOL_PRE_PING = config('DB_POOL_PRE_PING', default=True, cast=bool)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING
+    }
+    # statement_timeout de PostgreSQL en milisegundos (0 = sin límite);
+    # los reportes pesados usan su propio límite (ver services/pool_bd)
+    DB_STATEMENT_TIMEOUT_MS = config('DB_STATEMENT_TIMEOUT_MS', default=0, cast=int)
+    DB_STATEMENT_TIMEOUT_REPORTES_MS = config('DB_STATEMENT_TIMEOUT_REPORTES_MS', default=120000, cast=int)
+    
     # JWT
     JWT_SECRET_KEY = config('JWT_SECRET_KEY', default=SECRET_KEY)
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=8)
@@ -46,6 +64,78 @@ class Config:
     
     # SRI Ecuador
     AMBIENTE_SRI = config('AMBIENTE_SRI', default='PRUEBAS')  # PRUEBAS o PRODUCCION
+    
+    # QR de verificación (se renderiza bajo demanda en /facturas/<id>/qr)
+    QR_URL_BASE = config('QR_URL_BASE', default='http://localhost:5173')  # Frontend de verificación
+    QR_CACHE_TAMANO = config('QR_CACHE_TAMANO', default=512, cast=int)  # Imágenes por proceso
+    QR_TOKEN = config('QR_TOKEN', default=False, cast=bool)  # Token Ed25519 firmado en la URL del QR
+    QR_TOKEN_CLAVES_PUBLICAS = config('QR_TOKEN_CLAVES_PUBLICAS', default='')  # JSON {key_id: PEM} para verificar sin BD
+    
+    # Verificación pública (/facturas/verificar/<hash>): caché por hash y límite por IP
+    VERIFICACION_CACHE_TTL = config('VERIFICACION_CACHE_TTL', default=3600, cast=int)  # AUTORIZADO/RECHAZADO
+    VERIFICACION_CACHE_TTL_PENDIENTE = config('VERIFICACION_CACHE_TTL_PENDIENTE', default=10, cast=int)
+    VERIFICACION_CACHE_TAMANO = config('VERIFICACION_CACHE_TAMANO', default=10000, cast=int)
+    VERIFICACION_TASA = config('VERIFICACION_TASA', default=2.0, cast=float)  # Peticiones/s por IP
+    VERIFICACION_RAFAGA = config('VERIFICACION_RAFAGA', default=20, cast=int)  # Ráfaga permitida por IP
+    # Proxies de confianza delante de la app (nginx, balanceador): la IP del cliente
+    # se toma de X-Forwarded-For saltando ese número de proxies (0 = sin proxy)
+    PROXY_X_FOR = config('PROXY_X_FOR', default=0, cast=int)
+    
+    # Autorización SRI en segundo plano (cola cola_sri)
+    SRI_CLIENTE = config('SRI_CLIENTE', default='simulado')  # simulado o soap
+    SRI_URL_RECEPCION = config(
+        'SRI_URL_RECEPCION',
+        default='https://celcer.sri.gob.ec/comprobantes-electronicos-ws/RecepcionComprobantesOffline'
+    )
+    SRI_URL_AUTORIZACION = config(
+        'SRI_URL_AUTORIZACION',
+        default='https://celcer.sri.gob.ec/comprobantes-electronicos-ws/AutorizacionComprobantesOffline'
+    )
+    SRI_TIMEOUT = config('SRI_TIMEOUT', default=15, cast=int)
+    SRI_WORKER = config('SRI_WORKER', default=True, cast=bool)  # Hilo worker dentro de la app
+    SRI_LOTE = config('SRI_LOTE', default=10, cast=int)
+    SRI_MAX_INTENTOS = config('SRI_MAX_INTENTOS', default=8, cast=int)
+    SRI_BACKOFF_BASE = config('SRI_BACKOFF_BASE', default=5.0, cast=float)  # Segundos
+    SRI_BACKOFF_MAX = config('SRI_BACKOFF_MAX', default=3600.0, cast=float)
+    SRI_INTERVALO = config('SRI_INTERVALO', default=2.0, cast=float)
+    # Lote masivo: con al menos SRI_LOTE_MASIVO_MIN facturas vencidas se envían
+    # varias por llamada (0 = siempre una a una)
+    SRI_LOTE_MASIVO_MIN = config('SRI_LOTE_MASIVO_MIN', default=20, cast=int)
+    SRI_LOTE_MASIVO_MAX = config('SRI_LOTE_MASIVO_MAX', default=50, cast=int)  # Comprobantes por lote
+    SRI_LOTE_MASIVO_BYTES = config('SRI_LOTE_MASIVO_BYTES', default=500000, cast=int)
+    
+    # Algoritmo de la clave de firma activa: rsa, ecdsa-p256 o ed25519
+    # (al cambiarlo se genera una clave nueva; las anteriores siguen verificando)
+    FIRMA_ALGORITMO = config('FIRMA_ALGORITMO', default='rsa')
+    
+    # Numeración de facturas: 1 = sin huecos; >1 = bloques de números reservados por proceso
+    FACTURA_BLOQUE_SECUENCIAL = config('FACTURA_BLOQUE_SECUENCIAL', default=1, cast=int)
+    
+    # XML firmado sin indentación (menos bytes y CPU al serializar)
+    FACTURA_XML_COMPACTO = config('FACTURA_XML_COMPACTO', default=False, cast=bool)
+    # Almacén de XML firmados (tabla documento_xml): gzip o zstd (requiere zstandard)
+    XML_COMPRESION = config('XML_COMPRESION', default='gzip')
+    XML_COMPRESION_NIVEL = config('XML_COMPRESION_NIVEL', default=0, cast=int)  # 0 = por defecto
+    # Facturas con al menos este número de detalles se escriben en streaming
+    FACTURA_XML_STREAMING_MIN = config('FACTURA_XML_STREAMING_MIN', default=1000, cast=int)
+    
+    # Emisión por lotes: procesos para XML/firma/QR (0 = núcleos de CPU, 1 = sin pool)
+    FACTURA_LOTE_WORKERS = config('FACTURA_LOTE_WORKERS', default=0, cast=int)
+    FACTURA_LOTE_MAX = config('FACTURA_LOTE_MAX', default=500, cast=int)
+    FACTURA_LOTE_MIN_PARALELO = config('FACTURA_LOTE_MIN_PARALELO', default=8, cast=int)
+    
+    # Firma por lotes con árbol de Merkle: una firma RSA de la raíz por ventana
+    # (requiere FACTURA_BLOQUE_SECUENCIAL > 1; create_app no arranca con 1)
+    FIRMA_MERKLE = config('FIRMA_MERKLE', default=False, cast=bool)
+    FIRMA_MERKLE_VENTANA_MS = config('FIRMA_MERKLE_VENTANA_MS', default=10, cast=int)  # Espera máxima por factura
+    FIRMA_MERKLE_MAX_HOJAS = config('FIRMA_MERKLE_MAX_HOJAS', default=256, cast=int)  # Facturas por raíz
+    
+    # Auditoría: escritura por lotes en segundo plano
+    AUDIT_ASYNC = config('AUDIT_ASYNC', default=True, cast=bool)
+    AUDIT_LOTE = config('AUDIT_LOTE', default=100, cast=int)  # Eventos por INSERT
+    AUDIT_INTERVALO = config('AUDIT_INTERVALO', default=1.0, cast=float)  # Segundos máx. de espera
+    AUDIT_COLA_MAX = config('AUDIT_COLA_MAX', default=10000, cast=int)
+    AUDIT_POLITICA = config('AUDIT_POLITICA', default='bloquear')  # bloquear, descartar o sincrono
 
 
 class DevelopmentConfig(Config):
@@ -64,6 +154,9 @@ class TestingConfig(Config):
     """Configuración para pruebas"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # SQLite en memoria usa StaticPool (sin tamaño)
+    AUDIT_ASYNC = False
+    SRI_WORKER = False
 
 
 def get_config():
@@ -0,0 +1,120 @@
+"""
+Configuración compartida de las pruebas
+- Tipos exclusivos de PostgreSQL (JSONB, INET) compilados para SQLite
+- Fixtures de app con el esquema creado, de facturas de ejemplo y de un
+  cliente cifrado para emitir facturas reales
+"""
+import itertools
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.dialects.postgresql import JSONB, INET
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from config import TestingConfig
+from models import db, Usuario, Cliente, Factura
+from routes.factura_routes import get_factura_service
+
+
+# Tipos usados por audit_log, para poder crear el esquema en SQLite
+compiles(JSONB, 'sqlite')(lambda tipo, compilador, **kw: 'JSON')
+compiles(INET, 'sqlite')(lambda tipo, compilador, **kw: 'VARCHAR(45)')
+
+
+@pytest.fixture
+def crear_app(tmp_path):
+    """
+    Fábrica de apps de prueba con el esquema creado
+
+    crear_app(en_archivo=True, **config): BD SQLite en tmp_path (necesaria
+    cuando hilos o procesos abren sus propias conexiones); los demás
+    argumentos sobrescriben atributos de TestingConfig
+    """
+    def _crear(en_archivo=False, **configuracion):
+        if en_archivo:
+            configuracion.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'pruebas.db'}")
+        app = create_app(type('ConfigPrueba', (TestingConfig,), configuracion))
+        with app.app_context():
+            db.create_all()
+        return app
+    return _crear
+
+
+@pytest.fixture
+def configuracion_app():
+    """Ajustes de TestingConfig para el fixture app (sobrescribir con parametrize o en el módulo)"""
+    return {}
+
+
+@pytest.fixture
+def app(crear_app, configuracion_app):
+    """App de prueba con su contexto activo durante la prueba"""
+    app = crear_app(**configuracion_app)
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+    # El servicio de facturas guarda las claves de esta BD
+    get_factura_service.__dict__.pop('_service', None)
+
+
+@pytest.fixture
+def crear_factura(app):
+    """
+    Fábrica de facturas de un mismo usuario y cliente (número y hash
+    correlativos; cualquier columna se puede sobrescribir)
+    """
+    usuario = Usuario(username='prueba', email='prueba@test.com', password_hash='x',
+                      nombres='Usuario', apellidos='Prueba', rol='ADMIN')
+    cliente = Cliente(tipo_identificacion='CEDULA', identificacion='1700000001',
+                      nombres_enc=b'', iv=b'', tag=b'')
+    db.session.add_all([usuario, cliente])
+    db.session.flush()
+    secuencia = itertools.count(1)
+
+    def _crear(**campos):
+        numero = next(secuencia)
+        factura = Factura(**{
+            'cliente_id': cliente.id,
+            'usuario_id': usuario.id,
+            'numero_factura': f'001-001-{numero:09d}',
+            'subtotal': Decimal('10.00'),
+            'iva': Decimal('1.50'),
+            'total': Decimal('11.50'),
+            'items': [],
+            'hash_sha256': f'{numero:064x}',
+            'firma_digital': 'firma',
+            **campos
+        })
+        db.session.add(factura)
+        db.session.flush()
+        return factura
+    return _crear
+
+
+@pytest.fixture
+def factura(crear_factura):
+    """Una factura guardada"""
+    factura = crear_factura()
+    db.session.commit()
+    return factura
+
+
+@pytest.fixture
+def cabeceras(crear_factura):
+    """Cabecera Authorization del usuario que emite las facturas de crear_factura"""
+    usuario = Usuario.query.filter_by(username='prueba').one()
+    return {'Authorization': f"Bearer {create_access_token(identity=usuario.id)}"}
+
+
+@pytest.fixture
+def cliente(app, cabeceras):
+    """ID de un cliente con datos cifrados creado por la API (para POST /facturas)"""
+    respuesta = app.test_client().post('/api/v1/clientes', headers=cabeceras, json={
+        'tipo_identificacion': 'CEDULA', 'identificacion': '1712345678',
+        'nombres': 'Ana', 'apellidos': 'Pérez', 'direccion': 'Quito'
+    })
+    assert respuesta.status_code == 201
+    return respuesta.get_json()['data']['id']
@@ -0,0 +1,448 @@
+"""
+Script para generar datos sintéticos de volumen (pruebas de rendimiento)
+Carga N clientes cifrados con AES-GCM y M facturas firmadas con la clave
+activa, con XML comprimido en documento_xml, numeración SRI correlativa y
+estados SRI realistas.
+
+- Firma y XML en paralelo (un proceso por núcleo; cada bloque de facturas se
+  genera en un proceso y se inserta mientras los demás siguen firmando)
+- PostgreSQL: COPY por bloque; otros motores: INSERT de varias filas
+- Distribuciones: más facturas en los meses recientes, horario comercial,
+  pocos domingos, unos clientes compran mucho más que otros (Pareto) y la
+  mayoría de facturas tiene pocos ítems
+- Es determinista para la misma --semilla (mismos clientes, ítems y fechas)
+
+Uso:
+    python generar_datos.py --clientes 100000 --facturas 1000000
+    python generar_datos.py --clientes 1000 --facturas 20000 --dias 90 --workers 4
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from models.base import db
+from models import Usuario, Cliente, Factura, DocumentoXml, ColaSri, FacturaResumenDiario
+from services.almacen_xml import comprimir
+from services.crypto_service import CAMPOS_CLIENTE
+from services.qr_service import QrService
+from services.sri_service import ESTADO_AUTORIZADO, ESTADO_PENDIENTE, ESTADO_RECHAZADO
+
+
+NOMBRES = ('Ana', 'Luis', 'María', 'Carlos', 'Sofía', 'Jorge', 'Valentina', 'Andrés',
+           'Camila', 'Diego', 'Gabriela', 'José', 'Daniela', 'Fernando', 'Paola', 'Miguel')
+APELLIDOS = ('Pérez', 'Gómez', 'Torres', 'Vera', 'Andrade', 'Zambrano', 'Mendoza', 'Castillo',
+             'Morales', 'Jaramillo', 'Guerrero', 'Salazar', 'Cevallos', 'Paredes', 'Ortiz', 'Vásquez')
+CALLES = ('Av. Amazonas', 'Av. 6 de Diciembre', 'Av. 10 de Agosto', 'Calle Bolívar',
+          'Av. 9 de Octubre', 'Calle Sucre', 'Av. de las Américas', 'Calle Olmedo')
+CIUDADES = ('Quito', 'Guayaquil', 'Cuenca', 'Ambato', 'Manta', 'Loja', 'Machala', 'Ibarra')
+
+# Peso relativo de cada hora del día (horario comercial con picos a media mañana y tarde)
+PESO_HORAS = (0, 0, 0, 0, 0, 0, 1, 3, 8, 12, 14, 13, 9, 8, 11, 13, 12, 10, 7, 5, 3, 2, 1, 0)
+
+CATALOGO = [
+    {'producto_id': i + 1, 'codigo': f'P{i + 1:04d}', 'nombre': f'Producto {i + 1}',
+     'precio_unitario': round(random.Random(i).lognormvariate(2.5, 1.0), 2) + 0.5}
+    for i in range(300)
+]
+
+
+# ============================================================================
+# DATOS DETERMINISTAS POR ÍNDICE (los procesos no comparten memoria)
+# ============================================================================
+
+def datos_cliente(semilla, indice):
+    """Datos en claro del cliente número indice (mismos en cualquier proceso)"""
+    aleatorio = random.Random(f"cliente-{semilla}-{indice}")
+    nombres = f"{aleatorio.choice(NOMBRES)} {aleatorio.choice(NOMBRES)}"
+    apellidos = f"{aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}"
+    usuario_correo = f"{nombres.split()[0]}.{apellidos.split()[0]}{aleatorio.randint(1, 999)}".lower()
+    return {
+        'nombres': nombres,
+        'apellidos': apellidos,
+        'direccion': f"{aleatorio.choice(CALLES)} N{aleatorio.randint(1, 80)}-{aleatorio.randint(1, 99)}, "
+                     f"{aleatorio.choice(CIUDADES)}",
+        'telefono': f"09{aleatorio.randint(10000000, 99999999)}",
+        'email': f"{usuario_correo}@correo.ec"
+    }
+
+
+def identificacion_cliente(cliente_id):
+    """Cédula sintética: empieza con 9 (no es código de provincia, no choca con reales)"""
+    return f"9{cliente_id:09d}"
+
+
+def _fechas_bloque(aleatorio, inicio, cantidad, total, desde, dias):
+    """
+    Fechas de emisión ordenadas para las facturas [inicio, inicio + cantidad)
+
+    Cada bloque cubre su tramo del periodo; la raíz cuadrada hace que la
+    densidad crezca en el tiempo (el negocio crece) y la hora sigue PESO_HORAS.
+    """
+    fechas = []
+    for _ in range(cantidad):
+        fraccion = math.sqrt(aleatorio.uniform(inicio / total, (inicio + cantidad) / total))
+        dia = desde + timedelta(days=min(int(fraccion * dias), dias - 1))
+        if dia.weekday() == 6 and aleatorio.random() < 0.8:
+            dia += timedelta(days=1)  # Pocos domingos
+        hora = aleatorio.choices(range(24), PESO_HORAS)[0]
+        fechas.append(dia.replace(hour=hora, minute=aleatorio.randint(0, 59), second=aleatorio.randint(0, 59)))
+    fechas.sort()
+    return fechas
+
+
+def _items_aleatorios(aleatorio):
+    """Entre 1 y 40 ítems, la mayoría pocos"""
+    cantidad = min(1 + int(aleatorio.expovariate(1 / 3)), 40)
+    return [
+        {**producto, 'cantidad': aleatorio.choices((1, 2, 3, 5, 10), (50, 25, 12, 8, 5))[0],
+         'iva_porcentaje': aleatorio.choices((15, 0), (9, 1))[0]}
+        for producto in aleatorio.sample(CATALOGO, cantidad)
+    ]
+
+
+# ============================================================================
+# PROCESOS TRABAJADORES (XML + FIRMA + COMPRESIÓN)
+# ============================================================================
+
+_servicio_trabajador = None
+_parametros_trabajador = None
+
+
+def _inicializar_trabajador(clave_firma, opciones_xml, parametros):
+    """La clave de firma se parsea una vez por proceso"""
+    global _servicio_trabajador, _parametros_trabajador
+    from services.factura_service import FacturaService
+
+    _servicio_trabajador = FacturaService.sin_bd(clave_firma, **opciones_xml)
+    _parametros_trabajador = SimpleNamespace(**parametros, qr=QrService(parametros['qr_url_base']))
+
+
+def _generar_bloque(bloque):
+    """
+    Generar las filas de un bloque de facturas
+
+    Args:
+        bloque: (número de bloque, índice de la primera factura, cantidad)
+
+    Returns:
+        dict con filas de factura, documento_xml y cola_sri
+    """
+    numero_bloque, inicio, cantidad = bloque
+    servicio, p = _servicio_trabajador, _parametros_trabajador
+    aleatorio = random.Random(f"facturas-{p.semilla}-{numero_bloque}")
+    ahora = datetime.utcnow()
+    limite_pendientes = p.hasta - timedelta(days=1)
+
+    facturas, documentos, cola = [], [], []
+    for posicion, fecha in enumerate(_fechas_bloque(aleatorio, inicio, cantidad, p.total_facturas,
+                                                   p.desde, p.dias)):
+        indice = inicio + posicion
+        factura_id = p.factura_id_inicial + indice
+        # Pareto: el 10% de los clientes concentra cerca del 30% de las facturas
+        indice_cliente = int(p.total_clientes * aleatorio.random() ** 2)
+        cliente_id = p.cliente_id_inicial + indice_cliente
+        items = _items_aleatorios(aleatorio)
+
+        totales = servicio.calcular_totales(items)
+        factura_data = {
+            **servicio._preparar_datos_factura(
+                f"{p.establecimiento}-{p.punto_emision}-{p.primer_secuencial + indice:09d}", totales
+            ),
+            'fecha_emision': fecha
+        }
+        cliente_datos = {
+            'tipo_identificacion': 'CEDULA',
+            'identificacion': identificacion_cliente(cliente_id),
+            **datos_cliente(p.semilla, indice_cliente)
+        }
+        documento = servicio.procesar_documento(factura_data, cliente_datos, items)
+
+        if fecha >= limite_pendientes and aleatorio.random() < 0.5:
+            estado, autorizacion, fecha_autorizacion = ESTADO_PENDIENTE, None, None
+            cola.append({'factura_id': factura_id, 'estado': ColaSri.PENDIENTE, 'intentos': 0,
+                         'proximo_intento': ahora, 'created_at': ahora, 'updated_at': ahora})
+        elif aleatorio.random() < p.rechazadas:
+            estado, autorizacion, fecha_autorizacion = ESTADO_RECHAZADO, None, None
+        else:
+            estado = ESTADO_AUTORIZADO
+            autorizacion = servicio._generar_clave_acceso(factura_data)
+            fecha_autorizacion = fecha + timedelta(seconds=aleatorio.randint(2, 900))
+
+        factura = {
+            'id': factura_id,
+            'cliente_id': cliente_id,
+            'usuario_id': aleatorio.choice(p.usuarios),
+            'numero_factura': factura_data['numero_factura'],
+            'fecha_emision': fecha,
+            'subtotal': round(totales['subtotal'], 2),
+            'iva': round(totales['iva'], 2),
+            'total': round(totales['total'], 2),
+            'items': items,
+            'hash_sha256': documento['hash_sha256'],
+            'firma_digital': documento['firma_digital'],
+            'key_id': documento['key_id'],
+            'num_autorizacion': autorizacion,
+            'fecha_autorizacion': fecha_autorizacion,
+            'estado_sri': estado,
+            'created_at': fecha,
+            'updated_at': fecha_autorizacion or fecha
+        }
+        factura['qr_data'] = p.qr.texto_qr(SimpleNamespace(**factura))
+        facturas.append(factura)
+
+        xml = documento['xml_firmado'].encode('utf-8')
+        documentos.append({
+            'hash_sha256': documento['hash_sha256'],
+            'compresion': p.compresion,
+            'tamano': len(xml),
+            'contenido': comprimir(xml, p.compresion, p.compresion_nivel),
+            'created_at': fecha
+        })
+
+    return {'facturas': facturas, 'documentos': documentos, 'cola': cola}
+
+
+# ============================================================================
+# CARGA EN LA BD
+# ============================================================================
+
+def _valor_copy(valor):
+    """Valor de Python en el formato de texto de COPY ... CSV"""
+    if isinstance(valor, bytes):
+        return '\\x' + valor.hex()
+    if isinstance(valor, bool):
+        return 't' if valor else 'f'
+    if isinstance(valor, datetime):
+        return valor.isoformat(sep=' ')
+    if isinstance(valor, (list, dict)):
+        return json.dumps(valor, ensure_ascii=False)
+    return valor
+
+
+class Cargador:
+    """
+    Inserción por bloques en la transacción de la sesión
+
+    PostgreSQL usa COPY FROM STDIN (CSV); el resto, un INSERT de varias filas.
+    """
+
+    def __init__(self):
+        self.usar_copy = db.engine.dialect.name == 'postgresql'
+
+    def insertar(self, modelo, filas):
+        if not filas:
+            return
+        if not self.usar_copy:
+            db.session.execute(modelo.__table__.insert(), filas)
+            return
+
+        columnas = list(filas[0])
+        buffer = io.StringIO()
+        escritor = csv.writer(buffer)
+        for fila in filas:
+            escritor.writerow([_valor_copy(fila[columna]) for columna in columnas])
+        buffer.seek(0)
+
+        cursor = db.session.connection().connection.cursor()
+        cursor.copy_expert(
+            f"COPY {modelo.__tablename__} ({', '.join(columnas)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+
+    def ajustar_secuencia(self, modelo):
+        """En PostgreSQL, continuar la secuencia del id después de los ids explícitos"""
+        if self.usar_copy:
+            tabla = modelo.__tablename__
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 1) FROM {tabla}))"
+            ))
+
+
+def _siguiente_id(modelo):
+    return (db.session.execute(db.select(db.func.max(modelo.id))).scalar() or 0) + 1
+
+
+def _cargar_clientes(cargador, crypto, semilla, cliente_id_inicial, cantidad, lote, desde):
+    """Clientes cifrados igual que en POST /clientes (todos los campos en nombres_enc)"""
+    aleatorio = random.Random(f"altas-{semilla}")
+    for inicio in range(0, cantidad, lote):
+        filas = []
+        for indice in range(inicio, min(inicio + lote, cantidad)):
+            cliente_id = cliente_id_inicial + indice
+            datos = datos_cliente(semilla, indice)
+            cifrado = crypto.cifrar_aes_gcm('|'.join(datos[campo] for campo in CAMPOS_CLIENTE))
+            alta = desde - timedelta(days=aleatorio.randint(0, 365), seconds=aleatorio.randint(0, 86399))
+            filas.append({
+                'id': cliente_id,
+                'tipo_identificacion': 'CEDULA',
+                'identificacion': identificacion_cliente(cliente_id),
+                'razon_social': None,
+                'nombres_enc': cifrado['ciphertext'],
+                'apellidos_enc': b'',
+                'direccion_enc': b'',
+                'telefono_enc': b'',
+                'email_enc': b'',
+                'iv': cifrado['iv'],
+                'tag': cifrado['tag'],
+                'activo': True,
+                'created_at': alta,
+                'updated_at': alta
+            })
+        cargador.insertar(Cliente, filas)
+        db.session.commit()
+        print(f"   👥 {inicio + len(filas)} / {cantidad} clientes")
+    cargador.ajustar_secuencia(Cliente)
+    db.session.commit()
+
+
+def generar(clientes, facturas, dias=365, workers=0, lote=2000, semilla=1, rechazadas=0.02):
+    """
+    Generar y cargar los datos (requiere contexto de aplicación)
+
+    Args:
+        clientes: Clientes nuevos a crear (las facturas se reparten entre ellos)
+        facturas: Facturas a crear, con fechas en los últimos `dias` días
+        workers: Procesos para XML y firma (0 = núcleos de CPU, 1 = sin pool)
+        lote: Facturas por bloque (unidad de trabajo y de COPY/INSERT)
+        semilla: Semilla de los datos aleatorios
+        rechazadas: Fracción de facturas RECHAZADAS por el SRI
+
+    Returns:
+        dict con clientes, facturas y segundos
+    """
+    from flask import current_app
+    from services.crypto_service import get_crypto_service
+    from services.factura_service import FacturaService
+    from services.almacen_xml import get_almacen_xml
+
+    if clientes < 1:
+        raise ValueError("Se necesita al menos un cliente")
+
+    inicio_total = time.perf_counter()
+    usuarios = [fila.id for fila in db.session.execute(
+        db.select(Usuario.id).where(Usuario.activo.is_not(False))
+    )]
+    if not usuarios:
+        raise RuntimeError("No hay usuarios activos: ejecute primero init_db.py")
+
+    servicio = FacturaService()
+    almacen = get_almacen_xml()
+    cargador = Cargador()
+
+    hasta = datetime.utcnow().replace(microsecond=0)
+    desde = (hasta - timedelta(days=dias)).replace(hour=0, minute=0, second=0)
+    cliente_id_inicial = _siguiente_id(Cliente)
+    factura_id_inicial = _siguiente_id(Factura)
+
+    # 1. Clientes
+    print(f"👥 Generando {clientes} clientes cifrados con AES-GCM...")
+    _cargar_clientes(cargador, get_crypto_service(), semilla, cliente_id_inicial, clientes, lote, desde)
+    segundos_clientes = time.perf_counter() - inicio_total
+
+    # 2. Números de factura: un rango reservado de una vez (el contador queda al día)
+    primer_secuencial, _ = servicio.asignador.reservar_rango(
+        facturas, servicio.establecimiento, servicio.punto_emision
+    )
+    db.session.commit()
+
+    parametros = {
+        'semilla': semilla,
+        'desde': desde,
+        'hasta': hasta,
+        'dias': dias,
+        'rechazadas': rechazadas,
+        'usuarios': usuarios,
+        'total_facturas': facturas,
+        'total_clientes': clientes,
+        'cliente_id_inicial': cliente_id_inicial,
+        'factura_id_inicial': factura_id_inicial,
+        'primer_secuencial': primer_secuencial,
+        'establecimiento': servicio.establecimiento,
+        'punto_emision': servicio.punto_emision,
+        'compresion': almacen.compresion,
+        'compresion_nivel': almacen.nivel,
+        'qr_url_base': current_app.config.get('QR_URL_BASE', 'http://localhost:5173')
+    }
+    opciones_xml = {'xml_compacto': servicio.xml_compacto, 'xml_streaming_min': servicio.xml_streaming_min}
+    bloques = [(numero, inicio, min(lote, facturas - inicio))
+               for numero, inicio in enumerate(range(0, facturas, lote))]
+
+    # 3. Facturas: XML y firma en paralelo, inserción en orden a medida que llegan
+    workers = workers or os.cpu_count() or 1
+    print(f"🧾 Generando {facturas} facturas ({servicio.firmante.descripcion}, "
+          f"{len(bloques)} bloques, {workers} procesos)...")
+    inicio_facturas = time.perf_counter()
+    pool = None
+    if workers == 1:
+        _inicializar_trabajador(servicio.clave_firma, opciones_xml, parametros)
+        resultados = map(_generar_bloque, bloques)
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_inicializar_trabajador,
+            initargs=(servicio.clave_firma, opciones_xml, parametros)
+        )
+        resultados = pool.map(_generar_bloque, bloques)
+
+    cargadas = 0
+    try:
+        for resultado in resultados:
+            cargador.insertar(Factura, resultado['facturas'])
+            cargador.insertar(DocumentoXml, resultado['documentos'])
+            cargador.insertar(ColaSri, resultado['cola'])
+            db.session.commit()
+            cargadas += len(resultado['facturas'])
+            transcurrido = time.perf_counter() - inicio_facturas
+            print(f"   🧾 {cargadas} / {facturas} facturas ({cargadas / transcurrido:.0f}/s)")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    segundos_facturas = time.perf_counter() - inicio_facturas
+
+    # 4. Secuencias, resumen diario y estadísticas del planificador
+    cargador.ajustar_secuencia(Factura)
+    db.session.commit()
+    print("🔄 Recalculando resumen diario...")
+    FacturaResumenDiario.reconstruir()
+    if cargador.usar_copy:
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conexion:
+            conexion.exec_driver_sql("ANALYZE cliente, factura, documento_xml, cola_sri")
+
+    segundos = time.perf_counter() - inicio_total
+    print(f"✅ {clientes} clientes en {segundos_clientes:.1f} s, {facturas} facturas en "
+          f"{segundos_facturas:.1f} s ({facturas / max(segundos_facturas, 1e-9):.0f}/s); total {segundos:.1f} s")
+    return {'clientes': clientes, 'facturas': facturas, 'segundos': segundos}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generar clientes y facturas sintéticos')
+    parser.add_argument('--clientes', type=int, default=10000)
+    parser.add_argument('--facturas', type=int, default=100000)
+    parser.add_argument('--dias', type=int, default=365, help='Periodo de emisión hacia atrás desde hoy')
+    parser.add_argument('--workers', type=int, default=0, help='Procesos de firma (0 = núcleos de CPU)')
+    parser.add_argument('--lote', type=int, default=2000, help='Facturas por bloque')
+    parser.add_argument('--semilla', type=int, default=1)
+    parser.add_argument('--rechazadas', type=float, default=0.02, help='Fracción RECHAZADA por el SRI')
+    args = parser.parse_args()
+
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        generar(args.clientes, args.facturas, args.dias, args.workers, args.lote,
+                args.semilla, args.rechazadas)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Configuración de gunicorn (producción)
+La app se precarga en el maestro (preload_app) y cada worker descarta el
+pool de conexiones heredado en post_fork.
+
+Uso:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+import gc
+import multiprocessing
+
+from decouple import config
+
+
+bind = config('GUNICORN_BIND', default='0.0.0.0:5000')
+
+# Firma y XML usan CPU: un proceso por núcleo y hilos para la espera de BD
+workers = config('GUNICORN_WORKERS', default=multiprocessing.cpu_count(), cast=int)
+worker_class = 'gthread'
+threads = config('GUNICORN_THREADS', default=4, cast=int)
+
+timeout = config('GUNICORN_TIMEOUT', default=60, cast=int)
+graceful_timeout = config('GUNICORN_GRACEFUL_TIMEOUT', default=30, cast=int)
+keepalive = config('GUNICORN_KEEPALIVE', default=5, cast=int)
+
+# Reciclar workers cada N requests (0 = nunca); el jitter evita que caigan juntos
+max_requests = config('GUNICORN_MAX_REQUESTS', default=0, cast=int)
+max_requests_jitter = config('GUNICORN_MAX_REQUESTS_JITTER', default=0, cast=int)
+
+# Claves, plantilla XML y QR se cargan una vez antes del fork
+preload_app = True
+
+accesslog = config('GUNICORN_ACCESSLOG', default='-')
+errorlog = '-'
+loglevel = config('GUNICORN_LOGLEVEL', default='info')
+
+
+def pre_fork(server, worker):
+    """Objetos del maestro fuera del GC: los workers no copian esas páginas al recolectar"""
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Cada worker empieza con un pool de conexiones propio"""
+    from wsgi import app
+    from services.arranque import reiniciar_tras_fork
+
+    reiniciar_tras_fork(app)
@@ -0,0 +1,45 @@
+"""
+Script de migración: llavero de claves de firma y columna factura.key_id
+Las facturas existentes quedan asociadas a la clave RSA original (rsa_keys)
+"""
+from sqlalchemy import inspect, text
+from app import create_app
+from models.base import db
+from models.factura import Factura
+from services.firmantes import obtener_llavero
+
+def migrar_claves_firma(tamano_lote=5000):
+    """Agregar factura.key_id, crear el llavero y completar key_id (idempotente)"""
+    app = create_app()
+
+    with app.app_context():
+        columnas = {columna['name'] for columna in inspect(db.engine).get_columns('factura')}
+        if 'key_id' not in columnas:
+            print("➕ Agregando columna factura.key_id...")
+            with db.engine.begin() as conexion:
+                conexion.execute(text("ALTER TABLE factura ADD COLUMN key_id VARCHAR(16)"))
+
+        llavero = obtener_llavero(app.config.get('FIRMA_ALGORITMO', 'rsa'))
+        heredada = llavero.get('heredada')
+        if not heredada:
+            print("✅ No hay clave RSA original: nada que completar")
+            return
+
+        completadas = 0
+        while True:
+            ids = db.session.execute(
+                db.select(Factura.id).where(Factura.key_id.is_(None)).limit(tamano_lote)
+            ).scalars().all()
+            if not ids:
+                break
+            db.session.execute(
+                db.update(Factura).where(Factura.id.in_(ids)).values(key_id=heredada)
+            )
+            db.session.commit()
+            completadas += len(ids)
+            print(f"   🔄 {completadas} facturas con key_id {heredada}...")
+
+        print(f"✅ Migración completada: {completadas} facturas, clave activa {llavero['activa']}")
+
+if __name__ == '__main__':
+    migrar_claves_firma()
@@ -0,0 +1,27 @@
+"""
+Script de migración: columna factura.prueba_merkle
+Necesaria para la firma por lotes con árbol de Merkle (FIRMA_MERKLE=True)
+"""
+from sqlalchemy import inspect, text
+from app import create_app
+from models.base import db
+
+def migrar_firma_merkle():
+    """Agregar la columna factura.prueba_merkle (idempotente)"""
+    app = create_app()
+
+    with app.app_context():
+        columnas = {columna['name'] for columna in inspect(db.engine).get_columns('factura')}
+        if 'prueba_merkle' in columnas:
+            print("✅ La columna prueba_merkle ya existe, nada que migrar")
+            return
+
+        print("➕ Agregando columna factura.prueba_merkle...")
+        with db.engine.begin() as conexion:
+            # Sin valor por defecto: en PostgreSQL no reescribe la tabla
+            conexion.execute(text("ALTER TABLE factura ADD COLUMN prueba_merkle TEXT"))
+
+        print("✅ Migración completada: ya se puede activar FIRMA_MERKLE")
+
+if __name__ == '__main__':
+    migrar_firma_merkle()
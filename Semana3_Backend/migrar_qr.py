@@ -0,0 +1,32 @@
+"""
+Script de migración: eliminar las imágenes QR guardadas en factura
+El QR ahora se genera bajo demanda en GET /api/v1/facturas/<id>/qr
+"""
+from sqlalchemy import inspect, text
+from app import create_app
+from models.base import db
+
+def migrar_qr():
+    """Eliminar la columna factura.qr_image (idempotente)"""
+    app = create_app()
+
+    with app.app_context():
+        columnas = {columna['name'] for columna in inspect(db.engine).get_columns('factura')}
+        if 'qr_image' not in columnas:
+            print("✅ La columna qr_image ya no existe, nada que migrar")
+            return
+
+        print("🗑️  Eliminando columna factura.qr_image...")
+        with db.engine.begin() as conexion:
+            conexion.execute(text("ALTER TABLE factura DROP COLUMN qr_image"))
+
+        if db.engine.dialect.name == 'postgresql':
+            # Recuperar el espacio de los data URI eliminados
+            print("🧹 Ejecutando VACUUM FULL factura...")
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conexion:
+                conexion.execute(text("VACUUM FULL factura"))
+
+        print("✅ Migración completada: el QR se sirve desde /api/v1/facturas/<id>/qr")
+
+if __name__ == '__main__':
+    migrar_qr()
@@ -0,0 +1,62 @@
+"""
+Script de migración: mover factura.xml_firmado al almacén comprimido
+Copia el XML de las facturas existentes a documento_xml y vacía la columna
+"""
+from app import create_app
+from models.base import db
+from models.factura import Factura
+from models.documento_xml import DocumentoXml
+from services.almacen_xml import get_almacen_xml
+
+def migrar_xml(tamano_lote=500):
+    """Migrar por lotes (idempotente: se puede interrumpir y volver a ejecutar)"""
+    app = create_app()
+
+    with app.app_context():
+        print("📦 Creando tabla documento_xml si no existe...")
+        DocumentoXml.__table__.create(db.engine, checkfirst=True)
+
+        almacen = get_almacen_xml()
+        migradas = bytes_antes = bytes_despues = 0
+
+        while True:
+            filas = db.session.execute(
+                db.select(Factura.id, Factura.hash_sha256, Factura.xml_firmado,
+                          DocumentoXml.hash_sha256.label('existente'))
+                .outerjoin(DocumentoXml, DocumentoXml.hash_sha256 == Factura.hash_sha256)
+                .where(Factura.xml_firmado.is_not(None))
+                .order_by(Factura.id)
+                .limit(tamano_lote)
+            ).all()
+            if not filas:
+                break
+
+            for fila in filas:
+                if fila.existente is None:
+                    documento = almacen.guardar(fila.hash_sha256, fila.xml_firmado)
+                    bytes_antes += documento.tamano
+                    bytes_despues += len(documento.contenido)
+
+            db.session.execute(
+                db.update(Factura)
+                .where(Factura.id.in_([fila.id for fila in filas]))
+                .values(xml_firmado=None)
+            )
+            db.session.commit()
+            migradas += len(filas)
+            print(f"   🔄 {migradas} facturas migradas...")
+
+        if bytes_antes:
+            print(f"📉 XML: {bytes_antes / 1024:.0f} KB → {bytes_despues / 1024:.0f} KB "
+                  f"({bytes_despues / bytes_antes:.0%})")
+
+        if migradas and db.engine.dialect.name == 'postgresql':
+            # Devolver al sistema el espacio liberado en factura
+            print("🧹 Ejecutando VACUUM FULL factura...")
+            with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conexion:
+                conexion.exec_driver_sql("VACUUM FULL factura")
+
+        print(f"✅ Migración completada: {migradas} facturas")
+
+if __name__ == '__main__':
+    migrar_xml()
@@ -0,0 +1,305 @@
+"""
+Servidor SRI Simulado (web services offline de recepción y autorización)
+Reemplazo local del SRI para pruebas y desarrollo con SRI_CLIENTE=soap
+Acepta comprobantes individuales y lotes masivos (<lote> con CDATA)
+
+Uso:
+    python mock_sri.py --puerto 8089
+    python mock_sri.py --puerto 8089 --fallos 0.2 --rechazos 0.05 --demora 0.3
+
+Luego en .env:
+    SRI_CLIENTE=soap
+    SRI_URL_RECEPCION=http://localhost:8089/RecepcionComprobantesOffline
+    SRI_URL_AUTORIZACION=http://localhost:8089/AutorizacionComprobantesOffline
+"""
+import re
+import time
+import base64
+import random
+import argparse
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+from lxml import etree
+
+
+NS_SOAP = 'http://schemas.xmlsoap.org/soap/envelope/'
+NS_RECEPCION = 'http://ec.gob.sri.ws.recepcion'
+NS_AUTORIZACION = 'http://ec.gob.sri.ws.autorizacion'
+
+_PATRON_CLAVE_ACCESO = re.compile(rb'<claveAcceso>(\d+)</claveAcceso>')
+_PATRON_LOTE = re.compile(rb'\s*(<\?xml[^>]*\?>)?\s*<lote[\s>]')
+
+
+def _sobre(namespace, respuesta, cuerpo):
+    """Sobre SOAP de respuesta"""
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<soap:Envelope xmlns:soap="{NS_SOAP}"><soap:Body>'
+        f'<ns2:{respuesta} xmlns:ns2="{namespace}">{cuerpo}</ns2:{respuesta}>'
+        f'</soap:Body></soap:Envelope>'
+    ).encode('utf-8')
+
+
+def _mensaje(identificador, texto, tipo='ERROR'):
+    return (f'<mensaje><identificador>{identificador}</identificador>'
+            f'<mensaje>{escape(texto)}</mensaje><tipo>{tipo}</tipo></mensaje>')
+
+
+class ServidorSriSimulado:
+    """
+    Servidor HTTP con las operaciones SOAP del SRI
+
+    Args:
+        puerto: Puerto TCP (0 = libre, útil en pruebas)
+        tasa_fallos: Probabilidad de responder HTTP 503
+        tasa_rechazos: Probabilidad de responder NO AUTORIZADO
+        demora: Segundos de latencia simulada por llamada
+        consultas_en_proceso: Consultas de autorización que responden EN PROCESO
+                              antes de la respuesta final
+    """
+
+    def __init__(self, puerto=0, tasa_fallos=0.0, tasa_rechazos=0.0, demora=0.0,
+                 consultas_en_proceso=0):
+        self.tasa_fallos = tasa_fallos
+        self.tasa_rechazos = tasa_rechazos
+        self.demora = demora
+        self.consultas_en_proceso = consultas_en_proceso
+
+        self.comprobantes = {}  # clave_acceso -> {estado, fecha, consultas, xml}
+        self.lotes = {}  # clave_acceso_lote -> [claves de acceso de sus comprobantes]
+        self.llamadas = {'validarComprobante': 0, 'autorizacionComprobante': 0,
+                         'autorizacionComprobanteLote': 0}
+        self.fallos_forzados = 0  # Próximas llamadas que responden 503
+        self._lock = threading.Lock()
+
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_POST(self):
+                cuerpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                estado, respuesta = servidor.atender(cuerpo)
+                self.send_response(estado)
+                self.send_header('Content-Type', 'text/xml; charset=utf-8')
+                self.send_header('Content-Length', str(len(respuesta)))
+                self.end_headers()
+                self.wfile.write(respuesta)
+
+            def log_message(self, formato, *args):
+                pass
+
+        self._http = ThreadingHTTPServer(('127.0.0.1', puerto), Manejador)
+        self._hilo = None
+
+    @property
+    def url_base(self):
+        host, puerto = self._http.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    @property
+    def url_recepcion(self):
+        return f"{self.url_base}/RecepcionComprobantesOffline"
+
+    @property
+    def url_autorizacion(self):
+        return f"{self.url_base}/AutorizacionComprobantesOffline"
+
+    def iniciar(self):
+        """Atender peticiones en un hilo en segundo plano"""
+        self._hilo = threading.Thread(target=self._http.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._http.shutdown()
+        self._http.server_close()
+
+    # ------------------------------------------------------------------
+    # Operaciones
+    # ------------------------------------------------------------------
+
+    def atender(self, cuerpo):
+        """
+        Despachar una petición SOAP
+
+        Returns:
+            tuple (código HTTP, bytes de respuesta)
+        """
+        if self.demora:
+            time.sleep(self.demora)
+
+        try:
+            raiz = etree.fromstring(cuerpo)
+            operacion = raiz.xpath("//*[local-name()='Body']/*")[0]
+        except (etree.XMLSyntaxError, IndexError):
+            return 400, b'Peticion SOAP invalida'
+        nombre = etree.QName(operacion).localname
+
+        with self._lock:
+            if nombre in self.llamadas:
+                self.llamadas[nombre] += 1
+            forzado = self.fallos_forzados > 0
+            if forzado:
+                self.fallos_forzados -= 1
+        if forzado or random.random() < self.tasa_fallos:
+            return 503, b'Servicio no disponible'
+
+        if nombre == 'validarComprobante':
+            return 200, self._validar(operacion)
+        if nombre == 'autorizacionComprobante':
+            return 200, self._autorizacion(operacion)
+        if nombre == 'autorizacionComprobanteLote':
+            return 200, self._autorizacion_lote(operacion)
+        return 500, f'Operacion no soportada: {nombre}'.encode('utf-8')
+
+    def _validar(self, operacion):
+        nodo = operacion.xpath("*[local-name()='xml']")
+        try:
+            xml = base64.b64decode(nodo[0].text or '', validate=True) if nodo else b''
+        except ValueError:
+            xml = b''
+        if _PATRON_LOTE.match(xml):
+            return self._validar_lote(xml)
+
+        coincidencia = _PATRON_CLAVE_ACCESO.search(xml)
+        if not coincidencia:
+            return self._respuesta_recepcion('DEVUELTA', {'': _mensaje('35', 'ARCHIVO NO CUMPLE ESTRUCTURA XML')})
+
+        clave = coincidencia.group(1).decode('ascii')
+        with self._lock:
+            if not self._registrar(clave, xml):
+                return self._respuesta_recepcion('DEVUELTA', {clave: _mensaje('43', 'CLAVE ACCESO REGISTRADA')})
+        return self._respuesta_recepcion('RECIBIDA', {})
+
+    def _validar_lote(self, xml):
+        """Lote masivo: se registran los comprobantes nuevos y se devuelven los repetidos"""
+        try:
+            lote = etree.fromstring(xml)
+            clave_lote = lote.findtext('claveAcceso')
+            contenidos = [(nodo.text or '').encode('utf-8') for nodo in lote.iterfind('comprobantes/comprobante')]
+        except etree.XMLSyntaxError:
+            clave_lote, contenidos = None, []
+        if not clave_lote or not contenidos:
+            return self._respuesta_recepcion('DEVUELTA', {'': _mensaje('35', 'ARCHIVO NO CUMPLE ESTRUCTURA XML')})
+
+        devueltos, aceptados = {}, []
+        with self._lock:
+            for contenido in contenidos:
+                coincidencia = _PATRON_CLAVE_ACCESO.search(contenido)
+                if not coincidencia:
+                    devueltos[''] = _mensaje('35', 'ARCHIVO NO CUMPLE ESTRUCTURA XML')
+                    continue
+                clave = coincidencia.group(1).decode('ascii')
+                if self._registrar(clave, contenido):
+                    aceptados.append(clave)
+                else:
+                    devueltos[clave] = _mensaje('43', 'CLAVE ACCESO REGISTRADA')
+            self.lotes[clave_lote] = aceptados
+        return self._respuesta_recepcion('DEVUELTA' if devueltos else 'RECIBIDA', devueltos)
+
+    def _registrar(self, clave, xml):
+        """Registrar un comprobante recibido (requiere _lock); False si ya existía"""
+        if clave in self.comprobantes:
+            return False
+        rechazado = random.random() < self.tasa_rechazos
+        self.comprobantes[clave] = {
+            'estado': 'NO AUTORIZADO' if rechazado else 'AUTORIZADO',
+            'fecha': datetime.now().astimezone().isoformat(timespec='seconds'),
+            'consultas': 0,
+            'xml': xml.decode('utf-8')
+        }
+        return True
+
+    def _respuesta_recepcion(self, estado, devueltos):
+        """devueltos: {clave_acceso: mensajes} de los comprobantes con errores"""
+        comprobantes = ''.join(
+            f'<comprobante><claveAcceso>{clave}</claveAcceso><mensajes>{mensajes}</mensajes></comprobante>'
+            for clave, mensajes in devueltos.items()
+        )
+        if comprobantes:
+            comprobantes = f'<comprobantes>{comprobantes}</comprobantes>'
+        return _sobre(NS_RECEPCION, 'validarComprobanteResponse',
+                      f'<RespuestaRecepcionComprobante><estado>{estado}</estado>'
+                      f'{comprobantes}</RespuestaRecepcionComprobante>')
+
+    def _autorizacion(self, operacion):
+        nodo = operacion.xpath("*[local-name()='claveAccesoComprobante']")
+        clave = (nodo[0].text or '').strip() if nodo else ''
+        with self._lock:
+            comprobante = self.comprobantes.get(clave)
+            if comprobante is not None:
+                comprobante['consultas'] += 1
+                en_proceso = comprobante['consultas'] <= self.consultas_en_proceso
+
+        autorizaciones = ''
+        if comprobante is not None:
+            autorizaciones = self._nodo_autorizacion(clave, comprobante, en_proceso)
+
+        return _sobre(NS_AUTORIZACION, 'autorizacionComprobanteResponse',
+                      f'<RespuestaAutorizacionComprobante>'
+                      f'<claveAccesoConsultada>{escape(clave)}</claveAccesoConsultada>'
+                      f'<numeroComprobantes>{1 if autorizaciones else 0}</numeroComprobantes>'
+                      f'<autorizaciones>{autorizaciones}</autorizaciones>'
+                      f'</RespuestaAutorizacionComprobante>')
+
+    def _autorizacion_lote(self, operacion):
+        nodo = operacion.xpath("*[local-name()='claveAccesoLote']")
+        clave_lote = (nodo[0].text or '').strip() if nodo else ''
+        nodos = []
+        with self._lock:
+            for clave in self.lotes.get(clave_lote, []):
+                comprobante = self.comprobantes[clave]
+                comprobante['consultas'] += 1
+                en_proceso = comprobante['consultas'] <= self.consultas_en_proceso
+                nodos.append(self._nodo_autorizacion(clave, comprobante, en_proceso, incluir_comprobante=True))
+
+        return _sobre(NS_AUTORIZACION, 'autorizacionComprobanteLoteResponse',
+                      f'<RespuestaAutorizacionLote>'
+                      f'<claveAccesoLoteConsultada>{escape(clave_lote)}</claveAccesoLoteConsultada>'
+                      f'<numeroComprobantesLote>{len(nodos)}</numeroComprobantesLote>'
+                      f'<autorizaciones>{"".join(nodos)}</autorizaciones>'
+                      f'</RespuestaAutorizacionLote>')
+
+    def _nodo_autorizacion(self, clave, comprobante, en_proceso=False, incluir_comprobante=False):
+        """Nodo <autorizacion> de un comprobante (en lotes incluye el XML para identificarlo)"""
+        xml = ''
+        if incluir_comprobante:
+            xml = '<comprobante><![CDATA[' + comprobante['xml'].replace(']]>', ']]]]><![CDATA[>') + ']]></comprobante>'
+        if en_proceso:
+            return f'<autorizacion><estado>EN PROCESO</estado>{xml}</autorizacion>'
+        if comprobante['estado'] == 'AUTORIZADO':
+            return (f'<autorizacion><estado>AUTORIZADO</estado>'
+                    f'<numeroAutorizacion>{clave}</numeroAutorizacion>'
+                    f'<fechaAutorizacion>{comprobante["fecha"]}</fechaAutorizacion>'
+                    f'<ambiente>PRUEBAS</ambiente>{xml}<mensajes/></autorizacion>')
+        return (f'<autorizacion><estado>NO AUTORIZADO</estado>'
+                f'<fechaAutorizacion>{comprobante["fecha"]}</fechaAutorizacion>'
+                f'<ambiente>PRUEBAS</ambiente>{xml}'
+                f'<mensajes>{_mensaje("39", "FIRMA INVALIDA")}</mensajes></autorizacion>')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor SRI simulado')
+    parser.add_argument('--puerto', type=int, default=8089)
+    parser.add_argument('--fallos', type=float, default=0.0, help='Probabilidad de HTTP 503')
+    parser.add_argument('--rechazos', type=float, default=0.0, help='Probabilidad de NO AUTORIZADO')
+    parser.add_argument('--demora', type=float, default=0.0, help='Latencia por llamada (s)')
+    parser.add_argument('--en-proceso', type=int, default=0,
+                        help='Consultas que responden EN PROCESO antes del resultado')
+    args = parser.parse_args()
+
+    servidor = ServidorSriSimulado(args.puerto, args.fallos, args.rechazos, args.demora, args.en_proceso)
+    print("=" * 70)
+    print("🏛️  SRI simulado escuchando")
+    print(f"   Recepción:    {servidor.url_recepcion}")
+    print(f"   Autorización: {servidor.url_autorizacion}")
+    print("=" * 70)
+    try:
+        servidor._http.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 SRI simulado detenido")
+
+
+if __name__ == '__main__':
+    main()
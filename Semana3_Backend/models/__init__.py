@@ -6,6 +6,10 @@ from models.user import Usuario
 from models.empresa import Empresa
 from models.cliente import Cliente
 from models.factura import Factura
+from models.documento_xml import DocumentoXml
+from models.factura_resumen import FacturaResumenDiario
+from models.secuencial import SecuencialFactura
+from models.cola_sri import ColaSri
 from models.audit_log import AuditLog
 from models.configuracion import Configuracion
 
@@ -15,6 +19,10 @@ __all__ = [
     'Empresa',
     'Cliente',
     'Factura',
+    'DocumentoXml',
+    'FacturaResumenDiario',
+    'SecuencialFactura',
+    'ColaSri',
     'AuditLog',
     'Configuracion'
 ]
@@ -0,0 +1,50 @@
+"""
+Modelo de Cola de Autorización SRI
+Facturas pendientes de enviar al SRI, procesadas en segundo plano
+"""
+from models.base import db
+from datetime import datetime
+
+
+class ColaSri(db.Model):
+    __tablename__ = 'cola_sri'
+    __table_args__ = (
+        db.Index('idx_cola_sri_estado_proximo', 'estado', 'proximo_intento'),
+    )
+
+    # Estados del trabajo en la cola
+    PENDIENTE = 'PENDIENTE'      # Esperando (primer envío o reintento)
+    EN_PROCESO = 'EN_PROCESO'    # Tomado por un worker hasta bloqueado_hasta
+    COMPLETADO = 'COMPLETADO'    # SRI respondió AUTORIZADO o RECHAZADO
+    FALLIDO = 'FALLIDO'          # Se agotaron los reintentos
+
+    id = db.Column(db.Integer, primary_key=True)
+    factura_id = db.Column(db.Integer, db.ForeignKey('factura.id', ondelete='CASCADE'),
+                           nullable=False, unique=True)
+
+    estado = db.Column(db.String(20), nullable=False, default=PENDIENTE)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    proximo_intento = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    bloqueado_hasta = db.Column(db.DateTime)
+    ultimo_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    factura = db.relationship('Factura')
+
+    def to_dict(self):
+        """Convertir a diccionario"""
+        return {
+            'id': self.id,
+            'factura_id': self.factura_id,
+            'estado': self.estado,
+            'intentos': self.intentos,
+            'proximo_intento': self.proximo_intento.isoformat() if self.proximo_intento else None,
+            'ultimo_error': self.ultimo_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<ColaSri factura={self.factura_id} {self.estado} intentos={self.intentos}>'
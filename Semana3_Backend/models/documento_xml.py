@@ -0,0 +1,22 @@
+"""
+Modelo de Documento XML
+Almacén de XML firmados comprimidos, direccionado por contenido (hash_sha256)
+"""
+from models.base import db
+from datetime import datetime
+
+
+class DocumentoXml(db.Model):
+    __tablename__ = 'documento_xml'
+
+    # Mismo hash que factura.hash_sha256: la factura apunta a su XML por valor
+    hash_sha256 = db.Column(db.String(64), primary_key=True)
+
+    compresion = db.Column(db.String(10), nullable=False)  # gzip o zstd
+    tamano = db.Column(db.Integer, nullable=False)  # Bytes del XML sin comprimir
+    contenido = db.Column(db.LargeBinary, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<DocumentoXml {self.hash_sha256[:12]} {self.compresion} {len(self.contenido or b"")}/{self.tamano}>'
@@ -8,6 +8,10 @@ from decimal import Decimal
 
 class Factura(db.Model):
     __tablename__ = 'factura'
+    __table_args__ = (
+        # Clave de orden de la paginación por cursor
+        db.Index('idx_factura_fecha_id', 'fecha_emision', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
@@ -27,21 +31,26 @@ class Factura(db.Model):
     # Items como JSONB
     items = db.Column(db.JSON, nullable=False)  # [{producto_id, codigo, nombre, cantidad, precio_unitario, iva_porcentaje}]
     
-    # XML firmado
-    xml_firmado = db.Column(db.Text)
+    # XML firmado: las facturas nuevas lo guardan comprimido en documento_xml
+    # (ver services/almacen_xml.py); esta columna solo queda para filas antiguas
+    xml_firmado = db.deferred(db.Column(db.Text))
     
     # Seguridad Criptográfica
     hash_sha256 = db.Column(db.String(64), nullable=False, index=True, unique=True)
-    firma_digital = db.Column(db.Text, nullable=False)  # Firma RSA en base64
+    firma_digital = db.Column(db.Text, nullable=False)  # Firma (RSA, ECDSA o Ed25519) en base64
+    # Modo FIRMA_MERKLE: firma_digital es la firma de la raíz y aquí va la
+    # prueba de inclusión '<raiz>:<hermanos>' (ver services/firma_merkle.py)
+    prueba_merkle = db.deferred(db.Column(db.Text))
+    # Clave que firmó (llavero claves_firma); NULL = clave RSA original
+    key_id = db.Column(db.String(16))
     
     # SRI (simulado)
     num_autorizacion = db.Column(db.String(49))  # Clave de acceso simulada
     fecha_autorizacion = db.Column(db.DateTime)
-    estado_sri = db.Column(db.String(20), default='AUTORIZADO')  # AUTORIZADO, RECHAZADO
+    estado_sri = db.Column(db.String(20), default='PENDIENTE')  # PENDIENTE, AUTORIZADO, RECHAZADO
     
-    # QR Codes
-    qr_image = db.Column(db.Text)  # Base64 data URI
-    qr_data = db.Column(db.Text)   # Texto del QR
+    # QR: solo el texto; la imagen se genera bajo demanda en /facturas/<id>/qr
+    qr_data = db.deferred(db.Column(db.Text), group='qr')
     
     # Estado y notas
     observaciones = db.Column(db.Text)
@@ -53,29 +62,39 @@ class Factura(db.Model):
     cliente = db.relationship('Cliente', back_populates='facturas')
     usuario = db.relationship('Usuario', back_populates='facturas')
     
-    def to_dict(self, include_items=True):
-        """Convertir a diccionario"""
-        data = {
-            'id': self.id,
-            'cliente_id': self.cliente_id,
-            'usuario_id': self.usuario_id,
-            'numero_factura': self.numero_factura,
-            'fecha_emision': self.fecha_emision.isoformat() if self.fecha_emision else None,
-            'subtotal': float(self.subtotal),
-            'iva': float(self.iva),
-            'total': float(self.total),
-            'hash_sha256': self.hash_sha256,
-            'num_autorizacion': self.num_autorizacion,
-            'fecha_autorizacion': self.fecha_autorizacion.isoformat() if self.fecha_autorizacion else None,
-            'estado_sri': self.estado_sri,
-            'qr_image': self.qr_image,
-            'qr_data': self.qr_data,
-            'observaciones': self.observaciones,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    # Campos que puede devolver to_dict (sparse fieldsets con ?fields=)
+    CAMPOS = (
+        'id', 'cliente_id', 'usuario_id', 'numero_factura', 'fecha_emision',
+        'subtotal', 'iva', 'total', 'hash_sha256', 'num_autorizacion',
+        'fecha_autorizacion', 'estado_sri', 'qr_data',
+        'observaciones', 'created_at', 'updated_at', 'items'
+    )
+    # Campos respaldados por columnas diferidas (grupo 'qr')
+    CAMPOS_PESADOS = ('qr_data',)
+    
+    def to_dict(self, include_items=True, fields=None):
+        """
+        Convertir a diccionario
+        
+        Args:
+            include_items: Incluir los items (solo si no se indica fields)
+            fields: Lista de campos de CAMPOS a incluir (None = todos)
+        """
+        if fields is None:
+            fields = [campo for campo in self.CAMPOS if campo != 'items' or include_items]
+        
+        data = {}
+        for campo in fields:
+            if campo == 'items':
+                continue
+            valor = getattr(self, campo)
+            if isinstance(valor, Decimal):
+                valor = float(valor)
+            elif isinstance(valor, datetime):
+                valor = valor.isoformat()
+            data[campo] = valor
         
-        if include_items and self.items:
+        if 'items' in fields and self.items:
             # Manejar items como string JSON o como dict
             import json
             if isinstance(self.items, str):
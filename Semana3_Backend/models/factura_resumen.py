@@ -0,0 +1,111 @@
+"""
+Modelo de Resumen Diario de Facturación
+Totales por día, estado SRI, usuario y cliente mantenidos al crear facturas
+"""
+from models.base import db
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+class FacturaResumenDiario(db.Model):
+    __tablename__ = 'factura_resumen_diario'
+    __table_args__ = (
+        db.UniqueConstraint('fecha', 'estado_sri', 'usuario_id', 'cliente_id',
+                            name='uq_factura_resumen_diario'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.Date, nullable=False, index=True)
+    estado_sri = db.Column(db.String(20), nullable=False)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    cliente_id = db.Column(db.Integer, db.ForeignKey('cliente.id'), nullable=False)
+
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+    @classmethod
+    def acumular(cls, fecha, estado_sri, usuario_id, cliente_id, cantidad=1, total=0):
+        """
+        Sumar facturas al resumen dentro de la transacción actual (upsert)
+
+        Args:
+            fecha: Fecha de emisión (date)
+            estado_sri: Estado SRI de las facturas
+            usuario_id: Usuario emisor
+            cliente_id: Cliente facturado
+            cantidad: Número de facturas a sumar (negativo para restar)
+            total: Importe a sumar (negativo para restar)
+        """
+        dialecto = db.session.get_bind().dialect.name
+        insert_dialecto = postgresql.insert if dialecto == 'postgresql' else sqlite.insert
+
+        stmt = insert_dialecto(cls.__table__).values(
+            fecha=fecha,
+            estado_sri=estado_sri or 'AUTORIZADO',
+            usuario_id=usuario_id,
+            cliente_id=cliente_id,
+            cantidad=cantidad,
+            total=total
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['fecha', 'estado_sri', 'usuario_id', 'cliente_id'],
+            set_={
+                'cantidad': cls.__table__.c.cantidad + stmt.excluded.cantidad,
+                'total': cls.__table__.c.total + stmt.excluded.total
+            }
+        )
+        db.session.execute(stmt)
+
+    @classmethod
+    def mover(cls, fecha, estado_anterior, estado_nuevo, usuario_id, cliente_id, total):
+        """
+        Pasar una factura de un estado SRI a otro en el resumen (transacción actual)
+        """
+        cls.acumular(fecha, estado_anterior, usuario_id, cliente_id, cantidad=-1, total=-total)
+        cls.acumular(fecha, estado_nuevo, usuario_id, cliente_id, cantidad=1, total=total)
+
+    @classmethod
+    def reconstruir(cls):
+        """
+        Recalcular el resumen completo desde la tabla factura
+
+        Returns:
+            int: Número de filas de resumen generadas
+        """
+        from models.factura import Factura
+
+        fecha = func.date(Factura.fecha_emision)
+        estado = func.coalesce(Factura.estado_sri, 'AUTORIZADO')
+        origen = select(
+            fecha,
+            estado,
+            Factura.usuario_id,
+            Factura.cliente_id,
+            func.count(Factura.id),
+            func.coalesce(func.sum(Factura.total), 0)
+        ).group_by(fecha, estado, Factura.usuario_id, Factura.cliente_id)
+
+        db.session.execute(db.delete(cls))
+        db.session.execute(
+            insert(cls).from_select(
+                ['fecha', 'estado_sri', 'usuario_id', 'cliente_id', 'cantidad', 'total'],
+                origen
+            )
+        )
+        db.session.commit()
+        return cls.query.count()
+
+    def to_dict(self):
+        """Convertir a diccionario"""
+        return {
+            'id': self.id,
+            'fecha': self.fecha.isoformat() if self.fecha else None,
+            'estado_sri': self.estado_sri,
+            'usuario_id': self.usuario_id,
+            'cliente_id': self.cliente_id,
+            'cantidad': self.cantidad,
+            'total': float(self.total)
+        }
+
+    def __repr__(self):
+        return f'<FacturaResumenDiario {self.fecha} {self.estado_sri}>'
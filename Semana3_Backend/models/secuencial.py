@@ -0,0 +1,32 @@
+"""
+Modelo de Secuencial de Facturas
+Contador por establecimiento y punto de emisión (numeración SRI)
+"""
+from models.base import db
+from datetime import datetime
+
+
+class SecuencialFactura(db.Model):
+    __tablename__ = 'secuencial_factura'
+    __table_args__ = (
+        db.UniqueConstraint('establecimiento', 'punto_emision', name='uq_secuencial_factura'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    establecimiento = db.Column(db.String(3), nullable=False)
+    punto_emision = db.Column(db.String(3), nullable=False)
+    ultimo = db.Column(db.BigInteger, nullable=False, default=0)  # Último secuencial asignado
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convertir a diccionario"""
+        return {
+            'id': self.id,
+            'establecimiento': self.establecimiento,
+            'punto_emision': self.punto_emision,
+            'ultimo': self.ultimo,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def __repr__(self):
+        return f'<SecuencialFactura {self.establecimiento}-{self.punto_emision}: {self.ultimo}>'
@@ -0,0 +1,23 @@
+"""
+Script para reconstruir el resumen diario de facturación
+Recalcula factura_resumen_diario desde la tabla factura (backfill)
+"""
+from app import create_app
+from models.base import db
+from models.factura_resumen import FacturaResumenDiario
+
+def reconstruir_resumen():
+    """Recalcular todas las filas del resumen diario"""
+    app = create_app()
+    
+    with app.app_context():
+        print("📦 Creando tabla de resumen si no existe...")
+        FacturaResumenDiario.__table__.create(db.engine, checkfirst=True)
+        
+        print("🔄 Recalculando resumen diario desde facturas...")
+        filas = FacturaResumenDiario.reconstruir()
+        
+        print(f"✅ Resumen reconstruido: {filas} filas")
+
+if __name__ == '__main__':
+    reconstruir_resumen()
@@ -0,0 +1,29 @@
+"""
+Script de rotación de la clave de firma de facturas
+Genera una clave nueva y la activa; las anteriores se conservan en el
+llavero para seguir verificando las facturas que firmaron.
+
+Uso:
+    python rotar_clave_firma.py            # mismo algoritmo (FIRMA_ALGORITMO)
+    python rotar_clave_firma.py ed25519    # rsa, ecdsa-p256 o ed25519
+Reiniciar la aplicación después para que firme con la clave nueva.
+"""
+import sys
+from app import create_app
+from services.firmantes import rotar_clave, leer_llavero
+
+def rotar_clave_firma(algoritmo=None):
+    """Rotar la clave activa"""
+    app = create_app()
+
+    with app.app_context():
+        algoritmo = algoritmo or app.config.get('FIRMA_ALGORITMO', 'rsa')
+        clave = rotar_clave(algoritmo)
+        _, llavero = leer_llavero()
+        print(f"🔑 Nueva clave activa: {clave['key_id']} ({clave['algoritmo']})")
+        print(f"🗝️  Claves en el llavero: {len(llavero['claves'])}")
+        if algoritmo != app.config.get('FIRMA_ALGORITMO', 'rsa'):
+            print(f"⚠️  Configure FIRMA_ALGORITMO={algoritmo} o al reiniciar se generará otra clave")
+
+if __name__ == '__main__':
+    rotar_clave_firma(sys.argv[1] if len(sys.argv) > 1 else None)
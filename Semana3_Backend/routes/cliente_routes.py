@@ -8,6 +8,7 @@ from models.base import db
 from models.cliente import Cliente
 from services.crypto_service import get_crypto_service
 from services.auth_service import AuthService
+from services.pagination import paginar_por_cursor, leer_limite
 
 cliente_bp = Blueprint('clientes', __name__)
 
@@ -22,6 +23,8 @@ def list_clientes():
         activo: Filtrar por estado (true/false)
         page: Número de página (default: 1)
         limit: Registros por página (default: 20)
+        cursor: Activa la paginación por cursor sobre id (vacío para la primera página)
+        count: true para incluir el total en modo cursor
     """
     try:
         # Obtener parámetros
@@ -36,64 +39,64 @@ def list_clientes():
             activo_bool = activo.lower() == 'true'
             query = query.filter_by(activo=activo_bool)
         
-        # Ordenar por ID
-        query = query.order_by(Cliente.id.asc())
-        
-        # Paginación
-        pagination = query.paginate(page=page, per_page=limit, error_out=False)
+        modo_cursor = 'cursor' in request.args
+        if modo_cursor:
+            # Paginación por cursor sobre id, sin COUNT ni OFFSET
+            limit = leer_limite(limit)
+            pagina = paginar_por_cursor(
+                query,
+                [Cliente.id],
+                cursor=request.args.get('cursor'),
+                limit=limit,
+                contar=request.args.get('count', '').lower() == 'true'
+            )
+            items = pagina['items']
+            pagination_data = {
+                'limit': limit,
+                'next_cursor': pagina['next_cursor']
+            }
+            if pagina['total'] is not None:
+                pagination_data['total'] = pagina['total']
+        else:
+            # Ordenar por ID
+            query = query.order_by(Cliente.id.asc())
+            
+            # Paginación
+            pagination = query.paginate(page=page, per_page=limit, error_out=False)
+            items = pagination.items
+            pagination_data = {
+                'page': page,
+                'limit': limit,
+                'total': pagination.total,
+                'pages': pagination.pages
+            }
         
-        # ✅ CRÍTICO: Descifrar datos de cada cliente
+        # ✅ CRÍTICO: Descifrar datos de todos los clientes en una sola pasada
         crypto = get_crypto_service()
-        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        resultados = crypto.decrypt_clientes(items)
         clientes_list = []
         
-        for cliente in pagination.items:
-            # Descifrar datos sensibles (ahora están concatenados)
-            try:
-                if cliente.nombres_enc:
-                    # Reconstruir datos cifrados
-                    encrypted_data = cliente.nombres_enc + cliente.tag
-                    aesgcm = AESGCM(crypto.aes_master_key)
-                    decrypted_all = aesgcm.decrypt(cliente.iv, encrypted_data, None).decode('utf-8')
-                    
-                    # Separar por el delimitador
-                    partes = decrypted_all.split('|')
-                    decrypted_data = {
-                        'nombres': partes[0] if len(partes) > 0 else '',
-                        'apellidos': partes[1] if len(partes) > 1 else '',
-                        'direccion': partes[2] if len(partes) > 2 else '',
-                        'telefono': partes[3] if len(partes) > 3 else '',
-                        'email': partes[4] if len(partes) > 4 else ''
-                    }
-                else:
-                    decrypted_data = {
-                        'nombres': '',
-                        'apellidos': '',
-                        'direccion': '',
-                        'telefono': '',
-                        'email': ''
-                    }
-                clientes_list.append(cliente.to_dict(decrypted_data=decrypted_data))
-            except Exception as e:
-                print(f"⚠️  Error descifrando cliente {cliente.id}: {str(e)}")
-                import traceback
-                traceback.print_exc()
+        for cliente, resultado in zip(items, resultados):
+            if resultado['error']:
+                print(f"⚠️  Error descifrando cliente {cliente.id}: {resultado['error']}")
                 # Incluir con valores por defecto si hay error
                 clientes_list.append(cliente.to_dict())
+            else:
+                clientes_list.append(cliente.to_dict(decrypted_data=resultado['datos']))
         
         return jsonify({
             'success': True,
             'data': {
                 'clientes': clientes_list,
-                'pagination': {
-                    'page': page,
-                    'limit': limit,
-                    'total': pagination.total,
-                    'pages': pagination.pages
-                }
+                'pagination': pagination_data
             }
         }), 200
         
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         print(f"❌ Error listando clientes: {str(e)}")
         import traceback
@@ -120,43 +123,10 @@ def get_cliente(cliente_id):
         
         # Descifrar datos (ahora están concatenados)
         crypto = get_crypto_service()
-        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-        
-        if cliente.nombres_enc:
-            try:
-                # Reconstruir datos cifrados
-                encrypted_data = cliente.nombres_enc + cliente.tag
-                aesgcm = AESGCM(crypto.aes_master_key)
-                decrypted_all = aesgcm.decrypt(cliente.iv, encrypted_data, None).decode('utf-8')
-                
-                # Separar por el delimitador
-                partes = decrypted_all.split('|')
-                decrypted_data = {
-                    'nombres': partes[0] if len(partes) > 0 else '',
-                    'apellidos': partes[1] if len(partes) > 1 else '',
-                    'direccion': partes[2] if len(partes) > 2 else '',
-                    'telefono': partes[3] if len(partes) > 3 else '',
-                    'email': partes[4] if len(partes) > 4 else ''
-                }
-            except Exception as e:
-                print(f"❌ Error descifrando cliente {cliente_id}: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                decrypted_data = {
-                    'nombres': '[ERROR_DESCIFRADO]',
-                    'apellidos': '[ERROR_DESCIFRADO]',
-                    'direccion': '[ERROR_DESCIFRADO]',
-                    'telefono': '[ERROR_DESCIFRADO]',
-                    'email': '[ERROR_DESCIFRADO]'
-                }
-        else:
-            decrypted_data = {
-                'nombres': '',
-                'apellidos': '',
-                'direccion': '',
-                'telefono': '',
-                'email': ''
-            }
+        resultado = crypto.decrypt_clientes([cliente])[0]
+        if resultado['error']:
+            print(f"❌ Error descifrando cliente {cliente_id}: {resultado['error']}")
+        decrypted_data = resultado['datos']
         
         return jsonify({
             'success': True,
@@ -209,47 +179,18 @@ def create_cliente():
         # ✅ CRÍTICO: Cifrar datos sensibles
         crypto = get_crypto_service()
         
-        # Generar un solo IV para todos los campos (correcto en AES-GCM)
-        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-        import os
-        iv = os.urandom(12)  # 96 bits para GCM
-        
-        # Cifrar cada campo con el mismo IV pero diferentes datos
         nombres_val = data.get('nombres', '')
         apellidos_val = data.get('apellidos', '')
         direccion_val = data.get('direccion', '')
         telefono_val = data.get('telefono', '')
         email_val = data.get('email', '')
         
-        # Cifrar con AES-GCM usando el mismo IV
-        aesgcm = AESGCM(crypto.aes_master_key)
-        nombres_enc = aesgcm.encrypt(iv, nombres_val.encode('utf-8'), None) if nombres_val else b''
-        apellidos_enc = aesgcm.encrypt(iv, apellidos_val.encode('utf-8'), None) if apellidos_val else b''
-        direccion_enc = aesgcm.encrypt(iv, direccion_val.encode('utf-8'), None) if direccion_val else b''
-        telefono_enc = aesgcm.encrypt(iv, telefono_val.encode('utf-8'), None) if telefono_val else b''
-        email_enc = aesgcm.encrypt(iv, email_val.encode('utf-8'), None) if email_val else b''
-        
-        # Separar ciphertext y tag (GCM concatena automáticamente: ciphertext + tag de 16 bytes)
-        def split_gcm(encrypted_data):
-            if not encrypted_data:
-                return b'', b''
-            return encrypted_data[:-16], encrypted_data[-16:]
-        
-        nombres_cipher, nombres_tag = split_gcm(nombres_enc)
-        apellidos_cipher, apellidos_tag = split_gcm(apellidos_enc)
-        direccion_cipher, direccion_tag = split_gcm(direccion_enc)
-        telefono_cipher, telefono_tag = split_gcm(telefono_enc)
-        email_cipher, email_tag = split_gcm(email_enc)
-        
-        # Usar el tag del primer campo (todos deberían funcionar con el mismo IV)
-        # Nota: En realidad, cada campo tiene su propio tag, voy a usar una estrategia diferente
-        # MEJOR: Guardar todos los tags concatenados y separarlos al descifrar
-        
-        # Por ahora, voy a usar el enfoque simple: concatenar todos los datos, cifrar UNA SOLA VEZ
+        # Concatenar todos los datos y cifrar UNA SOLA VEZ (IV aleatorio por registro)
         datos_concatenados = f"{nombres_val}|{apellidos_val}|{direccion_val}|{telefono_val}|{email_val}"
-        encrypted_all = aesgcm.encrypt(iv, datos_concatenados.encode('utf-8'), None)
-        ciphertext_all = encrypted_all[:-16]
-        tag_all = encrypted_all[-16:]
+        cifrado = crypto.cifrar_aes_gcm(datos_concatenados)
+        iv = cifrado['iv']
+        ciphertext_all = cifrado['ciphertext']
+        tag_all = cifrado['tag']
         
         # Crear cliente con datos cifrados en un solo bloque
         cliente = Cliente(
@@ -352,28 +293,19 @@ def update_cliente(cliente_id):
         
         # ✅ CRÍTICO: Cifrar datos sensibles si se proporcionan
         crypto = get_crypto_service()
-        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-        import os
         
         if any(key in data for key in ['nombres', 'apellidos', 'direccion', 'telefono', 'email']):
             # Primero descifrar los datos actuales para mantener los que no se editan
-            try:
-                if cliente.nombres_enc:
-                    encrypted_data = cliente.nombres_enc + cliente.tag
-                    aesgcm = AESGCM(crypto.aes_master_key)
-                    decrypted_all = aesgcm.decrypt(cliente.iv, encrypted_data, None).decode('utf-8')
-                    partes = decrypted_all.split('|')
-                    
-                    # Valores actuales
-                    current_nombres = partes[0] if len(partes) > 0 else ''
-                    current_apellidos = partes[1] if len(partes) > 1 else ''
-                    current_direccion = partes[2] if len(partes) > 2 else ''
-                    current_telefono = partes[3] if len(partes) > 3 else ''
-                    current_email = partes[4] if len(partes) > 4 else ''
-                else:
-                    current_nombres = current_apellidos = current_direccion = current_telefono = current_email = ''
-            except:
-                current_nombres = current_apellidos = current_direccion = current_telefono = current_email = ''
+            resultado = crypto.decrypt_clientes([cliente])[0]
+            if resultado['error']:
+                current = {campo: '' for campo in resultado['datos']}
+            else:
+                current = resultado['datos']
+            current_nombres = current['nombres']
+            current_apellidos = current['apellidos']
+            current_direccion = current['direccion']
+            current_telefono = current['telefono']
+            current_email = current['email']
             
             # Usar valores nuevos si se proporcionan, sino mantener actuales
             new_nombres = data.get('nombres', current_nombres)
@@ -382,15 +314,12 @@ def update_cliente(cliente_id):
             new_telefono = data.get('telefono', current_telefono)
             new_email = data.get('email', current_email)
             
-            # Generar nuevo IV
-            iv = os.urandom(12)
-            
-            # Concatenar y cifrar todo junto
+            # Concatenar y cifrar todo junto (nuevo IV)
             datos_concatenados = f"{new_nombres}|{new_apellidos}|{new_direccion}|{new_telefono}|{new_email}"
-            aesgcm = AESGCM(crypto.aes_master_key)
-            encrypted_all = aesgcm.encrypt(iv, datos_concatenados.encode('utf-8'), None)
-            ciphertext_all = encrypted_all[:-16]
-            tag_all = encrypted_all[-16:]
+            cifrado = crypto.cifrar_aes_gcm(datos_concatenados)
+            iv = cifrado['iv']
+            ciphertext_all = cifrado['ciphertext']
+            tag_all = cifrado['tag']
             
             # Actualizar campos
             cliente.nombres_enc = ciphertext_all
@@ -413,36 +342,10 @@ def update_cliente(cliente_id):
         )
         
         # Descifrar para respuesta usando el nuevo formato
-        try:
-            if cliente.nombres_enc:
-                encrypted_data = cliente.nombres_enc + cliente.tag
-                aesgcm = AESGCM(crypto.aes_master_key)
-                decrypted_all = aesgcm.decrypt(cliente.iv, encrypted_data, None).decode('utf-8')
-                partes = decrypted_all.split('|')
-                decrypted_data = {
-                    'nombres': partes[0] if len(partes) > 0 else '',
-                    'apellidos': partes[1] if len(partes) > 1 else '',
-                    'direccion': partes[2] if len(partes) > 2 else '',
-                    'telefono': partes[3] if len(partes) > 3 else '',
-                    'email': partes[4] if len(partes) > 4 else ''
-                }
-            else:
-                decrypted_data = {
-                    'nombres': '',
-                    'apellidos': '',
-                    'direccion': '',
-                    'telefono': '',
-                    'email': ''
-                }
-        except Exception as e:
-            print(f"❌ Error descifrando respuesta: {str(e)}")
-            decrypted_data = {
-                'nombres': '[ERROR_DESCIFRADO]',
-                'apellidos': '[ERROR_DESCIFRADO]',
-                'direccion': '[ERROR_DESCIFRADO]',
-                'telefono': '[ERROR_DESCIFRADO]',
-                'email': '[ERROR_DESCIFRADO]'
-            }
+        resultado = crypto.decrypt_clientes([cliente])[0]
+        if resultado['error']:
+            print(f"❌ Error descifrando respuesta: {resultado['error']}")
+        decrypted_data = resultado['datos']
         
         return jsonify({
             'success': True,
@@ -3,19 +3,26 @@ Rutas de API para Facturas Electrónicas
 Endpoints para crear, listar y verificar facturas con firmas RSA y QR
 """
 
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+import math
 from io import BytesIO
 from datetime import datetime
 
 from models import db
 from models.factura import Factura
+from models.documento_xml import DocumentoXml
 from models.cliente import Cliente
-from models.user import Usuario
-from models.audit_log import AuditLog
+from models.factura_resumen import FacturaResumenDiario
 from services.factura_service import FacturaService
 from services.crypto_service import get_crypto_service
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from services.audit_sink import get_audit_sink
+from services.pagination import paginar_por_cursor, leer_limite
+from services.pool_bd import con_statement_timeout
+from services.qr_service import get_qr_service, FORMATOS_QR
+from services.almacen_xml import iterar_descomprimido
+from services.verificacion_publica import get_verificacion_publica
+from services.token_verificacion import get_emisor_tokens, get_verificador_tokens
 
 factura_bp = Blueprint('facturas', __name__)
 
@@ -27,6 +34,45 @@ def get_factura_service():
     return get_factura_service._service
 
 
+# Campos por defecto del listado: todo menos las columnas pesadas (QR)
+CAMPOS_LISTADO = tuple(
+    campo for campo in Factura.CAMPOS if campo not in Factura.CAMPOS_PESADOS
+) + ('cliente',)
+CAMPOS_PERMITIDOS = Factura.CAMPOS + ('cliente', 'usuario')
+
+
+def leer_campos(valor, por_defecto):
+    """
+    Leer el parámetro ?fields= (lista separada por comas)
+    
+    Raises:
+        ValueError: Si se pide un campo que no existe
+    """
+    if not valor:
+        return list(por_defecto)
+    
+    campos = [campo.strip() for campo in valor.split(',') if campo.strip()]
+    invalidos = [campo for campo in campos if campo not in CAMPOS_PERMITIDOS]
+    if invalidos:
+        raise ValueError(f"Campos inválidos en fields: {', '.join(invalidos)}")
+    return campos
+
+
+def opciones_carga(campos):
+    """
+    Opciones de carga para traer de BD solo las columnas que se van a serializar
+    """
+    columnas = {'id', 'cliente_id', 'usuario_id', 'fecha_emision'}
+    columnas.update(campo for campo in campos if campo in Factura.CAMPOS)
+    opciones = [db.load_only(*[getattr(Factura, columna) for columna in columnas])]
+    
+    if 'cliente' in campos:
+        opciones.append(db.joinedload(Factura.cliente))
+    if 'usuario' in campos:
+        opciones.append(db.joinedload(Factura.usuario))
+    return opciones
+
+
 @factura_bp.route('/', methods=['GET'])
 @jwt_required()
 def listar_facturas():
@@ -34,6 +80,11 @@ def listar_facturas():
     GET /api/v1/facturas
     Lista todas las facturas con paginación
     Query params: page, per_page, cliente_id, fecha_desde, fecha_hasta
+    fields: Campos a devolver separados por comas (p. ej. id,numero_factura,total,cliente)
+            Por defecto todos excepto qr_data
+    Modo cursor (opcional): cursor, limit, count=true
+        Se activa al enviar ?cursor= (vacío para la primera página); ordena por
+        (fecha_emision, id) descendente y devuelve next_cursor en lugar de pages
     """
     try:
         page = request.args.get('page', 1, type=int)
@@ -41,9 +92,10 @@ def listar_facturas():
         cliente_id = request.args.get('cliente_id', type=int)
         fecha_desde = request.args.get('fecha_desde')
         fecha_hasta = request.args.get('fecha_hasta')
+        campos = leer_campos(request.args.get('fields'), CAMPOS_LISTADO)
         
-        # Query base
-        query = Factura.query
+        # Query base: solo las columnas pedidas y el cliente en el mismo SELECT (sin N+1)
+        query = Factura.query.options(*opciones_carga(campos))
         
         # Filtros
         if cliente_id:
@@ -63,54 +115,67 @@ def listar_facturas():
             except:
                 pass
         
-        # Ordenar por fecha descendente
-        query = query.order_by(Factura.fecha_emision.desc())
+        modo_cursor = 'cursor' in request.args
+        if modo_cursor:
+            # Paginación por cursor sobre (fecha_emision, id), sin COUNT ni OFFSET
+            limit = leer_limite(request.args.get('limit', per_page))
+            pagina = paginar_por_cursor(
+                query,
+                [Factura.fecha_emision, Factura.id],
+                cursor=request.args.get('cursor'),
+                limit=limit,
+                descendente=True,
+                contar=request.args.get('count', '').lower() == 'true'
+            )
+            items = pagina['items']
+        else:
+            # Ordenar por fecha descendente
+            query = query.order_by(Factura.fecha_emision.desc())
+            
+            # Paginar
+            pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+            items = pagination.items
         
-        # Paginar
-        pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Descifrar una sola vez cada cliente distinto de la página
+        crypto = get_crypto_service()
+        clientes = list({
+            factura.cliente.id: factura.cliente
+            for factura in items if 'cliente' in campos and factura.cliente
+        }.values())
+        resultados = crypto.decrypt_clientes(clientes, fields=('nombres', 'apellidos'))
+        descifrados = {}
+        for cliente, resultado in zip(clientes, resultados):
+            if resultado['error']:
+                print(f"⚠️ Error descifrando cliente {cliente.id}: {resultado['error']}")
+            descifrados[cliente.id] = resultado['datos']
         
         # Incluir datos del cliente en cada factura
-        crypto = get_crypto_service()
         facturas_data = []
-        for factura in pagination.items:
-            factura_dict = factura.to_dict(include_items=True)
+        for factura in items:
+            factura_dict = factura.to_dict(fields=campos)
             
-            # Agregar datos del cliente (desencriptados)
-            cliente = Cliente.query.get(factura.cliente_id)
+            cliente = factura.cliente if 'cliente' in campos else None
             if cliente:
-                # Descifrar datos concatenados
-                try:
-                    if cliente.nombres_enc:
-                        encrypted_data = cliente.nombres_enc + cliente.tag
-                        aesgcm = AESGCM(crypto.aes_master_key)
-                        decrypted_all = aesgcm.decrypt(cliente.iv, encrypted_data, None).decode('utf-8')
-                        partes = decrypted_all.split('|')
-                        decrypted_data = {
-                            'nombres': partes[0] if len(partes) > 0 else '',
-                            'apellidos': partes[1] if len(partes) > 1 else ''
-                        }
-                    else:
-                        decrypted_data = {'nombres': '', 'apellidos': ''}
-                    
-                    factura_dict['cliente'] = {
-                        'id': cliente.id,
-                        'identificacion': cliente.identificacion,
-                        'tipo_identificacion': cliente.tipo_identificacion,
-                        'nombres': decrypted_data.get('nombres', '[ERROR_DESCIFRADO]'),
-                        'apellidos': decrypted_data.get('apellidos', '[ERROR_DESCIFRADO]')
-                    }
-                except Exception as e:
-                    print(f"⚠️ Error descifrando cliente {cliente.id}: {e}")
-                    factura_dict['cliente'] = {
-                        'id': cliente.id,
-                        'identificacion': cliente.identificacion,
-                        'tipo_identificacion': cliente.tipo_identificacion,
-                        'nombres': '[ERROR_DESCIFRADO]',
-                        'apellidos': '[ERROR_DESCIFRADO]'
-                    }
+                factura_dict['cliente'] = {
+                    'id': cliente.id,
+                    'identificacion': cliente.identificacion,
+                    'tipo_identificacion': cliente.tipo_identificacion,
+                    'nombres': descifrados[cliente.id]['nombres'],
+                    'apellidos': descifrados[cliente.id]['apellidos']
+                }
             
             facturas_data.append(factura_dict)
         
+        if modo_cursor:
+            respuesta = {
+                'facturas': facturas_data,
+                'next_cursor': pagina['next_cursor'],
+                'limit': limit
+            }
+            if pagina['total'] is not None:
+                respuesta['total'] = pagina['total']
+            return jsonify(respuesta), 200
+        
         return jsonify({
             'facturas': facturas_data,
             'total': pagination.total,
@@ -119,6 +184,8 @@ def listar_facturas():
             'per_page': per_page
         }), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"❌ Error listando facturas: {e}")
         return jsonify({'error': 'Error interno del servidor'}), 500
@@ -129,7 +196,7 @@ def listar_facturas():
 def crear_factura():
     """
     POST /api/v1/facturas
-    Crea una factura electrónica con firma RSA y QR
+    Crea una factura electrónica con firma RSA
     Body: {cliente_id, items: [{codigo, nombre, cantidad, precio_unitario, iva_porcentaje}], observaciones}
     """
     try:
@@ -157,19 +224,13 @@ def crear_factura():
         )
         
         # Registrar auditoría
-        audit_log = AuditLog(
+        get_audit_sink().registrar(
             usuario_id=current_user_id,
             accion='CREATE',
             entidad='facturas',
             entidad_id=factura.id,
-            datos_anteriores=None,
-            datos_nuevos={'numero_factura': factura.numero_factura, 'total': float(factura.total)},
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent', ''),
-            resultado='EXITO'
+            datos_nuevos={'numero_factura': factura.numero_factura, 'total': float(factura.total)}
         )
-        db.session.add(audit_log)
-        db.session.commit()
         
         # Preparar respuesta con datos completos
         factura_dict = factura.to_dict(include_items=True)
@@ -178,32 +239,16 @@ def crear_factura():
         cliente = Cliente.query.get(factura.cliente_id)
         if cliente:
             # Descifrar datos concatenados
-            crypto = get_crypto_service()
-            try:
-                if cliente.nombres_enc:
-                    encrypted_data = cliente.nombres_enc + cliente.tag
-                    aesgcm = AESGCM(crypto.aes_master_key)
-                    decrypted_all = aesgcm.decrypt(cliente.iv, encrypted_data, None).decode('utf-8')
-                    partes = decrypted_all.split('|')
-                    decrypted_data = {
-                        'nombres': partes[0] if len(partes) > 0 else '',
-                        'apellidos': partes[1] if len(partes) > 1 else ''
-                    }
-                else:
-                    decrypted_data = {'nombres': '', 'apellidos': ''}
-                
-                factura_dict['cliente'] = {
-                    'identificacion': cliente.identificacion,
-                    'nombres': decrypted_data.get('nombres', '[ERROR_DESCIFRADO]'),
-                    'apellidos': decrypted_data.get('apellidos', '[ERROR_DESCIFRADO]')
-                }
-            except Exception as e:
-                print(f"⚠️ Error descifrando cliente {cliente.id}: {e}")
-                factura_dict['cliente'] = {
-                    'identificacion': cliente.identificacion,
-                    'nombres': '[ERROR_DESCIFRADO]',
-                    'apellidos': '[ERROR_DESCIFRADO]'
-                }
+            resultado = get_crypto_service().decrypt_clientes(
+                [cliente], fields=('nombres', 'apellidos')
+            )[0]
+            if resultado['error']:
+                print(f"⚠️ Error descifrando cliente {cliente.id}: {resultado['error']}")
+            factura_dict['cliente'] = {
+                'identificacion': cliente.identificacion,
+                'nombres': resultado['datos']['nombres'],
+                'apellidos': resultado['datos']['apellidos']
+            }
         
         return jsonify(factura_dict), 201
         
@@ -215,51 +260,90 @@ def crear_factura():
         return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
 
 
+@factura_bp.route('/lote', methods=['POST'])
+@jwt_required()
+def crear_facturas_lote():
+    """
+    POST /api/v1/facturas/lote
+    Crea varias facturas en una sola petición (XML y firma en paralelo)
+    Body: {facturas: [{cliente_id, items, observaciones}, ...]}
+    Respuesta: un resultado por factura, en el mismo orden del body
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        facturas = data.get('facturas')
+        
+        if not facturas or not isinstance(facturas, list):
+            return jsonify({'error': 'facturas es requerido y debe contener al menos una factura'}), 400
+        
+        maximo = current_app.config.get('FACTURA_LOTE_MAX', 500)
+        if len(facturas) > maximo:
+            return jsonify({'error': f'El lote no puede superar {maximo} facturas'}), 400
+        
+        resultados = get_factura_service().crear_facturas_lote(
+            usuario_id=current_user_id,
+            facturas=facturas
+        )
+        creadas = [r['factura'] for r in resultados if r['success']]
+        
+        # Registrar auditoría (una entrada por lote)
+        get_audit_sink().registrar(
+            usuario_id=current_user_id,
+            accion='CREATE',
+            entidad='facturas',
+            datos_nuevos={
+                'lote': len(facturas),
+                'creadas': len(creadas),
+                'numeros_factura': [f['numero_factura'] for f in creadas]
+            },
+            resultado='EXITO' if creadas else 'ERROR'
+        )
+        
+        return jsonify({
+            'resultados': resultados,
+            'creadas': len(creadas),
+            'errores': len(facturas) - len(creadas)
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error creando lote de facturas: {e}")
+        db.session.rollback()
+        return jsonify({'error': f'Error interno del servidor: {str(e)}'}), 500
+
+
 @factura_bp.route('/<int:factura_id>', methods=['GET'])
 @jwt_required()
 def obtener_factura(factura_id):
     """
     GET /api/v1/facturas/:id
     Obtiene una factura específica con todos sus datos
+    Query params: fields (opcional, mismos campos que el listado más usuario)
     """
     try:
-        factura = Factura.query.get(factura_id)
+        campos = leer_campos(request.args.get('fields'), CAMPOS_PERMITIDOS)
+        factura = Factura.query.options(
+            *opciones_carga(campos)
+        ).filter_by(id=factura_id).first()
         
         if not factura:
             return jsonify({'error': 'Factura no encontrada'}), 404
         
-        factura_dict = factura.to_dict(include_items=True)
+        factura_dict = factura.to_dict(fields=campos)
         
         # Agregar datos completos del cliente
-        cliente = Cliente.query.get(factura.cliente_id)
+        cliente = factura.cliente if 'cliente' in campos else None
         if cliente:
             # Descifrar datos concatenados
-            crypto = get_crypto_service()
-            try:
-                if cliente.nombres_enc:
-                    encrypted_data = cliente.nombres_enc + cliente.tag
-                    aesgcm = AESGCM(crypto.aes_master_key)
-                    decrypted_all = aesgcm.decrypt(cliente.iv, encrypted_data, None).decode('utf-8')
-                    partes = decrypted_all.split('|')
-                    decrypted_data = {
-                        'nombres': partes[0] if len(partes) > 0 else '',
-                        'apellidos': partes[1] if len(partes) > 1 else '',
-                        'direccion': partes[2] if len(partes) > 2 else '',
-                        'telefono': partes[3] if len(partes) > 3 else '',
-                        'email': partes[4] if len(partes) > 4 else ''
-                    }
-                else:
-                    decrypted_data = {'nombres': '', 'apellidos': '', 'direccion': '', 'telefono': '', 'email': ''}
-                
-                factura_dict['cliente'] = cliente.to_dict(decrypted_data=decrypted_data)
-            except Exception as e:
-                print(f"⚠️ Error descifrando cliente {cliente.id}: {e}")
-                import traceback
-                traceback.print_exc()
+            resultado = get_crypto_service().decrypt_clientes([cliente])[0]
+            if resultado['error']:
+                print(f"⚠️ Error descifrando cliente {cliente.id}: {resultado['error']}")
                 factura_dict['cliente'] = cliente.to_dict()
+            else:
+                factura_dict['cliente'] = cliente.to_dict(decrypted_data=resultado['datos'])
         
         # Agregar datos del usuario emisor
-        usuario = Usuario.query.get(factura.usuario_id)
+        usuario = factura.usuario if 'usuario' in campos else None
         if usuario:
             factura_dict['usuario'] = {
                 'id': usuario.id,
@@ -270,6 +354,8 @@ def obtener_factura(factura_id):
         
         return jsonify(factura_dict), 200
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"❌ Error obteniendo factura: {e}")
         import traceback
@@ -283,44 +369,132 @@ def descargar_xml(factura_id):
     """
     GET /api/v1/facturas/:id/xml
     Descarga el XML firmado de la factura
+    Se descomprime por bloques desde documento_xml mientras se envía
     """
     try:
-        factura = Factura.query.get(factura_id)
-        
-        if not factura:
+        fila = db.session.execute(
+            db.select(Factura.numero_factura, Factura.hash_sha256, DocumentoXml.compresion,
+                      DocumentoXml.tamano, DocumentoXml.contenido)
+            .outerjoin(DocumentoXml, DocumentoXml.hash_sha256 == Factura.hash_sha256)
+            .where(Factura.id == factura_id)
+        ).first()
+        
+        if not fila:
             return jsonify({'error': 'Factura no encontrada'}), 404
         
-        if not factura.xml_firmado:
-            return jsonify({'error': 'XML no disponible'}), 404
-        
-        # Crear archivo en memoria
-        xml_bytes = factura.xml_firmado.encode('utf-8')
-        xml_buffer = BytesIO(xml_bytes)
-        xml_buffer.seek(0)
-        
-        filename = f"factura_{factura.numero_factura.replace('-', '_')}.xml"
+        filename = f"factura_{fila.numero_factura.replace('-', '_')}.xml"
         
-        return send_file(
-            xml_buffer,
+        if fila.contenido is None:
+            # Factura anterior al almacén comprimido: XML en factura.xml_firmado
+            xml_firmado = db.session.execute(
+                db.select(Factura.xml_firmado).where(Factura.id == factura_id)
+            ).scalar()
+            if not xml_firmado:
+                return jsonify({'error': 'XML no disponible'}), 404
+            
+            return send_file(
+                BytesIO(xml_firmado.encode('utf-8')),
+                mimetype='application/xml',
+                as_attachment=True,
+                download_name=filename
+            )
+        
+        respuesta = current_app.response_class(
+            iterar_descomprimido(fila),
             mimetype='application/xml',
-            as_attachment=True,
-            download_name=filename
+            headers={
+                'Content-Length': str(fila.tamano),
+                'Content-Disposition': f'attachment; filename={filename}'
+            }
         )
+        # Contenido direccionado por hash: nunca cambia
+        respuesta.set_etag(fila.hash_sha256)
+        return respuesta.make_conditional(request)
         
     except Exception as e:
         print(f"❌ Error descargando XML: {e}")
         return jsonify({'error': 'Error interno del servidor'}), 500
 
 
+@factura_bp.route('/<int:factura_id>/qr', methods=['GET'])
+@jwt_required()
+def obtener_qr(factura_id):
+    """
+    GET /api/v1/facturas/:id/qr
+    Código QR de verificación generado bajo demanda
+    Query params: formato (png o svg, por defecto png)
+    Responde 304 si If-None-Match coincide con el ETag (sin renderizar)
+    Con QR_TOKEN habilitado la URL incluye el token firmado (?t=)
+    """
+    try:
+        formato = request.args.get('formato', 'png').lower()
+        if formato not in FORMATOS_QR:
+            return jsonify({'error': f"Formato no soportado. Use: {', '.join(FORMATOS_QR)}"}), 400
+
+        fila = db.session.execute(
+            db.select(Factura.hash_sha256, Factura.numero_factura, Factura.total, Factura.fecha_emision)
+            .where(Factura.id == factura_id)
+        ).first()
+        if not fila or not fila.hash_sha256:
+            return jsonify({'error': 'Factura no encontrada'}), 404
+
+        emisor = get_emisor_tokens()
+        token = emisor.emitir_factura(fila) if emisor else None
+
+        qr_service = get_qr_service()
+        etag = qr_service.etag(fila.hash_sha256, formato, token)
+        if etag in request.if_none_match:
+            respuesta = current_app.response_class(status=304)
+        else:
+            imagen, _ = qr_service.obtener(fila.hash_sha256, formato, token)
+            respuesta = current_app.response_class(imagen, mimetype=FORMATOS_QR[formato])
+
+        # El QR de una factura no cambia: caché privada del navegador
+        respuesta.set_etag(etag)
+        respuesta.headers['Cache-Control'] = 'private, max-age=86400'
+        return respuesta
+
+    except Exception as e:
+        print(f"❌ Error generando QR: {e}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
+def respuesta_limite_verificacion():
+    """
+    Token bucket por IP de los endpoints públicos de verificación
+
+    Returns:
+        (respuesta 429 con Retry-After, 429) si la IP agotó su ráfaga, o None
+    """
+    permitido, espera = get_verificacion_publica().permitir(request.remote_addr or 'desconocida')
+    if permitido:
+        return None
+    respuesta = jsonify({
+        'status': 'LIMITE',
+        'valida': False,
+        'mensaje': 'Demasiadas verificaciones. Intente nuevamente en unos segundos.'
+    })
+    respuesta.headers['Retry-After'] = str(max(1, math.ceil(espera)))
+    return respuesta, 429
+
+
 @factura_bp.route('/verificar/<string:hash_sha256>', methods=['GET'])
 def verificar_factura(hash_sha256):
     """
     GET /api/v1/facturas/verificar/:hash
     Endpoint PÚBLICO para verificar autenticidad de factura (sin JWT)
     Usado por el código QR
+    Resultado en caché por hash y límite de peticiones por IP (429 + Retry-After)
     """
+    limite = respuesta_limite_verificacion()
+    if limite:
+        return limite
+    verificacion = get_verificacion_publica()
+    
     try:
-        resultado = get_factura_service().verificar_integridad(hash_sha256)
+        resultado = verificacion.verificar(
+            hash_sha256, lambda clave: get_factura_service().verificar_integridad(clave)
+        )
         
         # Siempre devolver 200, el cliente decide cómo manejar valida=true/false
         return jsonify(resultado), 200
@@ -334,42 +508,87 @@ def verificar_factura(hash_sha256):
         }), 500
 
 
+@factura_bp.route('/verificar-token/<string:token>', methods=['GET'])
+def verificar_token(token):
+    """
+    GET /api/v1/facturas/verificar-token/:token
+    Endpoint PÚBLICO: valida el token firmado del QR solo con la clave pública
+    No consulta la base de datos (salvo para cargar la clave la primera vez
+    si no se configuró QR_TOKEN_CLAVES_PUBLICAS); nunca crea claves
+    """
+    limite = respuesta_limite_verificacion()
+    if limite:
+        return limite
+
+    try:
+        verificador = get_verificador_tokens()
+        if verificador is None:
+            return jsonify({'error': 'Tokens de verificación deshabilitados (QR_TOKEN)'}), 404
+        return jsonify(verificador.verificar(token)), 200
+
+    except Exception as e:
+        print(f"❌ Error verificando token: {e}")
+        return jsonify({
+            'status': 'ERROR',
+            'valida': False,
+            'mensaje': 'Error en el servidor al verificar el token'
+        }), 500
+
+
+@factura_bp.route('/claves-token', methods=['GET'])
+def obtener_claves_token():
+    """
+    GET /api/v1/facturas/claves-token
+    Endpoint PÚBLICO: claves públicas {key_id: PEM} de los tokens del QR
+    Guardado como archivo JSON sirve de QR_TOKEN_CLAVES_PUBLICAS en verificadores sin BD
+    """
+    try:
+        emisor = get_emisor_tokens()
+        if emisor is None:
+            return jsonify({'error': 'Tokens de verificación deshabilitados (QR_TOKEN)'}), 404
+        respuesta = jsonify({emisor.key_id: emisor.public_key_pem})
+        respuesta.headers['Cache-Control'] = 'public, max-age=3600'
+        return respuesta
+
+    except Exception as e:
+        print(f"❌ Error obteniendo claves de token: {e}")
+        return jsonify({'error': 'Error interno del servidor'}), 500
+
+
 @factura_bp.route('/estadisticas', methods=['GET'])
 @jwt_required()
+@con_statement_timeout()
 def obtener_estadisticas():
     """
     GET /api/v1/facturas/estadisticas
     Obtiene estadísticas generales de facturación
+    Lee la tabla factura_resumen_diario (ver reconstruir_resumen.py para recalcularla)
+    Límite de consulta: DB_STATEMENT_TIMEOUT_REPORTES_MS
     """
     try:
-        # Total de facturas
-        total_facturas = Factura.query.count()
-        
-        # Total facturado
-        total_facturado = db.session.query(
-            db.func.sum(Factura.total)
-        ).scalar() or 0
-        
-        # Facturas del mes actual
+        # Una sola consulta sobre el resumen diario (mantenido al crear facturas)
         from datetime import date
         primer_dia_mes = date.today().replace(day=1)
-        facturas_mes = Factura.query.filter(
-            Factura.fecha_emision >= primer_dia_mes
-        ).count()
+        es_del_mes = FacturaResumenDiario.fecha >= primer_dia_mes
         
-        total_mes = db.session.query(
-            db.func.sum(Factura.total)
-        ).filter(
-            Factura.fecha_emision >= primer_dia_mes
-        ).scalar() or 0
+        filas = db.session.query(
+            FacturaResumenDiario.estado_sri,
+            db.func.sum(FacturaResumenDiario.cantidad),
+            db.func.sum(FacturaResumenDiario.total),
+            db.func.sum(db.case((es_del_mes, FacturaResumenDiario.cantidad), else_=0)),
+            db.func.sum(db.case((es_del_mes, FacturaResumenDiario.total), else_=0))
+        ).group_by(FacturaResumenDiario.estado_sri).all()
         
-        # Facturas por estado SRI
-        facturas_por_estado = db.session.query(
-            Factura.estado_sri,
-            db.func.count(Factura.id)
-        ).group_by(Factura.estado_sri).all()
+        total_facturas = sum(int(cantidad or 0) for _, cantidad, _, _, _ in filas)
+        total_facturado = sum(total or 0 for _, _, total, _, _ in filas)
+        facturas_mes = sum(int(cantidad or 0) for _, _, _, cantidad, _ in filas)
+        total_mes = sum(total or 0 for _, _, _, _, total in filas)
         
-        estados_dict = {estado: count for estado, count in facturas_por_estado}
+        # Facturas por estado SRI
+        estados_dict = {
+            estado: int(cantidad or 0)
+            for estado, cantidad, _, _, _ in filas if cantidad
+        }
         
         return jsonify({
             'total_facturas': total_facturas,
@@ -7,6 +7,7 @@ from flask_jwt_extended import jwt_required, get_jwt
 from models.base import db
 from models.user import Usuario
 from services.auth_service import AuthService
+from services.pagination import paginar_por_cursor, leer_limite
 
 user_bp = Blueprint('users', __name__)
 
@@ -33,6 +34,8 @@ def list_users():
         activo: Filtrar por estado (true/false)
         page: Número de página (default: 1)
         limit: Registros por página (default: 10)
+        cursor: Activa la paginación por cursor sobre id (vacío para la primera página)
+        count: true para incluir el total en modo cursor
     """
     error_response = require_admin()
     if error_response:
@@ -55,25 +58,45 @@ def list_users():
             activo_bool = activo.lower() == 'true'
             query = query.filter_by(activo=activo_bool)
         
-        # Ordenar por ID
-        query = query.order_by(Usuario.id.asc())
-        
-        # Paginación
-        pagination = query.paginate(page=page, per_page=limit, error_out=False)
+        if 'cursor' in request.args:
+            # Paginación por cursor sobre id, sin COUNT ni OFFSET
+            limit = leer_limite(limit)
+            pagina = paginar_por_cursor(
+                query,
+                [Usuario.id],
+                cursor=request.args.get('cursor'),
+                limit=limit,
+                contar=request.args.get('count', '').lower() == 'true'
+            )
+            items = pagina['items']
+            pagination_data = {
+                'limit': limit,
+                'next_cursor': pagina['next_cursor']
+            }
+            if pagina['total'] is not None:
+                pagination_data['total'] = pagina['total']
+        else:
+            # Ordenar por ID
+            query = query.order_by(Usuario.id.asc())
+            
+            # Paginación
+            pagination = query.paginate(page=page, per_page=limit, error_out=False)
+            items = pagination.items
+            pagination_data = {
+                'page': page,
+                'limit': limit,
+                'total': pagination.total,
+                'pages': pagination.pages
+            }
         
         # ✅ CRÍTICO: Asegurar que devuelve lista vacía si no hay usuarios
-        users_list = [user.to_dict() for user in pagination.items] if pagination.items else []
+        users_list = [user.to_dict() for user in items] if items else []
         
         return jsonify({
             'success': True,
             'data': {
                 'users': users_list,
-                'pagination': {
-                    'page': page,
-                    'limit': limit,
-                    'total': pagination.total,
-                    'pages': pagination.pages
-                }
+                'pagination': pagination_data
             }
         }), 200
         
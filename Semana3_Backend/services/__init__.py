@@ -3,10 +3,17 @@ Inicialización de servicios
 """
 from services.crypto_service import CryptoService, init_crypto_service, get_crypto_service
 from services.auth_service import AuthService
+from services.key_registry import KeyRegistry, get_key_registry
+from services.audit_sink import AuditSink, init_audit_sink, get_audit_sink
 
 __all__ = [
     'CryptoService',
     'init_crypto_service',
     'get_crypto_service',
-    'AuthService'
+    'AuthService',
+    'KeyRegistry',
+    'get_key_registry',
+    'AuditSink',
+    'init_audit_sink',
+    'get_audit_sink'
 ]
@@ -0,0 +1,156 @@
+"""
+Almacén de XML Firmados
+- Documentos comprimidos (gzip, o zstd si está instalado) en la tabla documento_xml
+- Direccionado por contenido: la clave es el hash_sha256 de la factura
+- Lectura en streaming: se descomprime por bloques sin armar el XML completo
+"""
+import zlib
+
+from models.base import db
+from models.factura import Factura
+from models.documento_xml import DocumentoXml
+
+try:
+    import zstandard
+except ImportError:  # Opcional: pip install zstandard
+    zstandard = None
+
+
+COMPRESIONES = ('gzip', 'zstd')
+TAMANO_BLOQUE = 64 * 1024  # Bytes comprimidos por bloque al descomprimir en streaming
+
+
+def comprimir(datos, compresion='gzip', nivel=None):
+    """
+    Comprimir bytes
+
+    Returns:
+        bytes comprimidos
+    """
+    if compresion == 'gzip':
+        compresor = zlib.compressobj(6 if nivel is None else nivel, zlib.DEFLATED, 31)
+        return compresor.compress(datos) + compresor.flush()
+    if compresion == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Compresión zstd no disponible: instalar el paquete zstandard")
+        return zstandard.ZstdCompressor(level=3 if nivel is None else nivel).compress(datos)
+    raise ValueError(f"Compresión no soportada: {compresion}")
+
+
+def iterar_descomprimido(documento, tamano_bloque=TAMANO_BLOQUE):
+    """
+    Generador con el XML descomprimido por bloques (bytes)
+
+    Args:
+        documento: DocumentoXml (o fila con compresion y contenido)
+    """
+    contenido = documento.contenido
+    if documento.compresion == 'gzip':
+        descompresor = zlib.decompressobj(31)
+        for inicio in range(0, len(contenido), tamano_bloque):
+            bloque = descompresor.decompress(contenido[inicio:inicio + tamano_bloque])
+            if bloque:
+                yield bloque
+        resto = descompresor.flush()
+        if resto:
+            yield resto
+    elif documento.compresion == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Compresión zstd no disponible: instalar el paquete zstandard")
+        lector = zstandard.ZstdDecompressor().stream_reader(contenido)
+        while True:
+            bloque = lector.read(tamano_bloque)
+            if not bloque:
+                break
+            yield bloque
+    else:
+        raise ValueError(f"Compresión no soportada: {documento.compresion}")
+
+
+def descomprimir(documento):
+    """XML completo de un documento (str)"""
+    return b''.join(iterar_descomprimido(documento)).decode('utf-8')
+
+
+def leer_xml_facturas(factura_ids):
+    """
+    XML firmado de varias facturas en una sola consulta
+
+    Usa documento_xml y, para facturas anteriores al almacén, la columna
+    factura.xml_firmado.
+
+    Returns:
+        dict {factura_id: xml (str) o None}
+    """
+    if not factura_ids:
+        return {}
+    filas = db.session.execute(
+        db.select(Factura.id, Factura.xml_firmado, DocumentoXml.compresion, DocumentoXml.contenido)
+        .outerjoin(DocumentoXml, DocumentoXml.hash_sha256 == Factura.hash_sha256)
+        .where(Factura.id.in_(factura_ids))
+    ).all()
+    return {
+        fila.id: descomprimir(fila) if fila.contenido is not None else fila.xml_firmado
+        for fila in filas
+    }
+
+
+class AlmacenXml:
+    """
+    Escritura de XML firmados en documento_xml
+
+    Args:
+        compresion: 'gzip' o 'zstd' (sin zstandard instalado se usa gzip)
+        nivel: Nivel de compresión (None = por defecto del algoritmo)
+    """
+
+    def __init__(self, compresion='gzip', nivel=None):
+        if compresion not in COMPRESIONES:
+            raise ValueError(f"XML_COMPRESION no válida: {compresion}")
+        if compresion == 'zstd' and zstandard is None:
+            print("⚠️  zstandard no está instalado; los XML se comprimen con gzip")
+            compresion = 'gzip'
+        self.compresion = compresion
+        self.nivel = nivel
+
+    def documento(self, hash_sha256, xml):
+        """Crear el DocumentoXml comprimido (sin agregarlo a la sesión)"""
+        datos = xml.encode('utf-8')
+        return DocumentoXml(
+            hash_sha256=hash_sha256,
+            compresion=self.compresion,
+            tamano=len(datos),
+            contenido=comprimir(datos, self.compresion, self.nivel)
+        )
+
+    def guardar(self, hash_sha256, xml):
+        """
+        Agregar el XML a la transacción actual (se confirma con la factura)
+
+        Returns:
+            DocumentoXml
+        """
+        documento = self.documento(hash_sha256, xml)
+        db.session.add(documento)
+        return documento
+
+
+# Instancia global
+_almacen_xml = None
+
+
+def init_almacen_xml(app):
+    """Inicializar almacén de XML desde la configuración"""
+    global _almacen_xml
+    _almacen_xml = AlmacenXml(
+        compresion=app.config.get('XML_COMPRESION', 'gzip'),
+        nivel=app.config.get('XML_COMPRESION_NIVEL') or None
+    )
+    return _almacen_xml
+
+
+def get_almacen_xml():
+    """Obtener almacén de XML"""
+    if _almacen_xml is None:
+        raise RuntimeError("AlmacenXml no inicializado. Llamar init_almacen_xml() primero.")
+    return _almacen_xml
@@ -0,0 +1,83 @@
+"""
+Arranque de Procesos (servidor WSGI con varios workers)
+- precargar(): en el proceso maestro, antes del fork, deja listo lo que el
+  primer request haría tarde: llavero de firma (se genera si no existe),
+  claves parseadas, plantilla XML, QR y tokens
+- reiniciar_tras_fork(): en cada worker, descarta el pool de conexiones
+  heredado (ningún proceso comparte un socket de PostgreSQL)
+"""
+import os
+from datetime import datetime
+
+from models.base import db
+
+
+CLIENTE_PRECARGA = {
+    'tipo_identificacion': 'CEDULA',
+    'identificacion': '0000000000',
+    'nombres': 'Precarga',
+    'apellidos': 'Workers',
+    'direccion': '-'
+}
+
+
+def precargar(app):
+    """
+    Cargar en el proceso maestro lo que comparten los workers (copy-on-write)
+
+    Returns:
+        dict con key_id, algoritmo y segundos de la precarga
+    """
+    from routes.factura_routes import get_factura_service
+    from services.key_registry import get_key_registry
+    from services.qr_service import get_qr_service
+    from services.token_verificacion import get_emisor_tokens, get_verificador_tokens
+
+    inicio = datetime.now()
+    with app.app_context():
+        # Llavero de firma (crea y guarda la clave la primera vez) y claves parseadas
+        servicio = get_factura_service()
+        registro = get_key_registry()
+        for key_id, clave in servicio.claves_publicas.items():
+            registro.obtener_clave_publica(clave['public_key'], key_id=key_id)
+
+        # Una factura ficticia de punta a punta: plantilla, C14N, hash y firma
+        totales = servicio.calcular_totales([{'cantidad': 1, 'precio_unitario': 1}])
+        documento = servicio.procesar_documento(
+            servicio._preparar_datos_factura('001-001-000000000', totales), CLIENTE_PRECARGA,
+            [{'codigo': 'P0', 'nombre': 'Precarga', 'cantidad': 1, 'precio_unitario': 1}]
+        )
+        servicio.verificar_documento(documento['hash_sha256'], documento['firma_digital'],
+                                     documento['prueba_merkle'], documento['key_id'])
+
+        # QR (qrcode y Pillow se importan al dibujar) y tokens del QR
+        qr_service = get_qr_service()
+        for formato in ('svg', 'png'):
+            qr_service.renderizar(qr_service.url_verificacion(documento['hash_sha256']), formato)
+        if app.config.get('QR_TOKEN') or app.config.get('QR_TOKEN_CLAVES_PUBLICAS'):
+            get_emisor_tokens()
+            get_verificador_tokens()
+
+        # Reglas de URL compiladas una vez
+        app.url_map.update()
+
+        # Sin conexiones abiertas al hacer fork
+        db.session.remove()
+        db.engine.dispose()
+
+    segundos = (datetime.now() - inicio).total_seconds()
+    print(f"🔥 Precarga lista en {segundos:.2f} s: clave {servicio.key_id} "
+          f"({servicio.firmante.descripcion}), {len(servicio.claves_publicas)} clave(s) pública(s)")
+    return {'key_id': servicio.key_id, 'algoritmo': servicio.firmante.algoritmo, 'segundos': segundos}
+
+
+def reiniciar_tras_fork(app):
+    """
+    Llamar en cada worker recién creado (post_fork de gunicorn)
+
+    dispose(close=False) descarta las conexiones heredadas sin cerrarlas
+    (cerrarlas desde el hijo cortaría las del maestro u otros workers).
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    print(f"👷 Worker {os.getpid()} listo")
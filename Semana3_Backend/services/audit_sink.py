@@ -0,0 +1,265 @@
+"""
+Escritor de Auditoría por Lotes
+Encola eventos en memoria y los inserta en audit_log con un INSERT multi-fila
+desde un hilo en segundo plano, fuera de la latencia de cada request
+"""
+import os
+import queue
+import atexit
+import threading
+import time
+from datetime import datetime
+from flask import request, has_request_context
+
+from models.base import db
+from models.audit_log import AuditLog
+
+
+# Políticas cuando la cola está llena
+POLITICA_BLOQUEAR = 'bloquear'    # Esperar hasta timeout y luego escribir en línea
+POLITICA_DESCARTAR = 'descartar'  # Descartar el evento y contarlo
+POLITICA_SINCRONO = 'sincrono'    # Escribir en línea inmediatamente
+POLITICAS = (POLITICA_BLOQUEAR, POLITICA_DESCARTAR, POLITICA_SINCRONO)
+
+
+class AuditSink:
+    """
+    Cola acotada de eventos de auditoría con escritura por lotes
+
+    El hilo escritor vacía la cola cuando junta tamano_lote eventos o cuando
+    pasan intervalo segundos desde el primer evento pendiente. Con
+    asincrono=False cada evento se escribe en la transacción del request
+    (comportamiento original, usado en pruebas).
+    """
+
+    def __init__(self, app, asincrono=True, tamano_lote=100, intervalo=1.0,
+                 capacidad=10000, politica=POLITICA_BLOQUEAR, timeout_bloqueo=0.5):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política de auditoría no válida: {politica}")
+
+        self.app = app
+        self.asincrono = asincrono
+        self.tamano_lote = max(1, tamano_lote)
+        self.intervalo = intervalo
+        self.politica = politica
+        self.timeout_bloqueo = timeout_bloqueo
+
+        self._cola = queue.Queue(maxsize=capacidad)
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pid = None
+        self._detener = threading.Event()
+
+        self.escritos = 0
+        self.descartados = 0
+        self.fallidos = 0
+        self.sincronos = 0
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def registrar(self, usuario_id, accion, entidad, entidad_id=None,
+                  datos_anteriores=None, datos_nuevos=None,
+                  resultado='EXITO', mensaje_error=None):
+        """
+        Registrar evento de auditoría (no bloquea salvo con la cola llena)
+
+        IP y User-Agent se toman del request actual al momento de la llamada.
+        """
+        en_request = has_request_context()
+        evento = {
+            'usuario_id': usuario_id,
+            'timestamp': datetime.utcnow(),
+            'accion': accion,
+            'entidad': entidad,
+            'entidad_id': entidad_id,
+            'datos_anteriores': datos_anteriores,
+            'datos_nuevos': datos_nuevos,
+            'ip_address': (request.remote_addr if en_request else None) or '127.0.0.1',
+            'user_agent': request.headers.get('User-Agent') if en_request else 'Unknown',
+            'resultado': resultado,
+            'mensaje_error': mensaje_error
+        }
+
+        if not self.asincrono:
+            self._escribir_en_linea(evento)
+            return
+
+        self._asegurar_hilo()
+        try:
+            self._cola.put_nowait(evento)
+            return
+        except queue.Full:
+            pass
+
+        # Cola llena: aplicar política de contrapresión
+        if self.politica == POLITICA_DESCARTAR:
+            with self._lock:
+                self.descartados += 1
+            return
+
+        if self.politica == POLITICA_BLOQUEAR:
+            try:
+                self._cola.put(evento, timeout=self.timeout_bloqueo)
+                return
+            except queue.Full:
+                pass
+
+        self._escribir_en_linea(evento)
+
+    def flush(self):
+        """Escribir ahora todos los eventos pendientes (desde el hilo llamador)"""
+        while True:
+            lote = self._tomar_lote(bloquear=False)
+            if not lote:
+                return
+            self._escribir_lote(lote)
+
+    def detener(self, timeout=5.0):
+        """Detener el hilo escritor y vaciar la cola (se llama al salir)"""
+        self._detener.set()
+        hilo = self._hilo
+        if hilo is not None and hilo.is_alive() and self._pid == os.getpid():
+            hilo.join(timeout)
+        self.flush()
+
+    def estadisticas(self):
+        """
+        Obtener contadores del escritor
+
+        Returns:
+            dict: {pendientes, escritos, descartados, fallidos, sincronos}
+        """
+        with self._lock:
+            return {
+                'pendientes': self._cola.qsize(),
+                'escritos': self.escritos,
+                'descartados': self.descartados,
+                'fallidos': self.fallidos,
+                'sincronos': self.sincronos
+            }
+
+    # ------------------------------------------------------------------
+    # Internos
+    # ------------------------------------------------------------------
+
+    def _asegurar_hilo(self):
+        """Arrancar el hilo escritor (también en procesos hijos tras un fork)"""
+        if self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Tras un fork la cola heredada puede tener eventos del padre
+                self._cola = queue.Queue(maxsize=self._cola.maxsize)
+            self._detener.clear()
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._bucle, name='audit-sink', daemon=True)
+            self._hilo.start()
+
+    def _bucle(self):
+        """Bucle del hilo escritor"""
+        while not self._detener.is_set():
+            lote = self._tomar_lote(bloquear=True)
+            if lote:
+                self._escribir_lote(lote)
+
+    def _tomar_lote(self, bloquear):
+        """
+        Sacar hasta tamano_lote eventos de la cola
+
+        Con bloquear=True espera el primer evento y luego junta más hasta
+        completar el lote o agotar el intervalo.
+        """
+        lote = []
+        try:
+            if bloquear:
+                lote.append(self._cola.get(timeout=self.intervalo))
+            else:
+                lote.append(self._cola.get_nowait())
+        except queue.Empty:
+            return lote
+
+        limite = time.monotonic() + self.intervalo
+        while len(lote) < self.tamano_lote:
+            restante = limite - time.monotonic()
+            try:
+                if bloquear and restante > 0:
+                    lote.append(self._cola.get(timeout=restante))
+                else:
+                    lote.append(self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _escribir_lote(self, lote):
+        """INSERT multi-fila de un lote en una transacción propia"""
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conexion:
+                    conexion.execute(AuditLog.__table__.insert(), lote)
+            with self._lock:
+                self.escritos += len(lote)
+        except Exception as e:
+            with self._lock:
+                self.fallidos += len(lote)
+            print(f"⚠️  Error escribiendo lote de auditoría ({len(lote)} eventos): {str(e)}")
+
+    def _escribir_en_linea(self, evento):
+        """Escribir un evento en la sesión del request (sin cola)"""
+        try:
+            db.session.execute(AuditLog.__table__.insert(), [evento])
+            db.session.commit()
+            with self._lock:
+                self.sincronos += 1
+        except Exception as e:
+            db.session.rollback()
+            with self._lock:
+                self.fallidos += 1
+            print(f"⚠️  Error registrando auditoría: {str(e)}")
+
+
+# Instancia global
+_audit_sink = None
+
+
+def init_audit_sink(app):
+    """
+    Inicializar escritor de auditoría desde la configuración de la app
+
+    Args:
+        app: Aplicación Flask
+
+    Returns:
+        AuditSink: Instancia creada
+    """
+    global _audit_sink
+    if _audit_sink is not None:
+        _audit_sink.detener()
+
+    _audit_sink = AuditSink(
+        app,
+        asincrono=app.config.get('AUDIT_ASYNC', True),
+        tamano_lote=app.config.get('AUDIT_LOTE', 100),
+        intervalo=app.config.get('AUDIT_INTERVALO', 1.0),
+        capacidad=app.config.get('AUDIT_COLA_MAX', 10000),
+        politica=app.config.get('AUDIT_POLITICA', POLITICA_BLOQUEAR)
+    )
+    return _audit_sink
+
+
+def get_audit_sink():
+    """Obtener escritor de auditoría global"""
+    if _audit_sink is None:
+        raise RuntimeError("AuditSink no inicializado. Llamar init_audit_sink() primero.")
+    return _audit_sink
+
+
+@atexit.register
+def _vaciar_al_salir():
+    """Escribir los eventos pendientes al terminar el proceso"""
+    if _audit_sink is not None:
+        _audit_sink.detener()
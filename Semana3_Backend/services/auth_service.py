@@ -4,10 +4,10 @@ Login, registro, gestión de usuarios, auditoría
 """
 import bcrypt
 from datetime import datetime
-from flask import request
 from models.base import db
 from models.user import Usuario
-from models.audit_log import AuditLog
+from services.audit_sink import get_audit_sink
+from services.metrics import BCRYPT_OPERACIONES, BCRYPT_LATENCIA
 
 
 class AuthService:
@@ -24,8 +24,10 @@ class AuthService:
         Returns:
             str: Hash bcrypt
         """
-        salt = bcrypt.gensalt(rounds=12)
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
+        BCRYPT_OPERACIONES.inc(operacion='hash')
+        with BCRYPT_LATENCIA.medir(operacion='hash'):
+            salt = bcrypt.gensalt(rounds=12)
+            hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
         return hashed.decode('utf-8')
     
     @staticmethod
@@ -40,8 +42,10 @@ class AuthService:
         Returns:
             bool: True si coincide
         """
+        BCRYPT_OPERACIONES.inc(operacion='verificar')
         try:
-            return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+            with BCRYPT_LATENCIA.medir(operacion='verificar'):
+                return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
         except Exception as e:
             print(f"❌ Error verificando contraseña: {str(e)}")
             return False
@@ -295,26 +299,18 @@ class AuthService:
             mensaje_error: Mensaje de error si aplica
         """
         try:
-            # Obtener IP del request
-            ip_address = request.remote_addr if request else '127.0.0.1'
-            user_agent = request.headers.get('User-Agent') if request else 'Unknown'
-            
-            audit_log = AuditLog(
+            # Se encola; el escritor lo inserta por lotes fuera del request
+            get_audit_sink().registrar(
                 usuario_id=usuario_id,
                 accion=accion,
                 entidad=entidad,
                 entidad_id=entidad_id,
                 datos_anteriores=datos_anteriores,
                 datos_nuevos=datos_nuevos,
-                ip_address=ip_address,
-                user_agent=user_agent,
                 resultado=resultado,
                 mensaje_error=mensaje_error
             )
             
-            db.session.add(audit_log)
-            db.session.commit()
-            
         except Exception as e:
             print(f"⚠️  Error registrando auditoría: {str(e)}")
             # No fallar si no se puede registrar auditoría
@@ -10,9 +10,16 @@ from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import rsa, padding
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.backends import default_backend
+from services.key_registry import get_key_registry
+from services.metrics import AES_OPERACIONES
 import os
 
 
+# Campos sensibles del cliente, en el orden en que se concatenan con '|'
+CAMPOS_CLIENTE = ('nombres', 'apellidos', 'direccion', 'telefono', 'email')
+MARCA_ERROR_DESCIFRADO = '[ERROR_DESCIFRADO]'
+
+
 class CryptoService:
     """Servicio centralizado de criptografía"""
     
@@ -26,6 +33,9 @@ class CryptoService:
         self.aes_master_key = base64.b64decode(aes_master_key_b64)
         if len(self.aes_master_key) != 32:
             raise ValueError("AES master key debe ser de 32 bytes")
+        
+        # Contexto AES-GCM reutilizable (la clave no cambia durante la vida del servicio)
+        self._aesgcm = AESGCM(self.aes_master_key)
     
     # ========================================================================
     # RSA - FIRMA DIGITAL
@@ -71,12 +81,8 @@ class CryptoService:
         Returns:
             str: Firma en base64
         """
-        # Cargar clave privada
-        private_key = serialization.load_pem_private_key(
-            private_key_pem.encode('utf-8'),
-            password=None,
-            backend=default_backend()
-        )
+        # Cargar clave privada (parseada una sola vez por proceso)
+        private_key = get_key_registry().obtener_clave_privada(private_key_pem)
         
         # Firmar
         signature = private_key.sign(
@@ -103,11 +109,8 @@ class CryptoService:
             bool: True si la firma es válida
         """
         try:
-            # Cargar clave pública
-            public_key = serialization.load_pem_public_key(
-                public_key_pem.encode('utf-8'),
-                backend=default_backend()
-            )
+            # Cargar clave pública (parseada una sola vez por proceso)
+            public_key = get_key_registry().obtener_clave_publica(public_key_pem)
             
             # Decodificar firma
             signature = base64.b64decode(firma_b64)
@@ -150,8 +153,8 @@ class CryptoService:
         iv = os.urandom(12)
         
         # Cifrar
-        aesgcm = AESGCM(self.aes_master_key)
-        ciphertext = aesgcm.encrypt(iv, texto.encode('utf-8'), None)
+        ciphertext = self._aesgcm.encrypt(iv, texto.encode('utf-8'), None)
+        AES_OPERACIONES.inc(operacion='cifrar')
         
         # GCM incluye el tag en el ciphertext (últimos 16 bytes)
         tag = ciphertext[-16:]
@@ -183,8 +186,8 @@ class CryptoService:
             full_ciphertext = ciphertext + tag
             
             # Descifrar
-            aesgcm = AESGCM(self.aes_master_key)
-            plaintext = aesgcm.decrypt(iv, full_ciphertext, None)
+            AES_OPERACIONES.inc(operacion='descifrar')
+            plaintext = self._aesgcm.decrypt(iv, full_ciphertext, None)
             
             return plaintext.decode('utf-8')
             
@@ -192,6 +195,56 @@ class CryptoService:
             print(f"❌ Error descifrando: {str(e)}")
             return '[ERROR_DESCIFRADO]'
     
+    def decrypt_clientes(self, rows, fields=CAMPOS_CLIENTE):
+        """
+        Descifrar en lote los datos sensibles de varios clientes
+        
+        Los datos de cada cliente están concatenados con '|' en nombres_enc
+        y cifrados con AES-256-GCM (iv y tag por registro). Se usa un único
+        contexto AES-GCM para todas las filas y solo se devuelven los campos
+        solicitados.
+        
+        Args:
+            rows: Iterable de objetos Cliente
+            fields: Campos a devolver (subconjunto de CAMPOS_CLIENTE)
+            
+        Returns:
+            list: Un dict por fila, en el mismo orden:
+                  {'datos': {campo: valor}, 'error': None o mensaje}
+                  Si una fila falla, sus campos valen '[ERROR_DESCIFRADO]'
+        """
+        indices = [(campo, CAMPOS_CLIENTE.index(campo)) for campo in fields]
+        max_split = max((idx for _, idx in indices), default=0) + 1
+        vacio = {campo: '' for campo in fields}
+        
+        resultados = []
+        descifrados = 0
+        for cliente in rows:
+            if not cliente.nombres_enc:
+                resultados.append({'datos': dict(vacio), 'error': None})
+                continue
+            
+            try:
+                descifrados += 1
+                plaintext = self._aesgcm.decrypt(
+                    cliente.iv, cliente.nombres_enc + cliente.tag, None
+                ).decode('utf-8')
+                partes = plaintext.split('|', max_split)
+                datos = {
+                    campo: partes[idx] if len(partes) > idx else ''
+                    for campo, idx in indices
+                }
+                resultados.append({'datos': datos, 'error': None})
+            except Exception as e:
+                resultados.append({
+                    'datos': {campo: MARCA_ERROR_DESCIFRADO for campo in fields},
+                    'error': str(e) or type(e).__name__
+                })
+        
+        if descifrados:
+            AES_OPERACIONES.inc(descifrados, operacion='descifrar')
+        return resultados
+    
     # ========================================================================
     # SHA-256 - HASH
     # ========================================================================
@@ -1,27 +1,43 @@
 """
 Servicio de Facturación Electrónica con Criptografía
 - Generación de XML según esquema SRI Ecuador
-- Firma digital RSA-2048 con SHA-256
-- Generación de códigos QR con datos de verificación
-- Simulación de autorización SRI
+- Firma digital RSA-2048, ECDSA P-256 o Ed25519 con key id por factura
+  (por factura o por lotes con árbol de Merkle)
+- Datos de verificación del QR (la imagen se sirve bajo demanda, ver services/qr_service.py)
+- Encolado de la autorización SRI (ver services/sri_service.py)
 """
 
 import os
+import atexit
 import base64
 import hashlib
-import qrcode
-from io import BytesIO
+import threading
+import multiprocessing
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from lxml import etree
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.backends import default_backend
+from sqlalchemy import event
 
 from models import db
 from models.factura import Factura
 from models.cliente import Cliente
+from models.factura_resumen import FacturaResumenDiario
+from models.configuracion import Configuracion
 from services.crypto_service import get_crypto_service
+from services.key_registry import get_key_registry, KeyRegistry, CLAVE_CONFIG_FIRMA
+from services.secuencial_service import AsignadorSecuencial
+from services.metrics import medir_etapa
+from services.sri_service import marcar_pendiente, get_cola_sri, digito_modulo11
+from services.qr_service import get_qr_service
+from services.almacen_xml import get_almacen_xml
+from services.firmantes import get_firmante, obtener_llavero, leer_llavero
+from services.firma_merkle import FirmadorMerkle, firma_diferida, completar_firma, raiz_de_prueba
+from services.xml_factura import (
+    FacturaStreaming, elemento_firma, filas_detalle, get_plantilla_factura
+)
 
 
 class FacturaService:
@@ -29,67 +45,75 @@ class FacturaService:
     
     def __init__(self):
         """
-        Inicializar servicio con CryptoService y obtener/crear claves RSA desde BD
+        Inicializar servicio con CryptoService y obtener/crear las claves de firma desde BD
         """
-        from models.configuracion import Configuracion
+        from flask import current_app
         
         self.crypto_service = get_crypto_service()
         
-        print("🔍 Buscando claves RSA en configuracion...")
-        
-        # Obtener o crear claves RSA desde configuracion
-        config_rsa = Configuracion.query.filter_by(clave='rsa_keys').first()
+        print("🔍 Buscando claves de firma en configuracion...")
+        
+        # Llavero: la clave activa (del algoritmo FIRMA_ALGORITMO) firma y las
+        # anteriores se conservan para verificar facturas viejas por key_id
+        self._llavero_en_bd = True
+        self._cargar_claves(obtener_llavero(current_app.config.get('FIRMA_ALGORITMO', 'rsa')))
+        print(f"✅ FacturaService inicializado con {self.firmante.descripcion} (key id {self.key_id})")
+        
+        # Numeración por establecimiento y punto de emisión de la empresa
+        from models.empresa import Empresa
+        empresa = Empresa.query.first()
+        self.establecimiento = (empresa.establecimiento if empresa else None) or '001'
+        self.punto_emision = (empresa.punto_emision if empresa else None) or '001'
+        self.asignador = AsignadorSecuencial(
+            current_app.config.get('FACTURA_BLOQUE_SECUENCIAL', 1)
+        )
         
-        if config_rsa and config_rsa.valor:
-            # Usar claves existentes
-            import json
-            self.rsa_keys = json.loads(config_rsa.valor)
-            print("✅ FacturaService inicializado con RSA-2048 existente desde BD")
-        else:
-            # Generar nuevas claves y almacenarlas
-            print("🔑 Generando nuevo par de claves RSA-2048...")
-            private_pem, public_pem = self.crypto_service.generar_par_claves_rsa()
-            self.rsa_keys = {
-                'private_key': private_pem,
-                'public_key': public_pem
-            }
-            
-            # Guardar en BD
-            import json
-            if config_rsa:
-                config_rsa.valor = json.dumps(self.rsa_keys)
-                print("♻️  Actualizando claves RSA en configuracion")
-            else:
-                config_rsa = Configuracion(
-                    clave='rsa_keys',
-                    valor=json.dumps(self.rsa_keys),
-                    descripcion='Claves RSA-2048 para firma digital de facturas'
-                )
-                db.session.add(config_rsa)
-                print("💾 Creando registro de claves RSA en configuracion")
-            
-            try:
-                db.session.commit()
-                print("✅ FacturaService inicializado con RSA-2048 nuevo y almacenado en BD")
-            except Exception as e:
-                print(f"❌ Error almacenando claves RSA: {e}")
-                db.session.rollback()
+        # XML firmado sin indentación (más pequeño y rápido de serializar)
+        self.xml_compacto = current_app.config.get('FACTURA_XML_COMPACTO', False)
+        # Desde cuántos detalles el XML se escribe en streaming
+        self.xml_streaming_min = current_app.config.get('FACTURA_XML_STREAMING_MIN', 1000)
+        
+        # Firma por lotes: una firma RSA de la raíz Merkle por ventana
+        self.firmador_merkle = None
+        if current_app.config.get('FIRMA_MERKLE', False):
+            self.firmador_merkle = FirmadorMerkle(
+                self._firmar_hash,
+                ventana=current_app.config.get('FIRMA_MERKLE_VENTANA_MS', 10) / 1000,
+                max_hojas=current_app.config.get('FIRMA_MERKLE_MAX_HOJAS', 256)
+            )
         
+    def _cargar_claves(self, llavero: dict):
+        """Clave activa, firmante y claves públicas del llavero"""
+        self.key_id = llavero['activa']
+        self.clave_firma = llavero['claves'][self.key_id]
+        self.firmante = get_firmante(self.clave_firma['algoritmo'])
+        # Clave de las facturas anteriores a los key id (columna key_id vacía)
+        self.key_id_heredada = llavero.get('heredada')
+        self.claves_publicas = {
+            key_id: {'algoritmo': clave['algoritmo'], 'public_key': clave['public_key']}
+            for key_id, clave in llavero['claves'].items()
+        }
+    
+    def _clave_publica(self, key_id: str):
+        """Clave pública por key id (relee el llavero si otra instancia rotó la clave)"""
+        clave = self.claves_publicas.get(key_id)
+        if clave is None and self._llavero_en_bd:
+            _, llavero = leer_llavero()
+            if llavero:
+                for otro_id, otra in llavero['claves'].items():
+                    self.claves_publicas.setdefault(
+                        otro_id, {'algoritmo': otra['algoritmo'], 'public_key': otra['public_key']}
+                    )
+                clave = self.claves_publicas.get(key_id)
+        return clave
+    
     def generar_numero_factura(self) -> str:
         """
         Genera número de factura secuencial formato SRI:
         001-001-000000001
+        (contador atómico por establecimiento y punto de emisión, seguro ante concurrencia)
         """
-        ultima_factura = Factura.query.order_by(Factura.id.desc()).first()
-        
-        if not ultima_factura:
-            secuencial = 1
-        else:
-            # Extraer secuencial del número anterior
-            partes = ultima_factura.numero_factura.split('-')
-            secuencial = int(partes[2]) + 1
-        
-        return f"001-001-{secuencial:09d}"
+        return self.asignador.siguiente(self.establecimiento, self.punto_emision)
     
     def calcular_totales(self, items: list) -> dict:
         """
@@ -98,14 +122,21 @@ class FacturaService:
             items: Lista de ítems con {producto_id, cantidad, precio_unitario, iva_porcentaje}
         Returns:
             dict con subtotal, iva, total
+        Raises:
+            ValueError: Si cantidad, precio_unitario o iva_porcentaje no son números
         """
         subtotal = Decimal('0.00')
         total_iva = Decimal('0.00')
         
-        for item in items:
-            cantidad = Decimal(str(item['cantidad']))
-            precio = Decimal(str(item['precio_unitario']))
-            iva_pct = Decimal(str(item.get('iva_porcentaje', 15)))
+        for idx, item in enumerate(items):
+            try:
+                cantidad = Decimal(str(item['cantidad']))
+                precio = Decimal(str(item['precio_unitario']))
+                iva_pct = Decimal(str(item.get('iva_porcentaje', 15)))
+            except (InvalidOperation, KeyError, TypeError, AttributeError):
+                raise ValueError(f"Item {idx}: cantidad, precio_unitario e iva_porcentaje deben ser numéricos")
+            if not (cantidad.is_finite() and precio.is_finite() and iva_pct.is_finite()):
+                raise ValueError(f"Item {idx}: cantidad, precio_unitario e iva_porcentaje deben ser numéricos")
             
             subtotal_item = cantidad * precio
             iva_item = subtotal_item * (iva_pct / Decimal('100'))
@@ -121,90 +152,53 @@ class FacturaService:
             'total': float(total)
         }
     
-    def generar_xml_factura(self, factura_data: dict, cliente: Cliente, items: list) -> str:
+    def generar_xml_factura(self, factura_data: dict, cliente: Cliente, items: list):
         """
         Genera XML de factura según esquema SRI Ecuador (simplificado)
+        
+        Returns:
+            Elemento raíz del árbol, o FacturaStreaming si tiene muchos
+            detalles (en ambos casos se firma y serializa en firmar_xml)
         """
         # Descifrar datos del cliente
-        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-        if cliente.nombres_enc:
-            encrypted_data = cliente.nombres_enc + cliente.tag
-            aesgcm = AESGCM(self.crypto_service.aes_master_key)
-            decrypted_all = aesgcm.decrypt(cliente.iv, encrypted_data, None).decode('utf-8')
-            partes = decrypted_all.split('|')
-            decrypted_data = {
-                'nombres': partes[0] if len(partes) > 0 else '',
-                'apellidos': partes[1] if len(partes) > 1 else '',
-                'direccion': partes[2] if len(partes) > 2 else '',
-                'telefono': partes[3] if len(partes) > 3 else '',
-                'email': partes[4] if len(partes) > 4 else ''
-            }
-        else:
-            decrypted_data = {
-                'nombres': '',
-                'apellidos': '',
-                'direccion': '',
-                'telefono': '',
-                'email': ''
-            }
+        resultado = self.crypto_service.decrypt_clientes([cliente])[0]
+        if resultado['error']:
+            raise RuntimeError(f"No se pudo descifrar el cliente {cliente.id}: {resultado['error']}")
+        decrypted_data = resultado['datos']
         cliente_datos = cliente.to_dict(decrypted_data=decrypted_data)
         
-        # Crear estructura XML
-        root = etree.Element("factura", version="1.0.0")
-        
-        # InfoTributaria
-        info_tributaria = etree.SubElement(root, "infoTributaria")
-        etree.SubElement(info_tributaria, "ambiente").text = "1"  # 1=Pruebas, 2=Producción
-        etree.SubElement(info_tributaria, "tipoEmision").text = "1"  # Normal
-        etree.SubElement(info_tributaria, "razonSocial").text = factura_data.get('empresa_razon_social', 'Mi Empresa S.A.')
-        etree.SubElement(info_tributaria, "nombreComercial").text = "Mi Empresa"
-        etree.SubElement(info_tributaria, "ruc").text = factura_data.get('empresa_ruc', '1234567890001')
-        etree.SubElement(info_tributaria, "claveAcceso").text = self._generar_clave_acceso(factura_data)
-        etree.SubElement(info_tributaria, "codDoc").text = "01"  # 01=Factura
-        etree.SubElement(info_tributaria, "estab").text = "001"
-        etree.SubElement(info_tributaria, "ptoEmi").text = "001"
-        etree.SubElement(info_tributaria, "secuencial").text = factura_data['numero_factura'].split('-')[2]
-        etree.SubElement(info_tributaria, "dirMatriz").text = "Av. Principal 123, Quito"
-        
-        # InfoFactura
-        info_factura = etree.SubElement(root, "infoFactura")
-        etree.SubElement(info_factura, "fechaEmision").text = factura_data['fecha_emision'].strftime('%d/%m/%Y')
-        etree.SubElement(info_factura, "dirEstablecimiento").text = "Av. Principal 123"
-        etree.SubElement(info_factura, "obligadoContabilidad").text = "SI"
-        etree.SubElement(info_factura, "tipoIdentificacionComprador").text = cliente_datos['tipo_identificacion']
-        etree.SubElement(info_factura, "razonSocialComprador").text = f"{cliente_datos['nombres']} {cliente_datos['apellidos']}"
-        etree.SubElement(info_factura, "identificacionComprador").text = cliente_datos['identificacion']
-        etree.SubElement(info_factura, "direccionComprador").text = cliente_datos['direccion']
-        etree.SubElement(info_factura, "totalSinImpuestos").text = f"{factura_data['subtotal']:.2f}"
-        etree.SubElement(info_factura, "totalDescuento").text = "0.00"
-        
-        # Total con impuestos
-        totales_impuestos = etree.SubElement(info_factura, "totalConImpuestos")
-        total_impuesto = etree.SubElement(totales_impuestos, "totalImpuesto")
-        etree.SubElement(total_impuesto, "codigo").text = "2"  # IVA
-        etree.SubElement(total_impuesto, "codigoPorcentaje").text = "2"  # 15%
-        etree.SubElement(total_impuesto, "baseImponible").text = f"{factura_data['subtotal']:.2f}"
-        etree.SubElement(total_impuesto, "valor").text = f"{factura_data['iva']:.2f}"
-        
-        etree.SubElement(info_factura, "propina").text = "0.00"
-        etree.SubElement(info_factura, "importeTotal").text = f"{factura_data['total']:.2f}"
-        etree.SubElement(info_factura, "moneda").text = "DOLAR"
-        
-        # Detalles (items)
-        detalles = etree.SubElement(root, "detalles")
-        for idx, item in enumerate(items, 1):
-            detalle = etree.SubElement(detalles, "detalle")
-            etree.SubElement(detalle, "codigoPrincipal").text = item.get('codigo', f"PROD{idx:03d}")
-            etree.SubElement(detalle, "descripcion").text = item['nombre']
-            etree.SubElement(detalle, "cantidad").text = str(item['cantidad'])
-            etree.SubElement(detalle, "precioUnitario").text = f"{item['precio_unitario']:.2f}"
-            etree.SubElement(detalle, "descuento").text = "0.00"
-            subtotal_item = Decimal(str(item['cantidad'])) * Decimal(str(item['precio_unitario']))
-            etree.SubElement(detalle, "precioTotalSinImpuesto").text = f"{subtotal_item:.2f}"
-        
-        # Convertir a string
-        xml_str = etree.tostring(root, pretty_print=True, xml_declaration=True, encoding='UTF-8')
-        return xml_str.decode('utf-8')
+        return self._construir_xml(factura_data, cliente_datos, items)
+    
+    def _construir_xml(self, factura_data: dict, cliente_datos: dict, items: list):
+        """
+        Construye el XML desde la plantilla precompilada con datos ya
+        descifrados del cliente (no accede a BD, se usa también en el lote)
+        """
+        numero = factura_data['numero_factura'].split('-')
+        valores = {
+            'razonSocial': factura_data.get('empresa_razon_social', 'Mi Empresa S.A.'),
+            'ruc': factura_data.get('empresa_ruc', '1234567890001'),
+            'claveAcceso': self._generar_clave_acceso(factura_data),
+            'estab': numero[0],
+            'ptoEmi': numero[1],
+            'secuencial': numero[2],
+            'fechaEmision': factura_data['fecha_emision'].strftime('%d/%m/%Y'),
+            'tipoIdentificacionComprador': cliente_datos['tipo_identificacion'],
+            'razonSocialComprador': f"{cliente_datos['nombres']} {cliente_datos['apellidos']}",
+            'identificacionComprador': cliente_datos['identificacion'],
+            'direccionComprador': cliente_datos['direccion'],
+            'totalSinImpuestos': f"{factura_data['subtotal']:.2f}",
+            'baseImponible': f"{factura_data['subtotal']:.2f}",
+            'valor': f"{factura_data['iva']:.2f}",
+            'importeTotal': f"{factura_data['total']:.2f}"
+        }
+        filas = filas_detalle(items)
+        
+        plantilla = get_plantilla_factura()
+        if len(filas) >= self.xml_streaming_min:
+            # Facturas grandes: los detalles se escriben en streaming al firmar
+            return FacturaStreaming(plantilla, plantilla.cabecera(valores), filas)
+        return plantilla.construir(valores, filas)
     
     def _generar_clave_acceso(self, factura_data: dict) -> str:
         """
@@ -215,175 +209,158 @@ class FacturaService:
         tipo_comprobante = '01'  # Factura
         ruc = factura_data.get('empresa_ruc', '1234567890001')
         ambiente = '1'  # Pruebas
-        secuencial = factura_data['numero_factura'].split('-')[2]
+        establecimiento, punto_emision, secuencial = factura_data['numero_factura'].split('-')
         codigo_numerico = '12345678'  # Aleatorio
         tipo_emision = '1'
         
         # Construir clave sin dígito verificador
-        clave_sin_verificador = f"{fecha}{tipo_comprobante}{ruc}{ambiente}{secuencial}{codigo_numerico}{tipo_emision}"
+        clave_sin_verificador = (
+            f"{fecha}{tipo_comprobante}{ruc}{ambiente}{establecimiento}{punto_emision}"
+            f"{secuencial}{codigo_numerico}{tipo_emision}"
+        )
         
         # Calcular dígito verificador (módulo 11)
-        digito = self._calcular_digito_verificador(clave_sin_verificador)
+        digito = digito_modulo11(clave_sin_verificador)
         
         return clave_sin_verificador + str(digito)
     
-    def _calcular_digito_verificador(self, numero: str) -> int:
-        """Calcula dígito verificador módulo 11"""
-        factor = 2
-        suma = 0
-        
-        for digito in reversed(numero):
-            suma += int(digito) * factor
-            factor = factor + 1 if factor < 7 else 2
-        
-        residuo = suma % 11
-        resultado = 11 - residuo
-        
-        if resultado == 11:
-            return 0
-        elif resultado == 10:
-            return 1
-        else:
-            return resultado
-    
-    def firmar_xml(self, xml_content: str) -> dict:
+    def firmar_xml(self, xml, compacto: bool = None, firmar=None) -> dict:
         """
-        Firma digitalmente el XML con RSA-2048 y SHA-256
+        Firma digitalmente el XML con la clave activa (RSA, ECDSA P-256 o Ed25519) y SHA-256
+        
+        El hash se calcula una sola vez sobre la forma canónica (C14N, sin
+        espacios de indentación) del árbol; luego se agrega ds:Signature y se
+        serializa una única vez. Una FacturaStreaming se escribe y hashea en
+        la misma pasada (salida siempre compacta).
+        
+        Args:
+            xml: Resultado de generar_xml_factura (o XML en texto)
+            compacto: Serializar sin indentación (por defecto FACTURA_XML_COMPACTO)
+            firmar: Función hash -> firma (por defecto _firmar_documento)
+            
         Returns:
-            dict con hash_sha256, firma_digital, xml_firmado
+            dict con hash_sha256, firma_digital, prueba_merkle, key_id, xml_firmado
         """
-        # 1. Calcular hash SHA-256 del XML
-        xml_bytes = xml_content.encode('utf-8')
-        hash_sha256 = hashlib.sha256(xml_bytes).hexdigest()
-        
-        # 2. Cargar clave privada desde PEM
-        private_key_pem = self.rsa_keys['private_key']
-        private_key = serialization.load_pem_private_key(
-            private_key_pem.encode('utf-8'),
-            password=None,
-            backend=default_backend()
-        )
-        
-        # 3. Firmar el hash con clave privada RSA
-        hash_bytes = hash_sha256.encode('utf-8')
+        firmar = firmar or self._firmar_documento
+        if isinstance(xml, FacturaStreaming):
+            return xml.escribir_firmada(firmar, self.key_id)
         
-        firma = private_key.sign(
-            hash_bytes,
-            padding.PSS(
-                mgf=padding.MGF1(hashes.SHA256()),
-                salt_length=padding.PSS.MAX_LENGTH
-            ),
-            hashes.SHA256()
-        )
+        if isinstance(xml, (str, bytes)):
+            datos = xml.encode('utf-8') if isinstance(xml, str) else xml
+            root = etree.fromstring(datos, etree.XMLParser(remove_blank_text=True))
+        else:
+            root = xml
+        if compacto is None:
+            compacto = self.xml_compacto
         
-        firma_base64 = base64.b64encode(firma).decode('utf-8')
+        # 1. Calcular hash SHA-256 de la forma canónica del XML
+        hash_sha256 = hashlib.sha256(etree.tostring(root, method='c14n')).hexdigest()
         
-        # 3. Crear XML firmado (agregar firma al XML original)
-        root = etree.fromstring(xml_content.encode('utf-8'))
+        # 2. Firmar el hash con la clave privada activa (o su raíz Merkle)
+        signature, firma_base64, prueba = elemento_firma(hash_sha256, firmar(hash_sha256), self.key_id)
         
-        # Definir namespace para la firma
-        NSMAP = {'ds': 'http://www.w3.org/2000/09/xmldsig#'}
-        signature = etree.SubElement(root, f"{{{NSMAP['ds']}}}Signature", nsmap=NSMAP)
-        etree.SubElement(signature, f"{{{NSMAP['ds']}}}SignatureValue").text = firma_base64
-        etree.SubElement(signature, f"{{{NSMAP['ds']}}}DigestValue").text = hash_sha256
+        # 3. Agregar la firma al mismo árbol y serializar una sola vez
+        root.append(signature)
         
-        xml_firmado = etree.tostring(root, pretty_print=True, xml_declaration=True, encoding='UTF-8')
+        xml_firmado = etree.tostring(
+            root, pretty_print=not compacto, xml_declaration=True, encoding='UTF-8'
+        )
         
         return {
             'hash_sha256': hash_sha256,
             'firma_digital': firma_base64,
+            'prueba_merkle': prueba,
+            'key_id': self.key_id,
             'xml_firmado': xml_firmado.decode('utf-8')
         }
     
-    def verificar_firma(self, hash_original: str, firma_base64: str) -> bool:
+    def _firmar_documento(self, hash_sha256: str):
+        """Firma individual o, con FIRMA_MERKLE, firma de la raíz de la ventana actual"""
+        if self.firmador_merkle is not None:
+            return self.firmador_merkle.firmar(hash_sha256)
+        return self._firmar_hash(hash_sha256)
+    
+    def _firmar_hash(self, hash_sha256: str) -> str:
+        """Firmar el hash hex con la clave activa (ya parseada en el registro)"""
+        private_key = get_key_registry().obtener_clave_privada(
+            self.clave_firma['private_key'], key_id=self.key_id
+        )
+        firma = self.firmante.firmar(private_key, hash_sha256.encode('utf-8'))
+        return base64.b64encode(firma).decode('utf-8')
+    
+    def verificar_firma(self, hash_original: str, firma_base64: str, key_id: str = None) -> bool:
         """
-        Verifica la firma digital RSA
+        Verifica la firma digital con la clave que la generó
+        
+        Args:
+            key_id: Clave de la factura (None = facturas anteriores a los key id)
         Returns:
             True si la firma es válida
         """
+        key_id = key_id or self.key_id_heredada or self.key_id
+        clave = self._clave_publica(key_id)
+        if clave is None:
+            print(f"❌ Clave de firma desconocida: {key_id}")
+            return False
+        
         try:
-            # Cargar clave pública desde PEM
-            public_key_pem = self.rsa_keys['public_key']
-            public_key = serialization.load_pem_public_key(
-                public_key_pem.encode('utf-8'),
-                backend=default_backend()
-            )
-            
-            firma = base64.b64decode(firma_base64)
-            hash_bytes = hash_original.encode('utf-8')
-            
-            public_key.verify(
-                firma,
-                hash_bytes,
-                padding.PSS(
-                    mgf=padding.MGF1(hashes.SHA256()),
-                    salt_length=padding.PSS.MAX_LENGTH
-                ),
-                hashes.SHA256()
+            # Obtener clave pública ya parseada del registro
+            public_key = get_key_registry().obtener_clave_publica(clave['public_key'], key_id=key_id)
+            get_firmante(clave['algoritmo']).verificar(
+                public_key, base64.b64decode(firma_base64), hash_original.encode('utf-8')
             )
             return True
         except Exception as e:
-            print(f"❌ Error verificando firma: {e}")
+            print(f"❌ Error verificando firma: {e!r}")
             return False
     
-    def generar_qr(self, factura: Factura, url_base: str = "http://localhost:5173") -> dict:
+    def verificar_documento(self, hash_sha256: str, firma_base64: str, prueba_merkle: str = None,
+                            key_id: str = None) -> bool:
         """
-        Genera código QR con datos de verificación
-        Returns:
-            dict con qr_image (base64), qr_data (string)
+        Verifica la firma de una factura: directa sobre el hash o, si tiene
+        prueba Merkle, la prueba de inclusión y la firma de la raíz
         """
-        # Datos para el QR
-        qr_data = f"{url_base}/verificar/{factura.hash_sha256}"
-        qr_info = f"Factura: {factura.numero_factura}\n"
-        qr_info += f"Fecha: {factura.fecha_emision.strftime('%d/%m/%Y')}\n"
-        qr_info += f"Total: ${factura.total:.2f}\n"
-        qr_info += f"Verificar: {qr_data}"
-        
-        # Generar imagen QR
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convertir a base64
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
-        img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
+        if not prueba_merkle:
+            return self.verificar_firma(hash_sha256, firma_base64, key_id)
+        raiz = raiz_de_prueba(hash_sha256, prueba_merkle)
+        if raiz is None:
+            print("❌ La prueba Merkle no corresponde al hash")
+            return False
+        return self.verificar_firma(raiz, firma_base64, key_id)
+    
+    def _preparar_datos_factura(self, numero_factura: str, totales: dict) -> dict:
+        """Datos de cabecera usados para el XML y la clave de acceso"""
         return {
-            'qr_image': f"data:image/png;base64,{img_base64}",
-            'qr_data': qr_info
+            'numero_factura': numero_factura,
+            'fecha_emision': datetime.now(),
+            'subtotal': totales['subtotal'],
+            'iva': totales['iva'],
+            'total': totales['total'],
+            'empresa_ruc': '1234567890001',
+            'empresa_razon_social': 'Sistema de Facturación Electrónica S.A.'
         }
     
-    def simular_autorizacion_sri(self, factura: Factura) -> dict:
-        """
-        Simula el proceso de autorización del SRI
-        (En producción real, esto sería una llamada al Web Service del SRI)
+    def procesar_documento(self, factura_data: dict, cliente_datos: dict, items: list,
+                           diferir_firma: bool = False) -> dict:
         """
-        # Generar número de autorización aleatorio de 49 dígitos
-        fecha_autorizacion = datetime.now()
-        num_autorizacion = self._generar_clave_acceso({
-            'fecha_emision': fecha_autorizacion,
-            'empresa_ruc': '1234567890001',
-            'numero_factura': factura.numero_factura
-        })
+        Genera XML y firma de una factura sin acceder a BD
         
-        return {
-            'num_autorizacion': num_autorizacion,
-            'fecha_autorizacion': fecha_autorizacion,
-            'estado_sri': 'AUTORIZADO'
-        }
+        Args:
+            diferir_firma: Dejar marcadores en lugar de la firma (modo Merkle
+                del lote: se completan con completar_firma)
+        
+        Returns:
+            dict con hash_sha256, firma_digital, prueba_merkle, xml_firmado
+        """
+        return self.firmar_xml(
+            self._construir_xml(factura_data, cliente_datos, items),
+            firmar=firma_diferida if diferir_firma else None
+        )
     
     def crear_factura(self, usuario_id: int, cliente_id: int, items: list, 
                      observaciones: str = None) -> Factura:
         """
-        Crea una factura electrónica completa con firma digital y QR
+        Crea una factura electrónica completa con firma digital
         
         Args:
             usuario_id: ID del usuario que emite la factura
@@ -406,21 +383,15 @@ class FacturaService:
         numero_factura = self.generar_numero_factura()
         
         # 4. Preparar datos de factura
-        factura_data = {
-            'numero_factura': numero_factura,
-            'fecha_emision': datetime.now(),
-            'subtotal': totales['subtotal'],
-            'iva': totales['iva'],
-            'total': totales['total'],
-            'empresa_ruc': '1234567890001',
-            'empresa_razon_social': 'Sistema de Facturación Electrónica S.A.'
-        }
+        factura_data = self._preparar_datos_factura(numero_factura, totales)
         
-        # 5. Generar XML
-        xml_content = self.generar_xml_factura(factura_data, cliente, items)
+        # 5. Generar árbol XML
+        with medir_etapa('xml'):
+            xml_root = self.generar_xml_factura(factura_data, cliente, items)
         
-        # 6. Firmar XML con RSA
-        firma_data = self.firmar_xml(xml_content)
+        # 6. Firmar XML con RSA (hash, firma y serialización en una pasada)
+        with medir_etapa('firma'):
+            firma_data = self.firmar_xml(xml_root)
         
         # 7. Crear registro en BD
         factura = Factura(
@@ -433,29 +404,284 @@ class FacturaService:
             total=totales['total'],
             hash_sha256=firma_data['hash_sha256'],
             firma_digital=firma_data['firma_digital'],
-            xml_firmado=firma_data['xml_firmado'],
+            prueba_merkle=firma_data['prueba_merkle'],
+            key_id=firma_data['key_id'],
             observaciones=observaciones,
             items=items  # Almacenar como JSONB
         )
         
         db.session.add(factura)
+        get_almacen_xml().guardar(firma_data['hash_sha256'], firma_data['xml_firmado'])
         db.session.flush()  # Para obtener el ID antes de commit
         
-        # 8. Generar código QR
-        qr_data = self.generar_qr(factura)
-        factura.qr_image = qr_data['qr_image']
-        factura.qr_data = qr_data['qr_data']
+        # 8. Datos del QR (la imagen se genera al pedir /facturas/<id>/qr)
+        factura.qr_data = get_qr_service().texto_qr(factura)
         
-        # 9. Simular autorización SRI
-        autorizacion = self.simular_autorizacion_sri(factura)
-        factura.num_autorizacion = autorizacion['num_autorizacion']
-        factura.fecha_autorizacion = autorizacion['fecha_autorizacion']
-        factura.estado_sri = autorizacion['estado_sri']
+        # 9. Encolar autorización SRI (la procesa el worker de la cola)
+        marcar_pendiente(factura)
         
-        db.session.commit()
+        # 10. Actualizar resumen diario en la misma transacción
+        FacturaResumenDiario.acumular(
+            fecha=factura.fecha_emision.date(),
+            estado_sri=factura.estado_sri,
+            usuario_id=usuario_id,
+            cliente_id=cliente_id,
+            total=totales['total']
+        )
+        
+        with medir_etapa('commit'):
+            db.session.commit()
+        
+        get_cola_sri().notificar()
         
         return factura
     
+    def crear_facturas_lote(self, usuario_id: int, facturas: list) -> list:
+        """
+        Crea muchas facturas en una sola operación
+        
+        XML y firma se calculan en un pool de procesos (con FIRMA_MERKLE
+        se firma una sola raíz para todo el lote); las filas se
+        insertan juntas (en PENDIENTE y encoladas para el SRI) y se confirman
+        en un único commit.
+        
+        Args:
+            usuario_id: ID del usuario que emite las facturas
+            facturas: Lista de {cliente_id, items, observaciones}
+            
+        Returns:
+            list: Un resultado por factura, en el mismo orden:
+                  {indice, success, factura} o {indice, success, error}
+        """
+        resultados = [None] * len(facturas)
+        
+        def registrar_error(indice, mensaje):
+            resultados[indice] = {'indice': indice, 'success': False, 'error': mensaje}
+        
+        # 1. Validar estructura y totales (antes de reservar números)
+        validas = []
+        cliente_ids = {}
+        totales = {}
+        for indice, datos in enumerate(facturas):
+            items = datos.get('items') if isinstance(datos, dict) else None
+            if not isinstance(datos, dict) or not datos.get('cliente_id'):
+                registrar_error(indice, 'cliente_id es requerido')
+                continue
+            try:
+                # Mismo cuerpo que POST /facturas: se acepta "1" como 1
+                cliente_ids[indice] = int(datos['cliente_id'])
+            except (TypeError, ValueError):
+                registrar_error(indice, 'cliente_id debe ser un número entero')
+                continue
+            if not items or not isinstance(items, list):
+                registrar_error(indice, 'items es requerido y debe contener al menos un producto')
+            elif not all(isinstance(item, dict) and 'cantidad' in item and 'precio_unitario' in item
+                         for item in items):
+                registrar_error(indice, 'Cada item debe tener cantidad y precio_unitario')
+            else:
+                try:
+                    totales[indice] = self.calcular_totales(items)
+                    validas.append(indice)
+                except ValueError as e:
+                    registrar_error(indice, str(e))
+        
+        # 2. Cargar y descifrar todos los clientes en una pasada
+        ids_clientes = {cliente_ids[indice] for indice in validas}
+        clientes = {
+            cliente.id: cliente
+            for cliente in Cliente.query.filter(Cliente.id.in_(ids_clientes)).all()
+        } if ids_clientes else {}
+        lista_clientes = list(clientes.values())
+        descifrados = dict(zip(
+            [cliente.id for cliente in lista_clientes],
+            self.crypto_service.decrypt_clientes(lista_clientes)
+        ))
+        
+        pendientes = []
+        for indice in validas:
+            cliente_id = cliente_ids[indice]
+            if cliente_id not in clientes:
+                registrar_error(indice, f"Cliente {cliente_id} no encontrado")
+            elif descifrados[cliente_id]['error']:
+                registrar_error(indice, f"No se pudo descifrar el cliente {cliente_id}")
+            else:
+                pendientes.append(indice)
+        
+        if not pendientes:
+            return resultados
+        
+        # 3. Números de factura + XML + firma en paralelo
+        #    El número va firmado dentro del XML: si algún documento falla se
+        #    devuelven los números de la vuelta y se numeran de nuevo solo los
+        #    que salieron bien (sin huecos con FACTURA_BLOQUE_SECUENCIAL=1)
+        while pendientes:
+            numeros = self.asignador.reservar(len(pendientes), self.establecimiento, self.punto_emision)
+            trabajos = []
+            for indice, numero_factura in zip(pendientes, numeros):
+                cliente = clientes[cliente_ids[indice]]
+                factura_data = self._preparar_datos_factura(numero_factura, totales[indice])
+                cliente_datos = cliente.to_dict(decrypted_data=descifrados[cliente.id]['datos'])
+                trabajos.append((factura_data, cliente_datos, facturas[indice]['items']))
+            
+            documentos = self._procesar_documentos(trabajos)
+            fallidas = {
+                indice: documento['error']
+                for indice, documento in zip(pendientes, documentos) if not documento['ok']
+            }
+            if not fallidas:
+                break
+            for indice, error in fallidas.items():
+                registrar_error(indice, error)
+            
+            if self.asignador.devolver(len(pendientes), self.establecimiento, self.punto_emision):
+                pendientes = [indice for indice in pendientes if indice not in fallidas]
+                continue
+            
+            # Por bloques los huecos ya se admiten: se conservan los documentos firmados
+            listos = [
+                (indice, trabajo, documento)
+                for indice, trabajo, documento in zip(pendientes, trabajos, documentos)
+                if documento['ok']
+            ]
+            pendientes = [indice for indice, _, _ in listos]
+            trabajos = [trabajo for _, trabajo, _ in listos]
+            documentos = [documento for _, _, documento in listos]
+            break
+        
+        if not pendientes:
+            db.session.commit()
+            return resultados
+        
+        # 4. Insertar todas las filas y confirmar una sola vez
+        creadas = []
+        qr_service = get_qr_service()
+        almacen = get_almacen_xml()
+        for indice, (factura_data, _, items), documento in zip(pendientes, trabajos, documentos):
+            datos = facturas[indice]
+            factura = Factura(
+                numero_factura=factura_data['numero_factura'],
+                cliente_id=cliente_ids[indice],
+                usuario_id=usuario_id,
+                fecha_emision=factura_data['fecha_emision'],
+                subtotal=factura_data['subtotal'],
+                iva=factura_data['iva'],
+                total=factura_data['total'],
+                hash_sha256=documento['hash_sha256'],
+                firma_digital=documento['firma_digital'],
+                prueba_merkle=documento['prueba_merkle'],
+                key_id=documento['key_id'],
+                observaciones=datos.get('observaciones'),
+                items=items
+            )
+            factura.qr_data = qr_service.texto_qr(factura)
+            almacen.guardar(documento['hash_sha256'], documento['xml_firmado'])
+            
+            marcar_pendiente(factura)
+            
+            FacturaResumenDiario.acumular(
+                fecha=factura.fecha_emision.date(),
+                estado_sri=factura.estado_sri,
+                usuario_id=usuario_id,
+                cliente_id=factura.cliente_id,
+                total=factura_data['total']
+            )
+            creadas.append((indice, factura))
+        
+        db.session.add_all([factura for _, factura in creadas])
+        db.session.commit()
+        if creadas:
+            get_cola_sri().notificar()
+        
+        for indice, factura in creadas:
+            resultados[indice] = {
+                'indice': indice,
+                'success': True,
+                'factura': {
+                    'id': factura.id,
+                    'numero_factura': factura.numero_factura,
+                    'total': float(factura.total),
+                    'hash_sha256': factura.hash_sha256,
+                    'estado_sri': factura.estado_sri
+                }
+            }
+        
+        return resultados
+    
+    def _procesar_documentos(self, trabajos: list) -> list:
+        """
+        Ejecuta procesar_documento para cada trabajo, en paralelo si el lote es grande
+        
+        Con FIRMA_MERKLE los documentos salen con marcadores y aquí se firma
+        la raíz del lote completo y se completan los XML.
+        """
+        diferir = self.firmador_merkle is not None
+        documentos = self._generar_documentos(trabajos, diferir)
+        if diferir:
+            listos = [documento for documento in documentos if documento['ok']]
+            firmas = self.firmador_merkle.firmar_lote([documento['hash_sha256'] for documento in listos])
+            for documento, firma in zip(listos, firmas):
+                documento['xml_firmado'] = completar_firma(
+                    documento['xml_firmado'], documento['hash_sha256'], firma
+                )
+                documento['firma_digital'], documento['prueba_merkle'] = firma
+                documento['key_id'] = self.key_id
+        return documentos
+    
+    def _generar_documentos(self, trabajos: list, diferir_firma: bool) -> list:
+        """XML (y firma, salvo diferir_firma) de cada trabajo, en el pool si son muchos"""
+        from flask import current_app
+        
+        workers = current_app.config.get('FACTURA_LOTE_WORKERS', 0)
+        minimo = current_app.config.get('FACTURA_LOTE_MIN_PARALELO', 8)
+        
+        if workers == 1 or len(trabajos) < minimo:
+            return [_procesar_con_servicio(self, trabajo, diferir_firma) for trabajo in trabajos]
+        
+        workers = workers or os.cpu_count() or 1
+        opciones_xml = {
+            'xml_compacto': self.xml_compacto,
+            'xml_streaming_min': self.xml_streaming_min
+        }
+        pool = _obtener_pool_lote(self.clave_firma, opciones_xml, workers)
+        tamano_chunk = max(1, len(trabajos) // (workers * 4))
+        try:
+            return list(pool.map(partial(_procesar_documento_lote, diferir_firma=diferir_firma),
+                                 trabajos, chunksize=tamano_chunk))
+        except BrokenProcessPool:
+            _cerrar_pool_lote()
+            raise
+    
+    @classmethod
+    def sin_bd(cls, clave_firma: dict, xml_compacto: bool = False,
+               xml_streaming_min: int = 1000) -> 'FacturaService':
+        """
+        Instancia para procesos trabajadores: solo XML y firma (sin BD ni AES)
+        
+        Args:
+            clave_firma: {private_key, public_key[, algoritmo, key_id]}
+                (sin algoritmo se asume RSA, como la fila rsa_keys)
+        """
+        clave_firma = {'algoritmo': 'rsa', **clave_firma}
+        clave_firma.setdefault('key_id', KeyRegistry.calcular_key_id(clave_firma['public_key']))
+        
+        servicio = cls.__new__(cls)
+        servicio.crypto_service = None
+        servicio._llavero_en_bd = False
+        servicio._cargar_claves({
+            'activa': clave_firma['key_id'],
+            'heredada': None,
+            'claves': {clave_firma['key_id']: clave_firma}
+        })
+        servicio.xml_compacto = xml_compacto
+        servicio.xml_streaming_min = xml_streaming_min
+        servicio.firmador_merkle = None
+        return servicio
+    
+    def _descripcion_algoritmo(self, key_id: str) -> str:
+        """Nombre legible del algoritmo con que se firmó una factura"""
+        clave = self._clave_publica(key_id or self.key_id_heredada or self.key_id)
+        return get_firmante(clave['algoritmo']).descripcion if clave else None
+    
     def verificar_integridad(self, hash_sha256: str) -> dict:
         """
         Verifica la integridad de una factura por su hash
@@ -464,7 +690,9 @@ class FacturaService:
         Returns:
             dict con status, factura_data, mensaje
         """
-        factura = Factura.query.filter_by(hash_sha256=hash_sha256).first()
+        factura = Factura.query.options(
+            db.joinedload(Factura.cliente), db.undefer(Factura.prueba_merkle)
+        ).filter_by(hash_sha256=hash_sha256).first()
         
         if not factura:
             return {
@@ -475,7 +703,9 @@ class FacturaService:
         
         # Verificar firma digital RSA - esto es suficiente para garantizar integridad
         print(f"🔍 Verificando firma para hash: {factura.hash_sha256[:16]}...")
-        firma_valida = self.verificar_firma(factura.hash_sha256, factura.firma_digital)
+        firma_valida = self.verificar_documento(
+            factura.hash_sha256, factura.firma_digital, factura.prueba_merkle, factura.key_id
+        )
         
         if not firma_valida:
             print("❌ Firma digital inválida")
@@ -488,22 +718,13 @@ class FacturaService:
         print("✅ Firma digital válida")
         
         # Factura válida
-        cliente = Cliente.query.get(factura.cliente_id)
+        cliente = factura.cliente
         # Descifrar datos del cliente
-        if cliente and cliente.nombres_enc:
-            from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-            encrypted_data = cliente.nombres_enc + cliente.tag
-            aesgcm = AESGCM(self.crypto_service.aes_master_key)
-            decrypted_all = aesgcm.decrypt(cliente.iv, encrypted_data, None).decode('utf-8')
-            partes = decrypted_all.split('|')
-            decrypted_data = {
-                'nombres': partes[0] if len(partes) > 0 else '',
-                'apellidos': partes[1] if len(partes) > 1 else '',
-                'direccion': partes[2] if len(partes) > 2 else '',
-                'telefono': partes[3] if len(partes) > 3 else '',
-                'email': partes[4] if len(partes) > 4 else ''
-            }
-            cliente_datos = cliente.to_dict(decrypted_data=decrypted_data)
+        if cliente:
+            resultado = self.crypto_service.decrypt_clientes(
+                [cliente], fields=('nombres', 'apellidos')
+            )[0]
+            cliente_datos = cliente.to_dict(decrypted_data=resultado['datos'])
         else:
             cliente_datos = {}
         
@@ -517,8 +738,92 @@ class FacturaService:
                 'cliente': f"{cliente_datos.get('nombres', '')} {cliente_datos.get('apellidos', '')}",
                 'identificacion': cliente_datos.get('identificacion', ''),
                 'total': float(factura.total),
+                'algoritmo_firma': self._descripcion_algoritmo(factura.key_id),
                 'estado_sri': factura.estado_sri,
                 'num_autorizacion': factura.num_autorizacion,
                 'fecha_autorizacion': factura.fecha_autorizacion.strftime('%d/%m/%Y %H:%M:%S') if factura.fecha_autorizacion else None
             }
         }
+
+
+
+# ============================================================================
+# POOL DE PROCESOS PARA LOTES (XML + FIRMA)
+# ============================================================================
+
+_pool_lote = None
+_pool_lote_firma = None  # (key_id, opciones_xml, workers) con que se creó el pool
+_pool_lote_lock = threading.Lock()
+_servicio_trabajador = None
+
+
+def _inicializar_trabajador_lote(clave_firma, opciones_xml):
+    """Inicializador de cada proceso del pool: la clave se parsea una vez por proceso"""
+    global _servicio_trabajador
+    _servicio_trabajador = FacturaService.sin_bd(clave_firma, **opciones_xml)
+
+
+def _procesar_con_servicio(servicio, trabajo, diferir_firma=False):
+    """Procesar un documento devolviendo el error en lugar de lanzarlo"""
+    factura_data, cliente_datos, items = trabajo
+    try:
+        return {'ok': True, **servicio.procesar_documento(factura_data, cliente_datos, items, diferir_firma)}
+    except Exception as e:
+        return {'ok': False, 'error': f"Error generando documento: {e}"}
+
+
+def _procesar_documento_lote(trabajo, diferir_firma=False):
+    """Función ejecutada en los procesos del pool"""
+    return _procesar_con_servicio(_servicio_trabajador, trabajo, diferir_firma)
+
+
+def _obtener_pool_lote(clave_firma, opciones_xml, workers=None):
+    """
+    Obtener (o crear) el pool de procesos compartido por el proceso
+
+    Los trabajadores guardan la clave y las opciones de XML con que se
+    iniciaron: si cambian (rotación de clave, otra configuración) el pool
+    se reemplaza por uno nuevo.
+    """
+    global _pool_lote, _pool_lote_firma
+    firma = (clave_firma['key_id'], tuple(sorted(opciones_xml.items())), workers)
+    with _pool_lote_lock:
+        if _pool_lote is not None and _pool_lote_firma != firma:
+            # Las tareas en curso del pool anterior terminan con su clave
+            _pool_lote.shutdown(wait=False)
+            _pool_lote = None
+        if _pool_lote is None:
+            _pool_lote_firma = firma
+            _pool_lote = ProcessPoolExecutor(
+                max_workers=workers or os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_inicializar_trabajador_lote,
+                initargs=(clave_firma, opciones_xml)
+            )
+        return _pool_lote
+
+
+@atexit.register
+def _cerrar_pool_lote(cancelar=True):
+    """
+    Cerrar el pool (al salir, si quedó inutilizable o al rotar la clave)
+
+    Args:
+        cancelar: Cancelar las tareas aún no iniciadas (False deja terminar
+            los lotes en curso con la clave anterior)
+    """
+    global _pool_lote, _pool_lote_firma
+    with _pool_lote_lock:
+        if _pool_lote is not None:
+            _pool_lote.shutdown(wait=False, cancel_futures=cancelar)
+            _pool_lote = None
+            _pool_lote_firma = None
+
+
+@event.listens_for(Configuracion, 'after_insert')
+@event.listens_for(Configuracion, 'after_update')
+@event.listens_for(Configuracion, 'after_delete')
+def _cerrar_pool_por_cambio_llavero(mapper, connection, target):
+    """Los trabajadores firman con la clave que recibieron al iniciar: al rotarla se descartan"""
+    if target.clave == CLAVE_CONFIG_FIRMA:
+        _cerrar_pool_lote(cancelar=False)
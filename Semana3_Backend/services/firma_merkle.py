@@ -0,0 +1,200 @@
+"""
+Firma por Lotes con Árbol de Merkle
+- Los hashes de las facturas emitidas en una ventana corta forman un árbol
+- Se firma solo la raíz (una operación RSA por ventana en lugar de una por factura)
+- Cada factura guarda su prueba de inclusión: raíz + hermanos hasta la raíz
+"""
+import hashlib
+import threading
+import time
+from typing import NamedTuple
+
+from services.metrics import FIRMA_MERKLE_HOJAS
+
+
+# Prefijos de dominio: una hoja nunca se confunde con un nodo interno
+_PREFIJO_HOJA = b'\x00'
+_PREFIJO_NODO = b'\x01'
+
+
+class FirmaMerkle(NamedTuple):
+    """Firma de la raíz (base64) y prueba de inclusión serializada"""
+    firma: str
+    prueba: str
+
+
+def _hoja(hash_sha256):
+    return hashlib.sha256(_PREFIJO_HOJA + bytes.fromhex(hash_sha256)).digest()
+
+
+def _nodo(izquierda, derecha):
+    return hashlib.sha256(_PREFIJO_NODO + izquierda + derecha).digest()
+
+
+def construir_arbol(hashes):
+    """
+    Raíz y rutas de inclusión de una lista de hashes
+
+    Un nodo sin pareja sube tal cual al nivel siguiente (no se duplica).
+
+    Returns:
+        tuple (raiz_hex, [ruta por hash]) con ruta = ['I<hex>' o 'D<hex>', ...]
+        (I: el hermano va a la izquierda, D: a la derecha)
+    """
+    if not hashes:
+        raise ValueError("No hay hashes para construir el árbol")
+
+    nivel = [_hoja(hash_sha256) for hash_sha256 in hashes]
+    posiciones = list(range(len(hashes)))  # Índice de cada hoja en el nivel actual
+    rutas = [[] for _ in hashes]
+
+    while len(nivel) > 1:
+        for hoja, posicion in enumerate(posiciones):
+            hermano = posicion ^ 1
+            if hermano < len(nivel):
+                lado = 'I' if hermano < posicion else 'D'
+                rutas[hoja].append(lado + nivel[hermano].hex())
+            posiciones[hoja] = posicion // 2
+        nivel = [
+            _nodo(nivel[i], nivel[i + 1]) if i + 1 < len(nivel) else nivel[i]
+            for i in range(0, len(nivel), 2)
+        ]
+
+    return nivel[0].hex(), rutas
+
+
+def serializar_prueba(raiz, ruta):
+    """Prueba en texto: '<raiz>:<paso>,<paso>,...'"""
+    return f"{raiz}:{','.join(ruta)}"
+
+
+def raiz_de_prueba(hash_sha256, prueba):
+    """
+    Recalcular la raíz desde el hash y comprobar que coincide con la de la prueba
+
+    Returns:
+        str: Raíz (hex) si la prueba es coherente, None si no
+    """
+    try:
+        raiz, pasos = prueba.split(':', 1)
+        actual = _hoja(hash_sha256)
+        for paso in filter(None, pasos.split(',')):
+            hermano = bytes.fromhex(paso[1:])
+            if paso[0] == 'I':
+                actual = _nodo(hermano, actual)
+            elif paso[0] == 'D':
+                actual = _nodo(actual, hermano)
+            else:
+                return None
+    except ValueError:
+        return None
+    return raiz if actual.hex() == raiz else None
+
+
+class _Solicitud:
+    __slots__ = ('hash_sha256', 'evento', 'resultado', 'error')
+
+    def __init__(self, hash_sha256):
+        self.hash_sha256 = hash_sha256
+        self.evento = threading.Event()
+        self.resultado = None
+        self.error = None
+
+
+class FirmadorMerkle:
+    """
+    Agrupa las firmas pedidas por hilos concurrentes en una firma de raíz
+
+    El primer hilo de cada ventana es el líder: espera hasta `ventana`
+    segundos (o hasta juntar `max_hojas`), firma la raíz y reparte las
+    pruebas. Un hilo solo espera como máximo una ventana.
+
+    Args:
+        firmar_raiz: Función raiz_hex -> firma_base64 (la firma RSA del servicio)
+        ventana: Segundos que se esperan más facturas
+        max_hojas: Facturas por árbol (cierra la ventana antes de tiempo)
+    """
+
+    def __init__(self, firmar_raiz, ventana=0.01, max_hojas=256):
+        self.firmar_raiz = firmar_raiz
+        self.ventana = ventana
+        self.max_hojas = max_hojas
+        self._condicion = threading.Condition()
+        self._pendientes = []
+
+    def firmar(self, hash_sha256):
+        """
+        Firmar un hash dentro de la ventana actual
+
+        Returns:
+            FirmaMerkle
+        """
+        solicitud = _Solicitud(hash_sha256)
+        with self._condicion:
+            self._pendientes.append(solicitud)
+            lider = len(self._pendientes) == 1
+            if len(self._pendientes) >= self.max_hojas:
+                self._condicion.notify_all()
+
+            if lider:
+                limite = time.monotonic() + self.ventana
+                while len(self._pendientes) < self.max_hojas:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        break
+                    self._condicion.wait(restante)
+                lote, self._pendientes = self._pendientes, []
+
+        if lider:
+            # Fuera del lock: la siguiente ventana ya puede llenarse
+            self._resolver(lote)
+        else:
+            solicitud.evento.wait()
+
+        if solicitud.error is not None:
+            raise solicitud.error
+        return solicitud.resultado
+
+    def _resolver(self, lote):
+        try:
+            firmas = self.firmar_lote([solicitud.hash_sha256 for solicitud in lote])
+            for solicitud, firma in zip(lote, firmas):
+                solicitud.resultado = firma
+        except Exception as e:
+            for solicitud in lote:
+                solicitud.error = e
+        finally:
+            for solicitud in lote:
+                solicitud.evento.set()
+
+    def firmar_lote(self, hashes):
+        """
+        Firmar de inmediato una lista de hashes (sin ventana, p. ej. un lote de facturas)
+
+        Returns:
+            list de FirmaMerkle en el mismo orden
+        """
+        firmas = []
+        for inicio in range(0, len(hashes), self.max_hojas):
+            grupo = hashes[inicio:inicio + self.max_hojas]
+            raiz, rutas = construir_arbol(grupo)
+            firma = self.firmar_raiz(raiz)
+            FIRMA_MERKLE_HOJAS.observar(len(grupo))
+            firmas.extend(FirmaMerkle(firma, serializar_prueba(raiz, ruta)) for ruta in rutas)
+        return firmas
+
+
+def firma_diferida(hash_sha256):
+    """
+    Marcadores en lugar de la firma (procesos del lote: la raíz se firma después
+    en el proceso principal y se reemplazan en el XML con completar_firma)
+    """
+    return FirmaMerkle(f"@FIRMA:{hash_sha256}@", f"@PRUEBA:{hash_sha256}@")
+
+
+def completar_firma(xml_firmado, hash_sha256, firma):
+    """Reemplazar los marcadores de firma_diferida por la firma real"""
+    marcadores = firma_diferida(hash_sha256)
+    return (xml_firmado
+            .replace(marcadores.firma, firma.firma, 1)
+            .replace(marcadores.prueba, firma.prueba, 1))
@@ -0,0 +1,221 @@
+"""
+Algoritmos de Firma Digital de Facturas
+- RSA-2048 PSS, ECDSA P-256 y Ed25519 detrás de la misma interfaz
+- Llavero en configuracion ('claves_firma'): la clave activa firma y las
+  anteriores se conservan para verificar facturas viejas (key id por factura)
+"""
+import json
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+
+from models.base import db
+from services.key_registry import KeyRegistry, CLAVE_CONFIG_FIRMA, CLAVE_CONFIG_RSA
+
+
+class Firmante:
+    """Interfaz de un algoritmo de firma (las claves ya parseadas vienen del KeyRegistry)"""
+
+    algoritmo = None
+    descripcion = None
+
+    def generar_clave(self):
+        raise NotImplementedError
+
+    def firmar(self, clave_privada, datos):
+        """Firma de datos (bytes)"""
+        raise NotImplementedError
+
+    def verificar(self, clave_publica, firma, datos):
+        """Lanza cryptography.exceptions.InvalidSignature si la firma no es válida"""
+        raise NotImplementedError
+
+    def generar_par_claves(self):
+        """
+        Generar par de claves en PEM
+
+        Returns:
+            tuple: (clave_privada_pem, clave_publica_pem)
+        """
+        clave = self.generar_clave()
+        private_pem = clave.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        ).decode('utf-8')
+        public_pem = clave.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode('utf-8')
+        return private_pem, public_pem
+
+
+class FirmanteRsa(Firmante):
+    """RSA-2048 con PSS padding y SHA-256 (firma de 256 bytes)"""
+
+    algoritmo = 'rsa'
+    descripcion = 'RSA-2048 PSS SHA-256'
+    _PADDING = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.MAX_LENGTH)
+
+    def generar_clave(self):
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def firmar(self, clave_privada, datos):
+        return clave_privada.sign(datos, self._PADDING, hashes.SHA256())
+
+    def verificar(self, clave_publica, firma, datos):
+        clave_publica.verify(firma, datos, self._PADDING, hashes.SHA256())
+
+
+class FirmanteEcdsa(Firmante):
+    """ECDSA sobre P-256 con SHA-256 (firma DER de ~72 bytes)"""
+
+    algoritmo = 'ecdsa-p256'
+    descripcion = 'ECDSA P-256 SHA-256'
+
+    def generar_clave(self):
+        return ec.generate_private_key(ec.SECP256R1())
+
+    def firmar(self, clave_privada, datos):
+        return clave_privada.sign(datos, ec.ECDSA(hashes.SHA256()))
+
+    def verificar(self, clave_publica, firma, datos):
+        clave_publica.verify(firma, datos, ec.ECDSA(hashes.SHA256()))
+
+
+class FirmanteEd25519(Firmante):
+    """Ed25519 (firma determinista de 64 bytes)"""
+
+    algoritmo = 'ed25519'
+    descripcion = 'Ed25519'
+
+    def generar_clave(self):
+        return ed25519.Ed25519PrivateKey.generate()
+
+    def firmar(self, clave_privada, datos):
+        return clave_privada.sign(datos)
+
+    def verificar(self, clave_publica, firma, datos):
+        clave_publica.verify(firma, datos)
+
+
+FIRMANTES = {
+    firmante.algoritmo: firmante
+    for firmante in (FirmanteRsa(), FirmanteEcdsa(), FirmanteEd25519())
+}
+
+
+def get_firmante(algoritmo):
+    """Obtener el firmante de un algoritmo ('rsa', 'ecdsa-p256' o 'ed25519')"""
+    firmante = FIRMANTES.get(algoritmo)
+    if firmante is None:
+        raise ValueError(f"Algoritmo de firma no soportado: {algoritmo}. Use: {', '.join(FIRMANTES)}")
+    return firmante
+
+
+# ============================================================================
+# LLAVERO DE CLAVES DE FIRMA (tabla configuracion)
+# ============================================================================
+
+def nueva_clave(algoritmo):
+    """
+    Generar una clave para el llavero
+
+    Returns:
+        dict {key_id, algoritmo, private_key, public_key}
+    """
+    private_pem, public_pem = get_firmante(algoritmo).generar_par_claves()
+    return {
+        'key_id': KeyRegistry.calcular_key_id(public_pem),
+        'algoritmo': algoritmo,
+        'private_key': private_pem,
+        'public_key': public_pem
+    }
+
+
+def _guardar_llavero(fila, llavero):
+    from models.configuracion import Configuracion
+
+    if fila is None:
+        fila = Configuracion(
+            clave=CLAVE_CONFIG_FIRMA,
+            descripcion='Claves de firma de facturas (activa y anteriores, por key id)',
+            tipo_dato='JSON'
+        )
+        db.session.add(fila)
+    fila.valor = json.dumps(llavero)
+    db.session.commit()
+
+
+def leer_llavero():
+    """
+    Llavero guardado en configuracion (sin crear nada)
+
+    Si todavía no existe pero está la fila rsa_keys anterior, se arma con
+    esa clave como 'heredada' (firmó las facturas sin key_id).
+
+    Returns:
+        tuple (fila Configuracion o None, dict {activa, heredada, claves} o None)
+    """
+    from models.configuracion import Configuracion
+
+    fila = Configuracion.query.filter_by(clave=CLAVE_CONFIG_FIRMA).first()
+    if fila and fila.valor:
+        return fila, json.loads(fila.valor)
+
+    fila_rsa = Configuracion.query.filter_by(clave=CLAVE_CONFIG_RSA).first()
+    if fila_rsa and fila_rsa.valor:
+        rsa_keys = json.loads(fila_rsa.valor)
+        key_id = KeyRegistry.calcular_key_id(rsa_keys['public_key'])
+        clave = {'key_id': key_id, 'algoritmo': 'rsa', **rsa_keys}
+        return fila, {'activa': key_id, 'heredada': key_id, 'claves': {key_id: clave}}
+    return fila, None
+
+
+def obtener_llavero(algoritmo='rsa'):
+    """
+    Llavero con una clave activa del algoritmo pedido
+
+    Si la clave activa es de otro algoritmo (cambió FIRMA_ALGORITMO) se
+    genera una nueva y pasa a ser la activa; las anteriores se conservan.
+
+    Returns:
+        dict {activa: key_id, heredada: key_id o None, claves: {key_id: clave}}
+    """
+    get_firmante(algoritmo)
+    fila, llavero = leer_llavero()
+    guardado = fila is not None and fila.valor
+
+    if llavero is None:
+        llavero = {'activa': None, 'heredada': None, 'claves': {}}
+    activa = llavero['claves'].get(llavero['activa'])
+
+    if activa is None or activa['algoritmo'] != algoritmo:
+        print(f"🔑 Generando clave de firma {get_firmante(algoritmo).descripcion}...")
+        clave = nueva_clave(algoritmo)
+        llavero['claves'][clave['key_id']] = clave
+        llavero['activa'] = clave['key_id']
+        guardado = False
+
+    if not guardado:
+        _guardar_llavero(fila, llavero)
+        print(f"💾 Clave de firma activa: {llavero['activa']} "
+              f"({llavero['claves'][llavero['activa']]['algoritmo']})")
+    return llavero
+
+
+def rotar_clave(algoritmo='rsa'):
+    """
+    Generar una clave nueva y activarla (las anteriores siguen verificando)
+
+    Returns:
+        dict: La clave nueva
+    """
+    fila, llavero = leer_llavero()
+    if llavero is None:
+        llavero = {'activa': None, 'heredada': None, 'claves': {}}
+    clave = nueva_clave(algoritmo)
+    llavero['claves'][clave['key_id']] = clave
+    llavero['activa'] = clave['key_id']
+    _guardar_llavero(fila, llavero)
+    return clave
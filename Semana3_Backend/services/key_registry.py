@@ -0,0 +1,146 @@
+"""
+Registro de Claves Parseadas
+Cache de objetos de clave (RSA, ECDSA, Ed25519) por key id para no re-parsear PEM en cada firma
+"""
+import hashlib
+import threading
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.backends import default_backend
+from sqlalchemy import event
+
+from models.configuracion import Configuracion
+
+
+# Clave de configuración que contiene el par RSA original de la aplicación
+CLAVE_CONFIG_RSA = 'rsa_keys'
+# Llavero de claves de firma (activa + anteriores, ver services/firmantes.py)
+CLAVE_CONFIG_FIRMA = 'claves_firma'
+
+
+class KeyRegistry:
+    """Registro de claves parseadas compartido por todo el proceso"""
+
+    def __init__(self):
+        self._privadas = {}
+        self._publicas = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def calcular_key_id(pem):
+        """
+        Calcular identificador estable de una clave
+
+        Args:
+            pem: Clave en formato PEM (str)
+
+        Returns:
+            str: Primeros 16 caracteres hex del SHA-256 del PEM
+        """
+        return hashlib.sha256(pem.strip().encode('utf-8')).hexdigest()[:16]
+
+    def _obtener(self, cache, pem, key_id, cargar):
+        """Buscar en cache o parsear y almacenar la clave"""
+        if key_id is None:
+            key_id = self.calcular_key_id(pem)
+
+        with self._lock:
+            clave = cache.get(key_id)
+            if clave is not None:
+                self.hits += 1
+                return clave
+            self.misses += 1
+
+        # Parsear fuera del lock; si dos hilos parsean a la vez gana el primero
+        clave = cargar(pem.encode('utf-8'))
+        with self._lock:
+            return cache.setdefault(key_id, clave)
+
+    def obtener_clave_privada(self, private_key_pem, key_id=None):
+        """
+        Obtener objeto de clave privada (parsea el PEM solo la primera vez)
+
+        Args:
+            private_key_pem: Clave privada en formato PEM
+            key_id: Identificador de la clave (se calcula del PEM si no se indica)
+
+        Returns:
+            Objeto de clave privada de cryptography
+        """
+        return self._obtener(
+            self._privadas, private_key_pem, key_id,
+            lambda datos: serialization.load_pem_private_key(
+                datos, password=None, backend=default_backend()
+            )
+        )
+
+    def obtener_clave_publica(self, public_key_pem, key_id=None):
+        """
+        Obtener objeto de clave pública (parsea el PEM solo la primera vez)
+
+        Args:
+            public_key_pem: Clave pública en formato PEM
+            key_id: Identificador de la clave (se calcula del PEM si no se indica)
+
+        Returns:
+            Objeto de clave pública de cryptography
+        """
+        return self._obtener(
+            self._publicas, public_key_pem, key_id,
+            lambda datos: serialization.load_pem_public_key(
+                datos, backend=default_backend()
+            )
+        )
+
+    def invalidar(self, key_id=None):
+        """
+        Descartar claves parseadas
+
+        Args:
+            key_id: Clave a descartar; si es None se vacía todo el registro
+        """
+        with self._lock:
+            if key_id is None:
+                self._privadas.clear()
+                self._publicas.clear()
+            else:
+                self._privadas.pop(key_id, None)
+                self._publicas.pop(key_id, None)
+
+    def estadisticas(self):
+        """
+        Obtener contadores del registro
+
+        Returns:
+            dict: {hits, misses, claves_privadas, claves_publicas}
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'claves_privadas': len(self._privadas),
+                'claves_publicas': len(self._publicas)
+            }
+
+
+# Instancia global
+_key_registry = KeyRegistry()
+
+
+def get_key_registry():
+    """Obtener registro de claves del proceso"""
+    return _key_registry
+
+
+# ============================================================================
+# INVALIDACIÓN AL CAMBIAR LAS CLAVES DE FIRMA EN CONFIGURACION
+# ============================================================================
+
+@event.listens_for(Configuracion, 'after_insert')
+@event.listens_for(Configuracion, 'after_update')
+@event.listens_for(Configuracion, 'after_delete')
+def _invalidar_por_cambio_configuracion(mapper, connection, target):
+    """Vaciar el registro cuando cambia la fila rsa_keys o claves_firma"""
+    if target.clave in (CLAVE_CONFIG_RSA, CLAVE_CONFIG_FIRMA):
+        _key_registry.invalidar()
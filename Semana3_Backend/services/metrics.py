@@ -0,0 +1,300 @@
+"""
+Métricas en Proceso (formato de texto Prometheus)
+Contadores e histogramas sin colector externo, expuestos en /metrics
+"""
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import Response, g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Buckets por defecto (segundos)
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escapar(valor):
+    """Escapar barra invertida, comillas y saltos de línea en valores de etiqueta"""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatear_etiquetas(nombres, valores, extra=None):
+    """Etiquetas en formato {a="x",b="y"}"""
+    pares = list(zip(nombres, valores))
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ''
+    texto = ','.join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in pares)
+    return '{' + texto + '}'
+
+
+def _formatear_numero(valor):
+    """Número en formato de exposición (+Inf, enteros sin decimales)"""
+    if valor == float('inf'):
+        return '+Inf'
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metrica:
+    """Base de métricas con etiquetas"""
+
+    tipo = None
+
+    def __init__(self, nombre, descripcion, etiquetas=()):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = tuple(etiquetas)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _clave(self, valores):
+        if set(valores) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre}: se esperaban etiquetas {self.etiquetas}")
+        return tuple(valores[etiqueta] for etiqueta in self.etiquetas)
+
+    def exponer(self):
+        """Líneas de texto de la métrica"""
+        lineas = [
+            f"# HELP {self.nombre} {self.descripcion}",
+            f"# TYPE {self.nombre} {self.tipo}"
+        ]
+        with self._lock:
+            series = sorted(self._series.items())
+            for clave, valor in series:
+                lineas.extend(self._exponer_serie(clave, valor))
+        return lineas
+
+
+class Contador(_Metrica):
+    """Contador monótono"""
+
+    tipo = 'counter'
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._series[clave] = self._series.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas):
+        with self._lock:
+            return self._series.get(self._clave(etiquetas), 0)
+
+    def _exponer_serie(self, clave, valor):
+        return [f"{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {_formatear_numero(valor)}"]
+
+
+class Histograma(_Metrica):
+    """Histograma con buckets acumulativos, suma y cuenta"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nombre, descripcion, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        super().__init__(nombre, descripcion, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                # [conteos por bucket (+Inf al final), suma, cuenta]
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        """Observar la duración del bloque en segundos"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def cuenta(self, **etiquetas):
+        with self._lock:
+            serie = self._series.get(self._clave(etiquetas))
+            return serie[2] if serie else 0
+
+    def _exponer_serie(self, clave, serie):
+        conteos, suma, cuenta = serie
+        lineas = []
+        acumulado = 0
+        for limite, conteo in zip(self.buckets + (float('inf'),), conteos):
+            acumulado += conteo
+            etiquetas = _formatear_etiquetas(self.etiquetas, clave, ('le', _formatear_numero(limite)))
+            lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+        etiquetas = _formatear_etiquetas(self.etiquetas, clave)
+        lineas.append(f"{self.nombre}_sum{etiquetas} {_formatear_numero(suma)}")
+        lineas.append(f"{self.nombre}_count{etiquetas} {cuenta}")
+        return lineas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas del proceso"""
+
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            existente = self._metricas.setdefault(metrica.nombre, metrica)
+        if type(existente) is not type(metrica):
+            raise ValueError(f"Métrica {metrica.nombre} ya registrada con otro tipo")
+        return existente
+
+    def contador(self, nombre, descripcion, etiquetas=()):
+        return self._registrar(Contador(nombre, descripcion, etiquetas))
+
+    def histograma(self, nombre, descripcion, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        return self._registrar(Histograma(nombre, descripcion, etiquetas, buckets))
+
+    def exponer(self):
+        """Texto completo para /metrics"""
+        with self._lock:
+            metricas = sorted(self._metricas.values(), key=lambda m: m.nombre)
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exponer())
+        return '\n'.join(lineas) + '\n'
+
+
+# ============================================================================
+# MÉTRICAS DE LA APLICACIÓN
+# ============================================================================
+
+REGISTRO = RegistroMetricas()
+
+HTTP_LATENCIA = REGISTRO.histograma(
+    'http_request_duration_seconds', 'Latencia de requests HTTP por ruta',
+    ('metodo', 'ruta', 'estado')
+)
+DB_CONSULTAS_REQUEST = REGISTRO.histograma(
+    'db_queries_per_request', 'Consultas SQL ejecutadas por request',
+    ('ruta',), buckets=BUCKETS_CONSULTAS
+)
+DB_TIEMPO_REQUEST = REGISTRO.histograma(
+    'db_query_seconds_per_request', 'Tiempo total en consultas SQL por request',
+    ('ruta',)
+)
+DB_CONSULTAS = REGISTRO.contador(
+    'db_queries_total', 'Consultas SQL ejecutadas'
+)
+FACTURA_ETAPAS = REGISTRO.histograma(
+    'factura_etapa_duration_seconds', 'Duración de cada etapa de crear_factura',
+    ('etapa',)
+)
+BCRYPT_OPERACIONES = REGISTRO.contador(
+    'bcrypt_operations_total', 'Operaciones bcrypt (hash y verificación)',
+    ('operacion',)
+)
+BCRYPT_LATENCIA = REGISTRO.histograma(
+    'bcrypt_duration_seconds', 'Duración de operaciones bcrypt',
+    ('operacion',)
+)
+AES_OPERACIONES = REGISTRO.contador(
+    'aes_gcm_operations_total', 'Operaciones AES-256-GCM (cifrar y descifrar)',
+    ('operacion',)
+)
+QR_CACHE = REGISTRO.contador(
+    'qr_cache_total', 'Consultas a la caché de imágenes QR (hit o miss)',
+    ('resultado',)
+)
+QR_RENDER = REGISTRO.histograma(
+    'qr_render_duration_seconds', 'Duración del render de QR bajo demanda',
+    ('formato',)
+)
+VERIFICACION_CACHE = REGISTRO.contador(
+    'verificacion_cache_total', 'Consultas a la caché de verificación pública (hit o miss)',
+    ('resultado',)
+)
+VERIFICACION_LIMITADAS = REGISTRO.contador(
+    'verificacion_limitadas_total', 'Verificaciones públicas rechazadas por el limitador (HTTP 429)'
+)
+FIRMA_MERKLE_HOJAS = REGISTRO.histograma(
+    'firma_merkle_hojas', 'Facturas cubiertas por cada firma de raíz Merkle',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+
+
+def medir_etapa(etapa):
+    """Medir una etapa de crear_factura (xml, firma, autorizacion, autorizacion_lote, commit)"""
+    return FACTURA_ETAPAS.medir(etapa=etapa)
+
+
+# ============================================================================
+# INTEGRACIÓN CON FLASK Y SQLALCHEMY
+# ============================================================================
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_metricas_inicio', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _despues_de_consulta(conn, cursor, statement, parameters, context, executemany):
+    inicios = conn.info.get('_metricas_inicio')
+    duracion = time.perf_counter() - inicios.pop() if inicios else 0.0
+    DB_CONSULTAS.inc()
+
+    # Acumular en el request actual (si la consulta ocurre dentro de uno)
+    if has_request_context() and 'metricas_consultas' in g:
+        g.metricas_consultas += 1
+        g.metricas_tiempo_db += duracion
+
+
+@event.listens_for(Engine, 'handle_error')
+def _consulta_fallida(contexto):
+    # Sin esto el inicio quedaría en la conexión del pool y descuadraría la siguiente consulta
+    if contexto.connection is not None:
+        inicios = contexto.connection.info.get('_metricas_inicio')
+        if inicios:
+            inicios.pop()
+
+
+def _ruta_actual():
+    """Plantilla de la ruta (p. ej. /api/v1/facturas/<int:factura_id>) para acotar cardinalidad"""
+    return request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+
+
+def init_metrics(app):
+    """
+    Registrar hooks de medición y el endpoint /metrics
+
+    Args:
+        app: Aplicación Flask
+    """
+    @app.before_request
+    def _iniciar_medicion():
+        g.metricas_inicio = time.perf_counter()
+        g.metricas_consultas = 0
+        g.metricas_tiempo_db = 0.0
+
+    @app.after_request
+    def _registrar_medicion(response):
+        inicio = g.pop('metricas_inicio', None)
+        if inicio is None:
+            return response
+
+        ruta = _ruta_actual()
+        HTTP_LATENCIA.observar(
+            time.perf_counter() - inicio,
+            metodo=request.method, ruta=ruta, estado=str(response.status_code)
+        )
+        DB_CONSULTAS_REQUEST.observar(g.pop('metricas_consultas', 0), ruta=ruta)
+        DB_TIEMPO_REQUEST.observar(g.pop('metricas_tiempo_db', 0.0), ruta=ruta)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Métricas del proceso en formato de texto Prometheus"""
+        return Response(REGISTRO.exponer(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,127 @@
+"""
+Paginación por cursor (keyset)
+Evita COUNT(*) y escaneos con OFFSET en tablas grandes
+"""
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+LIMITE_POR_DEFECTO = 20
+LIMITE_MAXIMO = 100
+ENTERO_MAXIMO = 2 ** 63 - 1  # BIGINT
+
+
+def codificar_cursor(valores):
+    """
+    Codificar los valores de la clave de orden como cursor opaco
+
+    Args:
+        valores: Lista de valores (int, str o datetime) de la última fila
+
+    Returns:
+        str: Cursor en base64 url-safe
+    """
+    serializados = [
+        {'dt': valor.isoformat()} if isinstance(valor, datetime) else valor
+        for valor in valores
+    ]
+    datos = json.dumps(serializados, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(datos).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    Decodificar un cursor generado por codificar_cursor
+
+    Args:
+        cursor: Cursor opaco recibido del cliente
+
+    Returns:
+        list: Valores de la clave de orden
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        serializados = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return [
+            datetime.fromisoformat(valor['dt']) if isinstance(valor, dict) else valor
+            for valor in serializados
+        ]
+    except Exception:
+        raise ValueError('Cursor inválido')
+
+
+def _validar_valores(valores, columnas):
+    """
+    Comprobar que cada valor del cursor es del tipo de su columna
+
+    Un cursor alterado a mano (p. ej. texto en lugar de fecha) no debe
+    llegar a la consulta: PostgreSQL respondería con un error de tipos.
+
+    Raises:
+        ValueError: Si algún valor no corresponde a su columna
+    """
+    if len(valores) != len(columnas):
+        raise ValueError('Cursor inválido')
+    for valor, columna in zip(valores, columnas):
+        tipo = columna.type.python_type
+        if isinstance(valor, bool) or not isinstance(valor, tipo):
+            raise ValueError('Cursor inválido')
+        if tipo is int and abs(valor) > ENTERO_MAXIMO:
+            raise ValueError('Cursor inválido')
+
+
+def leer_limite(valor, por_defecto=LIMITE_POR_DEFECTO):
+    """Normalizar el parámetro limit al rango permitido"""
+    try:
+        limite = int(valor) if valor is not None else por_defecto
+    except (TypeError, ValueError):
+        limite = por_defecto
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def paginar_por_cursor(query, columnas, cursor=None, limit=LIMITE_POR_DEFECTO,
+                       descendente=False, contar=False):
+    """
+    Paginar una consulta por cursor sobre una clave de orden única
+
+    Args:
+        query: Query de SQLAlchemy con los filtros ya aplicados (sin order_by)
+        columnas: Columnas de la clave de orden, la última debe ser única (p. ej. id)
+        cursor: Cursor de la página anterior (None o '' para la primera página)
+        limit: Registros por página
+        descendente: Orden descendente en todas las columnas
+        contar: Si es True se calcula el total (COUNT) de la consulta filtrada
+
+    Returns:
+        dict: {items, next_cursor, total}; total es None si contar es False
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    total = query.order_by(None).count() if contar else None
+
+    if cursor:
+        valores = decodificar_cursor(cursor)
+        _validar_valores(valores, columnas)
+        clave = tuple_(*columnas)
+        query = query.filter(clave < tuple_(*valores) if descendente else clave > tuple_(*valores))
+
+    orden = [columna.desc() if descendente else columna.asc() for columna in columnas]
+    filas = query.order_by(*orden).limit(limit + 1).all()
+
+    items = filas[:limit]
+    next_cursor = None
+    if len(filas) > limit:
+        ultimo = items[-1]
+        next_cursor = codificar_cursor([getattr(ultimo, columna.key) for columna in columnas])
+
+    return {
+        'items': items,
+        'next_cursor': next_cursor,
+        'total': total
+    }
@@ -0,0 +1,92 @@
+"""
+Pool de Conexiones y Límites de Tiempo de Consulta
+- statement_timeout por defecto en cada conexión nueva (solo PostgreSQL)
+- Decorador para ampliar/reducir el límite en rutas de reportes (SET LOCAL)
+- Estado del pool (en uso, libres, saturación) para /health
+"""
+from functools import wraps
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+from models import db
+
+
+def _es_postgresql(engine):
+    return engine.dialect.name == 'postgresql'
+
+
+def init_pool_bd(app):
+    """
+    Aplicar DB_STATEMENT_TIMEOUT_MS a cada conexión que abra el pool
+
+    Args:
+        app: Aplicación Flask (con db ya inicializada)
+    """
+    timeout_ms = app.config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+    with app.app_context():
+        engine = db.engine
+    if not timeout_ms or not _es_postgresql(engine):
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _fijar_statement_timeout(conexion_dbapi, registro):
+        cursor = conexion_dbapi.cursor()
+        cursor.execute(f'SET statement_timeout = {int(timeout_ms)}')
+        cursor.close()
+        # psycopg2 abre una transacción implícita con el SET
+        conexion_dbapi.commit()
+
+    print(f"✅ statement_timeout por conexión: {timeout_ms} ms")
+
+
+def con_statement_timeout(clave='DB_STATEMENT_TIMEOUT_REPORTES_MS'):
+    """
+    Decorador de rutas: límite de tiempo propio para las consultas del request
+
+    Usa SET LOCAL, que dura hasta el fin de la transacción actual; al devolver
+    la conexión al pool vuelve el límite por defecto. En SQLite no hace nada.
+
+    Args:
+        clave: Clave de configuración con el límite en milisegundos (0 = sin límite)
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if _es_postgresql(db.engine):
+                timeout_ms = int(current_app.config.get(clave, 0))
+                db.session.execute(db.text(f'SET LOCAL statement_timeout = {timeout_ms}'))
+            return vista(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def estadisticas_pool():
+    """
+    Estado del pool de conexiones del proceso
+
+    Returns:
+        dict: clase del pool y, si es QueuePool, tamaño, conexiones en uso,
+              libres, overflow y saturación (en uso / capacidad máxima)
+    """
+    pool = db.engine.pool
+    estadisticas = {'clase': type(pool).__name__}
+    if not isinstance(pool, QueuePool):
+        return estadisticas
+
+    tamano = pool.size()
+    max_overflow = pool._max_overflow
+    en_uso = pool.checkedout()
+    # max_overflow = -1 significa sin tope: no hay saturación que medir
+    capacidad = tamano + max_overflow if max_overflow >= 0 else None
+
+    estadisticas.update({
+        'tamano': tamano,
+        'max_overflow': max_overflow,
+        'en_uso': en_uso,
+        'libres': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+        'saturacion': round(en_uso / capacidad, 3) if capacidad else None
+    })
+    return estadisticas
@@ -0,0 +1,161 @@
+"""
+Servicio de Códigos QR de Verificación
+- Render bajo demanda en SVG o PNG (ya no se guarda la imagen en la factura)
+- Caché LRU acotada en memoria por proceso
+- ETag fuerte derivado del contenido del QR y de los parámetros de render
+- Token firmado opcional en la URL (ver token_verificacion) para verificar sin BD
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+
+from services.metrics import QR_CACHE, QR_RENDER
+
+
+# Formatos soportados y su tipo MIME
+FORMATOS_QR = {
+    'svg': 'image/svg+xml',
+    'png': 'image/png'
+}
+
+
+class CacheLRU:
+    """Diccionario acotado: al superar la capacidad descarta lo menos usado"""
+
+    def __init__(self, capacidad=512):
+        self.capacidad = capacidad
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            valor = self._datos.get(clave)
+            if valor is not None:
+                self._datos.move_to_end(clave)
+            return valor
+
+    def guardar(self, clave, valor):
+        if self.capacidad <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class QrService:
+    """
+    QR de verificación de facturas
+
+    Args:
+        url_base: URL del frontend de verificación (el QR apunta a url_base/verificar/<hash>)
+        capacidad_cache: Imágenes en caché por proceso (0 = sin caché)
+        box_size: Píxeles por módulo en PNG
+        border: Módulos de margen
+    """
+
+    VERSION_RENDER = 1  # Cambiar si cambia la forma de dibujar (invalida ETags)
+
+    def __init__(self, url_base='http://localhost:5173', capacidad_cache=512,
+                 box_size=10, border=4):
+        self.url_base = url_base.rstrip('/')
+        self.box_size = box_size
+        self.border = border
+        self.cache = CacheLRU(capacidad_cache)
+
+    def url_verificacion(self, hash_sha256, token=None):
+        """Contenido del QR: URL pública de verificación (con ?t=<token> si hay token)"""
+        url = f"{self.url_base}/verificar/{hash_sha256}"
+        return f"{url}?t={token}" if token else url
+
+    def texto_qr(self, factura):
+        """Resumen legible de la factura con la URL de verificación (campo qr_data)"""
+        return (
+            f"Factura: {factura.numero_factura}\n"
+            f"Fecha: {factura.fecha_emision.strftime('%d/%m/%Y')}\n"
+            f"Total: ${factura.total:.2f}\n"
+            f"Verificar: {self.url_verificacion(factura.hash_sha256)}"
+        )
+
+    def etag(self, hash_sha256, formato, token=None):
+        """
+        ETag fuerte: la imagen es función determinista de estos valores,
+        así que se calcula sin renderizar
+        """
+        huella = (f"{self.VERSION_RENDER}|{formato}|{self.box_size}|{self.border}|"
+                  f"{self.url_verificacion(hash_sha256, token)}")
+        return hashlib.sha256(huella.encode('utf-8')).hexdigest()[:32]
+
+    def renderizar(self, datos, formato):
+        """
+        Dibujar el QR
+
+        Returns:
+            bytes: Imagen en el formato pedido
+        """
+        if formato not in FORMATOS_QR:
+            raise ValueError(f"Formato de QR no soportado: {formato}")
+
+        qr = qrcode.QRCode(
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=self.box_size,
+            border=self.border,
+            image_factory=qrcode.image.svg.SvgPathImage if formato == 'svg' else None
+        )
+        qr.add_data(datos)
+        qr.make(fit=True)
+
+        buffer = BytesIO()
+        if formato == 'svg':
+            qr.make_image().save(buffer)
+        else:
+            qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    def obtener(self, hash_sha256, formato, token=None):
+        """
+        Imagen del QR de una factura (desde la caché si está)
+
+        Returns:
+            tuple (bytes, etag)
+        """
+        etag = self.etag(hash_sha256, formato, token)
+        imagen = self.cache.obtener(etag)
+        if imagen is not None:
+            QR_CACHE.inc(resultado='hit')
+            return imagen, etag
+
+        QR_CACHE.inc(resultado='miss')
+        with QR_RENDER.medir(formato=formato):
+            imagen = self.renderizar(self.url_verificacion(hash_sha256, token), formato)
+        self.cache.guardar(etag, imagen)
+        return imagen, etag
+
+
+# Instancia global
+_qr_service = None
+
+
+def init_qr_service(app):
+    """Inicializar servicio de QR desde la configuración"""
+    global _qr_service
+    _qr_service = QrService(
+        url_base=app.config.get('QR_URL_BASE', 'http://localhost:5173'),
+        capacidad_cache=app.config.get('QR_CACHE_TAMANO', 512)
+    )
+    return _qr_service
+
+
+def get_qr_service():
+    """Obtener servicio de QR"""
+    if _qr_service is None:
+        raise RuntimeError("QrService no inicializado. Llamar init_qr_service() primero.")
+    return _qr_service
@@ -0,0 +1,157 @@
+"""
+Servicio de Numeración de Facturas
+Asigna secuenciales únicos por establecimiento y punto de emisión
+"""
+import threading
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from models.base import db
+from models.factura import Factura
+from models.secuencial import SecuencialFactura
+
+
+class AsignadorSecuencial:
+    """
+    Asignador de números de factura respaldado por la fila secuencial_factura
+
+    Con tamano_bloque=1 el incremento se hace dentro de la transacción de la
+    factura: la fila queda bloqueada hasta el commit y no quedan huecos.
+    Con tamano_bloque>1 cada proceso reserva un bloque de números en una
+    transacción propia y los entrega desde memoria; es más rápido bajo carga,
+    pero los números no usados de un bloque se pierden si el proceso termina.
+    """
+
+    def __init__(self, tamano_bloque=1):
+        self.tamano_bloque = max(1, int(tamano_bloque))
+        self._bloques = {}  # (establecimiento, punto_emision) -> [siguiente, ultimo]
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def formatear(establecimiento, punto_emision, secuencial):
+        """Formato SRI: 001-001-000000001"""
+        return f"{establecimiento}-{punto_emision}-{secuencial:09d}"
+
+    def siguiente(self, establecimiento='001', punto_emision='001'):
+        """
+        Obtener el siguiente número de factura
+
+        Returns:
+            str: Número de factura formateado
+        """
+        return self.reservar(1, establecimiento, punto_emision)[0]
+
+    def reservar(self, cantidad, establecimiento='001', punto_emision='001'):
+        """
+        Obtener varios números de factura de una vez
+
+        Args:
+            cantidad: Números a obtener
+            establecimiento: Código de establecimiento (3 dígitos)
+            punto_emision: Código de punto de emisión (3 dígitos)
+
+        Returns:
+            list: Números de factura formateados
+        """
+        if self.tamano_bloque == 1:
+            # Incremento en la transacción de la factura (sin huecos)
+            primero, ultimo = self.reservar_rango(cantidad, establecimiento, punto_emision)
+            secuenciales = range(primero, ultimo + 1)
+        else:
+            secuenciales = self._tomar_de_bloques(establecimiento, punto_emision, cantidad)
+
+        return [self.formatear(establecimiento, punto_emision, s) for s in secuenciales]
+
+    def reservar_rango(self, cantidad, establecimiento='001', punto_emision='001'):
+        """
+        Reservar secuenciales consecutivos en la transacción actual (sin
+        formatear, para cargas masivas)
+
+        Returns:
+            tuple: (primer secuencial, último secuencial)
+        """
+        ultimo = self._incrementar(db.session, establecimiento, punto_emision, cantidad)
+        return ultimo - cantidad + 1, ultimo
+
+    def devolver(self, cantidad, establecimiento='001', punto_emision='001'):
+        """
+        Devolver los últimos números reservados en la transacción actual
+
+        Solo con tamano_bloque=1: la fila del contador sigue bloqueada por
+        esta transacción, así que nadie tomó números después. Con bloques
+        los números no usados se pierden (igual que al terminar el proceso).
+
+        Returns:
+            bool: True si los números se devolvieron al contador
+        """
+        if self.tamano_bloque != 1:
+            return False
+        self._incrementar(db.session, establecimiento, punto_emision, -cantidad)
+        return True
+
+    def _tomar_de_bloques(self, establecimiento, punto_emision, cantidad):
+        """Entregar números desde el bloque en memoria, reservando más si hace falta"""
+        clave = (establecimiento, punto_emision)
+        secuenciales = []
+
+        with self._lock:
+            while len(secuenciales) < cantidad:
+                bloque = self._bloques.get(clave)
+                if not bloque or bloque[0] > bloque[1]:
+                    # Reservar un bloque nuevo en una transacción independiente
+                    faltan = cantidad - len(secuenciales)
+                    tamano = max(self.tamano_bloque, faltan)
+                    with db.engine.begin() as conexion:
+                        ultimo = self._incrementar(conexion, establecimiento, punto_emision, tamano)
+                    bloque = [ultimo - tamano + 1, ultimo]
+                    self._bloques[clave] = bloque
+
+                hasta = min(bloque[1], bloque[0] + cantidad - len(secuenciales) - 1)
+                secuenciales.extend(range(bloque[0], hasta + 1))
+                bloque[0] = hasta + 1
+
+        return secuenciales
+
+    def _incrementar(self, conexion, establecimiento, punto_emision, cantidad):
+        """
+        Sumar cantidad al contador de forma atómica (UPDATE ... RETURNING)
+
+        Args:
+            conexion: Session o Connection sobre la que ejecutar
+
+        Returns:
+            int: Último secuencial asignado tras el incremento
+        """
+        tabla = SecuencialFactura.__table__
+        stmt = (
+            tabla.update()
+            .where(tabla.c.establecimiento == establecimiento,
+                   tabla.c.punto_emision == punto_emision)
+            .values(ultimo=tabla.c.ultimo + cantidad)
+            .returning(tabla.c.ultimo)
+        )
+
+        ultimo = conexion.execute(stmt).scalar()
+        if ultimo is None:
+            self._crear_contador(conexion, establecimiento, punto_emision)
+            ultimo = conexion.execute(stmt).scalar()
+        return ultimo
+
+    def _crear_contador(self, conexion, establecimiento, punto_emision):
+        """Crear la fila del contador partiendo del mayor número ya emitido"""
+        prefijo = f"{establecimiento}-{punto_emision}-"
+        try:
+            # SAVEPOINT: si otro proceso crea la fila a la vez solo se descarta este INSERT
+            with conexion.begin_nested():
+                mayor = conexion.execute(
+                    db.select(func.max(Factura.numero_factura))
+                    .where(Factura.numero_factura.like(f"{prefijo}%"))
+                ).scalar()
+                conexion.execute(SecuencialFactura.__table__.insert().values(
+                    establecimiento=establecimiento,
+                    punto_emision=punto_emision,
+                    ultimo=int(mayor.split('-')[2]) if mayor else 0
+                ))
+        except IntegrityError:
+            # Otro proceso creó el contador al mismo tiempo
+            pass
@@ -0,0 +1,732 @@
+"""
+Servicio de Autorización SRI
+- Clientes intercambiables: simulado (sin red) o SOAP (web services offline del SRI)
+- Cola durable en BD (tabla cola_sri) procesada por un hilo en segundo plano
+- Reintentos con backoff exponencial y actualización de estado_sri
+- Lotes masivos (varios comprobantes por envío) al ponerse al día tras una caída
+"""
+import os
+import re
+import base64
+import random
+import threading
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+from lxml import etree
+from sqlalchemy import and_, or_
+
+from models.base import db
+from models.factura import Factura
+from models.cola_sri import ColaSri
+from models.factura_resumen import FacturaResumenDiario
+from services.metrics import medir_etapa
+from services.almacen_xml import leer_xml_facturas
+from services.verificacion_publica import invalidar_verificacion
+
+
+# Estados de factura frente al SRI
+ESTADO_PENDIENTE = 'PENDIENTE'
+ESTADO_AUTORIZADO = 'AUTORIZADO'
+ESTADO_RECHAZADO = 'RECHAZADO'
+ESTADO_EN_PROCESO = 'EN_PROCESO'  # Respuesta del SRI: aún no decide (se reintenta)
+
+NS_RECEPCION = 'http://ec.gob.sri.ws.recepcion'
+NS_AUTORIZACION = 'http://ec.gob.sri.ws.autorizacion'
+NS_SOAP = 'http://schemas.xmlsoap.org/soap/envelope/'
+
+# Error 43 del SRI: la clave de acceso ya fue recibida (reenvío tras un reintento)
+ERROR_CLAVE_REGISTRADA = '43'
+
+_PATRON_CLAVE_ACCESO = re.compile(r'<claveAcceso>(\d+)</claveAcceso>')
+
+
+class ErrorSriTransitorio(Exception):
+    """Fallo de red, timeout o error 5xx: el envío se reintenta"""
+
+
+def extraer_clave_acceso(xml_firmado):
+    """
+    Obtener la clave de acceso del XML firmado
+
+    Returns:
+        str o None si el XML no la contiene
+    """
+    coincidencia = _PATRON_CLAVE_ACCESO.search(xml_firmado or '')
+    return coincidencia.group(1) if coincidencia else None
+
+
+def _texto_hijo(elemento, nombre):
+    """Texto del primer descendiente con ese nombre local (sin importar namespace)"""
+    encontrados = elemento.xpath(f".//*[local-name()='{nombre}']")
+    return encontrados[0].text if encontrados and encontrados[0].text else None
+
+
+def _mensajes(elemento):
+    """Mensajes del SRI como 'identificador: mensaje (informacionAdicional)'"""
+    mensajes = []
+    for mensaje in elemento.xpath(".//*[local-name()='mensajes']/*[local-name()='mensaje']"):
+        identificador = _texto_hijo(mensaje, 'identificador') or ''
+        texto = _texto_hijo(mensaje, 'mensaje') or ''
+        adicional = _texto_hijo(mensaje, 'informacionAdicional')
+        mensajes.append({
+            'identificador': identificador,
+            'texto': f"{identificador}: {texto}" + (f" ({adicional})" if adicional else '')
+        })
+    return mensajes
+
+
+def _parsear_fecha(texto):
+    """Fecha de autorización del SRI (ISO 8601, con o sin zona horaria)"""
+    if not texto:
+        return datetime.now()
+    try:
+        fecha = datetime.fromisoformat(texto.strip())
+        return fecha.replace(tzinfo=None)
+    except ValueError:
+        return datetime.now()
+
+
+# ============================================================================
+# LOTE MASIVO
+# ============================================================================
+
+_CABECERA_LOTE = ('<?xml version="1.0" encoding="UTF-8"?>'
+                  '<lote version="1.0.0"><claveAcceso>{clave}</claveAcceso>'
+                  '<ruc>{ruc}</ruc><comprobantes>')
+_PIE_LOTE = '</comprobantes></lote>'
+_BYTES_CABECERA_LOTE = len(_CABECERA_LOTE.format(clave='0' * 49, ruc='0' * 13)) + len(_PIE_LOTE)
+_BYTES_COMPROBANTE_LOTE = len('<comprobante><![CDATA[]]></comprobante>')
+
+
+def digito_modulo11(numero):
+    """
+    Dígito verificador módulo 11 de una clave de acceso (comprobante o lote)
+
+    Args:
+        numero: Los 48 primeros dígitos de la clave
+
+    Returns:
+        int: Dígito verificador (0-9)
+    """
+    factor, suma = 2, 0
+    for digito in reversed(numero):
+        suma += int(digito) * factor
+        factor = factor + 1 if factor < 7 else 2
+    digito = 11 - suma % 11
+    return 0 if digito == 11 else 1 if digito == 10 else digito
+
+
+def generar_clave_lote(ruc, ambiente='1', serie='001001', fecha=None):
+    """
+    Clave de acceso (49 dígitos) de un lote masivo
+
+    Misma estructura que la de un comprobante, con tipo de comprobante 00
+    y un secuencial aleatorio.
+
+    Args:
+        serie: Establecimiento y punto de emisión (6 dígitos) de los comprobantes
+    """
+    fecha = (fecha or datetime.now()).strftime('%d%m%Y')
+    secuencial = f"{random.randrange(10 ** 9):09d}"
+    codigo_numerico = f"{random.randrange(10 ** 8):08d}"
+    clave = f"{fecha}00{ruc}{ambiente}{serie}{secuencial}{codigo_numerico}1"
+    return clave + str(digito_modulo11(clave))
+
+
+def empaquetar_lotes(comprobantes, max_comprobantes=50, max_bytes=500_000):
+    """
+    Agrupar comprobantes en lotes masivos
+
+    Cada lote tiene un solo RUC emisor (dígitos 11 a 23 de la clave de
+    acceso) y respeta ambos límites; un comprobante que por sí solo supera
+    max_bytes va en un lote propio.
+
+    Args:
+        comprobantes: [(clave_acceso, xml_firmado)]
+
+    Returns:
+        list: Lotes, cada uno una lista [(clave_acceso, xml_firmado)]
+    """
+    por_ruc = {}
+    for clave, xml in comprobantes:
+        por_ruc.setdefault(clave[10:23], []).append((clave, xml))
+
+    lotes = []
+    for grupo in por_ruc.values():
+        actual, tamano = [], _BYTES_CABECERA_LOTE
+        for clave, xml in grupo:
+            bytes_xml = len(xml.encode('utf-8')) + _BYTES_COMPROBANTE_LOTE
+            if actual and (len(actual) >= max_comprobantes or tamano + bytes_xml > max_bytes):
+                lotes.append(actual)
+                actual, tamano = [], _BYTES_CABECERA_LOTE
+            actual.append((clave, xml))
+            tamano += bytes_xml
+        if actual:
+            lotes.append(actual)
+    return lotes
+
+
+def construir_lote(clave_lote, ruc, comprobantes):
+    """XML del lote masivo: cada comprobante firmado dentro de un CDATA"""
+    partes = [_CABECERA_LOTE.format(clave=clave_lote, ruc=ruc)]
+    for _, xml in comprobantes:
+        # ']]>' no puede aparecer dentro de un CDATA: se parte en dos secciones
+        partes.append('<comprobante><![CDATA[' + xml.replace(']]>', ']]]]><![CDATA[>')
+                      + ']]></comprobante>')
+    partes.append(_PIE_LOTE)
+    return ''.join(partes)
+
+
+# ============================================================================
+# CLIENTES SRI
+# ============================================================================
+
+class ClienteSri:
+    """
+    Interfaz de envío al SRI
+
+    enviar() devuelve dict {estado, num_autorizacion, fecha_autorizacion, mensaje}
+    con estado AUTORIZADO, RECHAZADO o EN_PROCESO, y lanza ErrorSriTransitorio
+    si el envío debe reintentarse.
+    """
+
+    def enviar(self, clave_acceso, xml_firmado):
+        raise NotImplementedError
+
+    def enviar_lote(self, comprobantes):
+        """
+        Enviar varios comprobantes (por defecto uno a uno)
+
+        Args:
+            comprobantes: [(clave_acceso, xml_firmado)] de un mismo RUC
+
+        Returns:
+            dict {clave_acceso: resultado de enviar()}; los comprobantes sin
+            respuesta no aparecen y se reintentan
+        """
+        resultados = {}
+        for clave_acceso, xml_firmado in comprobantes:
+            try:
+                resultados[clave_acceso] = self.enviar(clave_acceso, xml_firmado)
+            except ErrorSriTransitorio:
+                continue
+        return resultados
+
+
+class ClienteSriSimulado(ClienteSri):
+    """Autoriza todo sin red (ambiente de desarrollo, comportamiento anterior)"""
+
+    def enviar(self, clave_acceso, xml_firmado):
+        return {
+            'estado': ESTADO_AUTORIZADO,
+            'num_autorizacion': clave_acceso,
+            'fecha_autorizacion': datetime.now(),
+            'mensaje': None
+        }
+
+
+class ClienteSriSoap(ClienteSri):
+    """
+    Web services offline del SRI: RecepcionComprobantesOffline y
+    AutorizacionComprobantesOffline (o un servidor compatible, p. ej. mock_sri.py)
+    """
+
+    def __init__(self, url_recepcion, url_autorizacion, timeout=15):
+        self.url_recepcion = url_recepcion
+        self.url_autorizacion = url_autorizacion
+        self.timeout = timeout
+
+    def _llamar(self, url, namespace, operacion, cuerpo):
+        """POST de un sobre SOAP; devuelve el elemento Body de la respuesta"""
+        sobre = (
+            f'<soapenv:Envelope xmlns:soapenv="{NS_SOAP}" xmlns:ec="{namespace}">'
+            f'<soapenv:Header/><soapenv:Body><ec:{operacion}>{cuerpo}</ec:{operacion}>'
+            f'</soapenv:Body></soapenv:Envelope>'
+        ).encode('utf-8')
+        peticion = urllib.request.Request(
+            url, data=sobre, method='POST',
+            headers={'Content-Type': 'text/xml; charset=utf-8', 'SOAPAction': ''}
+        )
+        try:
+            with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+                contenido = respuesta.read()
+        except urllib.error.HTTPError as e:
+            if e.code >= 500:
+                raise ErrorSriTransitorio(f"SRI respondió HTTP {e.code}")
+            raise
+        except (urllib.error.URLError, TimeoutError, ConnectionError, OSError) as e:
+            raise ErrorSriTransitorio(f"No se pudo contactar al SRI: {e}")
+
+        try:
+            raiz = etree.fromstring(contenido)
+        except etree.XMLSyntaxError as e:
+            raise ErrorSriTransitorio(f"Respuesta SOAP inválida: {e}")
+        return raiz
+
+    def recibir(self, xml_firmado):
+        """
+        validarComprobante: enviar el XML (en base64)
+
+        Returns:
+            tuple (estado RECIBIDA/DEVUELTA, lista de mensajes)
+        """
+        xml_b64 = base64.b64encode(xml_firmado.encode('utf-8')).decode('ascii')
+        raiz = self._llamar(self.url_recepcion, NS_RECEPCION, 'validarComprobante',
+                            f'<xml>{xml_b64}</xml>')
+        return _texto_hijo(raiz, 'estado'), _mensajes(raiz)
+
+    def consultar_autorizacion(self, clave_acceso):
+        """
+        autorizacionComprobante: consultar el resultado por clave de acceso
+
+        Returns:
+            dict con el formato de enviar()
+        """
+        raiz = self._llamar(self.url_autorizacion, NS_AUTORIZACION, 'autorizacionComprobante',
+                            f'<claveAccesoComprobante>{clave_acceso}</claveAccesoComprobante>')
+        autorizaciones = raiz.xpath(".//*[local-name()='autorizacion']")
+        if not autorizaciones:
+            # El SRI aún no registra el comprobante
+            return {'estado': ESTADO_EN_PROCESO, 'num_autorizacion': None,
+                    'fecha_autorizacion': None, 'mensaje': 'Sin autorizaciones todavía'}
+        return _resultado_autorizacion(autorizaciones[0])
+
+    def enviar(self, clave_acceso, xml_firmado):
+        estado, mensajes = self.recibir(xml_firmado)
+        if estado == 'DEVUELTA':
+            ya_recibida = any(m['identificador'] == ERROR_CLAVE_REGISTRADA for m in mensajes)
+            if not ya_recibida:
+                return {
+                    'estado': ESTADO_RECHAZADO,
+                    'num_autorizacion': None,
+                    'fecha_autorizacion': None,
+                    'mensaje': '; '.join(m['texto'] for m in mensajes) or 'Comprobante devuelto'
+                }
+        elif estado != 'RECIBIDA':
+            raise ErrorSriTransitorio(f"Estado de recepción inesperado: {estado}")
+
+        return self.consultar_autorizacion(clave_acceso)
+
+    def enviar_lote(self, comprobantes):
+        """
+        Lote masivo: un validarComprobante con todos los XML y una consulta
+        autorizacionComprobanteLote, en vez de dos llamadas por comprobante
+        """
+        primera = comprobantes[0][0]
+        ruc = primera[10:23]
+        ambiente = primera[23:24] or '1'
+        # Serie (establecimiento + punto de emisión) de los comprobantes del lote
+        serie = primera[24:30] if len(primera) == 49 else '001001'
+        clave_lote = generar_clave_lote(ruc, ambiente, serie)
+        lote = construir_lote(clave_lote, ruc, comprobantes)
+
+        raiz = self._llamar(self.url_recepcion, NS_RECEPCION, 'validarComprobante',
+                            f"<xml>{base64.b64encode(lote.encode('utf-8')).decode('ascii')}</xml>")
+        estado = _texto_hijo(raiz, 'estado')
+        if estado not in ('RECIBIDA', 'DEVUELTA'):
+            raise ErrorSriTransitorio(f"Estado de recepción inesperado: {estado}")
+
+        # Comprobantes devueltos individualmente dentro del lote
+        resultados, ya_recibidos, devueltos = {}, [], set()
+        for nodo in raiz.xpath(".//*[local-name()='comprobante']"):
+            clave = _texto_hijo(nodo, 'claveAcceso')
+            mensajes = _mensajes(nodo)
+            if not clave or not mensajes:
+                continue
+            devueltos.add(clave)
+            if any(m['identificador'] == ERROR_CLAVE_REGISTRADA for m in mensajes):
+                ya_recibidos.append(clave)
+            else:
+                resultados[clave] = {
+                    'estado': ESTADO_RECHAZADO,
+                    'num_autorizacion': None,
+                    'fecha_autorizacion': None,
+                    'mensaje': '; '.join(m['texto'] for m in mensajes)
+                }
+
+        if len(devueltos) < len(comprobantes):
+            respuesta = self._llamar(
+                self.url_autorizacion, NS_AUTORIZACION, 'autorizacionComprobanteLote',
+                f'<claveAccesoLote>{clave_lote}</claveAccesoLote>'
+            )
+            for autorizacion in respuesta.xpath(".//*[local-name()='autorizacion']"):
+                clave = extraer_clave_acceso(_texto_hijo(autorizacion, 'comprobante'))
+                if clave and clave not in resultados:
+                    resultados[clave] = _resultado_autorizacion(autorizacion)
+
+        # Recibidos en un envío anterior: se consultan por su propia clave
+        for clave in ya_recibidos:
+            try:
+                resultados[clave] = self.consultar_autorizacion(clave)
+            except ErrorSriTransitorio:
+                continue
+        return resultados
+
+
+def _resultado_autorizacion(autorizacion):
+    """Convertir un nodo <autorizacion> del SRI al formato de enviar()"""
+    estado = (_texto_hijo(autorizacion, 'estado') or '').strip().upper()
+    mensaje = '; '.join(m['texto'] for m in _mensajes(autorizacion)) or None
+
+    if estado == 'AUTORIZADO':
+        return {
+            'estado': ESTADO_AUTORIZADO,
+            'num_autorizacion': _texto_hijo(autorizacion, 'numeroAutorizacion'),
+            'fecha_autorizacion': _parsear_fecha(_texto_hijo(autorizacion, 'fechaAutorizacion')),
+            'mensaje': mensaje
+        }
+    if estado in ('NO AUTORIZADO', 'RECHAZADO'):
+        return {'estado': ESTADO_RECHAZADO, 'num_autorizacion': None,
+                'fecha_autorizacion': None, 'mensaje': mensaje}
+    # EN PROCESO u otro estado intermedio
+    return {'estado': ESTADO_EN_PROCESO, 'num_autorizacion': None,
+            'fecha_autorizacion': None, 'mensaje': mensaje or estado}
+
+
+def crear_cliente_sri(config):
+    """
+    Crear el cliente SRI configurado
+
+    Args:
+        config: Configuración de la app (SRI_CLIENTE: 'simulado' o 'soap')
+    """
+    tipo = (config.get('SRI_CLIENTE') or 'simulado').lower()
+    if tipo == 'simulado':
+        return ClienteSriSimulado()
+    if tipo == 'soap':
+        return ClienteSriSoap(
+            config['SRI_URL_RECEPCION'],
+            config['SRI_URL_AUTORIZACION'],
+            timeout=config.get('SRI_TIMEOUT', 15)
+        )
+    raise ValueError(f"SRI_CLIENTE no válido: {tipo}")
+
+
+# ============================================================================
+# COLA DE AUTORIZACIÓN
+# ============================================================================
+
+def marcar_pendiente(factura):
+    """
+    Dejar la factura en PENDIENTE y encolarla (dentro de la transacción actual)
+
+    La fila de cola se inserta en el mismo commit que la factura: si la
+    factura existe, su envío al SRI también está registrado.
+    """
+    factura.estado_sri = ESTADO_PENDIENTE
+    factura.num_autorizacion = None
+    factura.fecha_autorizacion = None
+    db.session.add(ColaSri(factura=factura, estado=ColaSri.PENDIENTE,
+                           proximo_intento=datetime.utcnow()))
+
+
+def aplicar_resultado(factura_id, resultado):
+    """
+    Guardar en la factura la respuesta final del SRI (transacción actual)
+
+    Solo actualiza si la factura sigue PENDIENTE, así un resultado repetido
+    (p. ej. dos workers tras expirar un bloqueo) no se cuenta dos veces.
+
+    Returns:
+        bool: True si la factura se actualizó
+    """
+    tabla = Factura.__table__
+    fila = db.session.execute(
+        db.select(tabla.c.fecha_emision, tabla.c.usuario_id, tabla.c.cliente_id, tabla.c.total,
+                  tabla.c.hash_sha256)
+        .where(tabla.c.id == factura_id)
+    ).first()
+    if fila is None:
+        return False
+
+    actualizadas = db.session.execute(
+        tabla.update()
+        .where(tabla.c.id == factura_id, tabla.c.estado_sri == ESTADO_PENDIENTE)
+        .values(
+            estado_sri=resultado['estado'],
+            num_autorizacion=resultado['num_autorizacion'],
+            fecha_autorizacion=resultado['fecha_autorizacion']
+        )
+    ).rowcount
+    if not actualizadas:
+        return False
+
+    # La verificación pública en caché mostraba el estado anterior
+    invalidar_verificacion(fila.hash_sha256)
+
+    FacturaResumenDiario.mover(
+        fecha=fila.fecha_emision.date(),
+        estado_anterior=ESTADO_PENDIENTE,
+        estado_nuevo=resultado['estado'],
+        usuario_id=fila.usuario_id,
+        cliente_id=fila.cliente_id,
+        total=fila.total
+    )
+    return True
+
+
+class ProcesadorColaSri:
+    """
+    Worker de la cola cola_sri
+
+    Toma trabajos vencidos (con FOR UPDATE SKIP LOCKED en PostgreSQL, así
+    varios procesos pueden trabajar a la vez), los marca EN_PROCESO durante
+    duracion_bloqueo segundos y envía cada factura con el cliente SRI.
+
+    Con al menos lote_masivo_min trabajos vencidos (p. ej. al ponerse al día
+    tras una caída del SRI) las facturas se envían en lotes masivos de hasta
+    lote_masivo_max comprobantes y lote_masivo_bytes bytes.
+    """
+
+    def __init__(self, app, cliente, tamano_lote=10, max_intentos=8,
+                 backoff_base=5.0, backoff_max=3600.0, intervalo=2.0,
+                 duracion_bloqueo=120, lote_masivo_min=0, lote_masivo_max=50,
+                 lote_masivo_bytes=500_000):
+        self.app = app
+        self.cliente = cliente
+        self.tamano_lote = tamano_lote
+        self.lote_masivo_min = lote_masivo_min  # 0 = siempre uno a uno
+        self.lote_masivo_max = lote_masivo_max
+        self.lote_masivo_bytes = lote_masivo_bytes
+        self.max_intentos = max_intentos
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.intervalo = intervalo
+        self.duracion_bloqueo = duracion_bloqueo
+
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pid = None
+
+    # ------------------------------------------------------------------
+    # Procesamiento
+    # ------------------------------------------------------------------
+
+    def calcular_backoff(self, intentos):
+        """Segundos hasta el próximo intento: exponencial con jitter, acotado"""
+        espera = min(self.backoff_max, self.backoff_base * (2 ** max(0, intentos - 1)))
+        return espera * random.uniform(0.5, 1.0)
+
+    def tomar_trabajos(self, limite=None):
+        """
+        Reservar trabajos vencidos y confirmar la reserva
+
+        Returns:
+            list: [(cola_id, factura_id, intentos)]
+        """
+        ahora = datetime.utcnow()
+        consulta = ColaSri.query.filter(or_(
+            and_(ColaSri.estado == ColaSri.PENDIENTE, ColaSri.proximo_intento <= ahora),
+            and_(ColaSri.estado == ColaSri.EN_PROCESO, ColaSri.bloqueado_hasta < ahora)
+        )).order_by(ColaSri.proximo_intento).limit(limite or self.tamano_lote)
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            consulta = consulta.with_for_update(skip_locked=True)
+
+        trabajos = consulta.all()
+        for trabajo in trabajos:
+            trabajo.estado = ColaSri.EN_PROCESO
+            trabajo.bloqueado_hasta = ahora + timedelta(seconds=self.duracion_bloqueo)
+            trabajo.intentos += 1
+        reservados = [(t.id, t.factura_id, t.intentos) for t in trabajos]
+        db.session.commit()
+        return reservados
+
+    def registrar_resultado(self, cola_id, factura_id, intentos, resultado=None, error=None,
+                            confirmar=True):
+        """
+        Guardar la respuesta del SRI o reprogramar el trabajo
+
+        Args:
+            resultado: dict de ClienteSri.enviar() (None si hubo error)
+            error: Mensaje del error transitorio
+            confirmar: Hacer commit (False para agrupar los de un lote masivo)
+        """
+        trabajo = db.session.get(ColaSri, cola_id)
+        if trabajo is None:
+            return
+
+        if resultado and resultado['estado'] in (ESTADO_AUTORIZADO, ESTADO_RECHAZADO):
+            aplicar_resultado(factura_id, resultado)
+            trabajo.estado = ColaSri.COMPLETADO
+            trabajo.bloqueado_hasta = None
+            trabajo.ultimo_error = resultado['mensaje'] if resultado['estado'] == ESTADO_RECHAZADO else None
+        else:
+            mensaje = error or (resultado or {}).get('mensaje') or 'Pendiente en el SRI'
+            trabajo.ultimo_error = mensaje
+            trabajo.bloqueado_hasta = None
+            if intentos >= self.max_intentos:
+                trabajo.estado = ColaSri.FALLIDO
+                print(f"❌ SRI: factura {factura_id} sin respuesta tras {intentos} intentos: {mensaje}")
+            else:
+                trabajo.estado = ColaSri.PENDIENTE
+                trabajo.proximo_intento = datetime.utcnow() + timedelta(
+                    seconds=self.calcular_backoff(intentos)
+                )
+        if confirmar:
+            db.session.commit()
+
+    def procesar_pendientes(self):
+        """
+        Procesar un lote de trabajos vencidos (requiere app context)
+
+        Returns:
+            int: Trabajos procesados
+        """
+        limite = max(self.tamano_lote, self.lote_masivo_max) if self.lote_masivo_min else None
+        reservados = self.tomar_trabajos(limite)
+        if not reservados:
+            return 0
+
+        xml_por_factura = leer_xml_facturas([factura_id for _, factura_id, _ in reservados])
+        # No mantener la transacción abierta durante las llamadas de red
+        db.session.commit()
+
+        if self.lote_masivo_min and len(reservados) >= self.lote_masivo_min:
+            self._procesar_en_lotes(reservados, xml_por_factura)
+            return len(reservados)
+
+        for cola_id, factura_id, intentos in reservados:
+            xml_firmado = xml_por_factura.get(factura_id)
+            clave_acceso = extraer_clave_acceso(xml_firmado)
+            try:
+                if not clave_acceso:
+                    raise ErrorSriTransitorio('El XML firmado no contiene claveAcceso')
+                with medir_etapa('autorizacion'):
+                    resultado = self.cliente.enviar(clave_acceso, xml_firmado)
+                self.registrar_resultado(cola_id, factura_id, intentos, resultado=resultado)
+            except ErrorSriTransitorio as e:
+                self.registrar_resultado(cola_id, factura_id, intentos, error=str(e))
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error procesando factura {factura_id} en cola SRI: {e}")
+                self.registrar_resultado(cola_id, factura_id, intentos, error=str(e))
+
+        return len(reservados)
+
+    def _procesar_en_lotes(self, reservados, xml_por_factura):
+        """Enviar los trabajos reservados en lotes masivos (un commit por lote)"""
+        trabajos_por_clave = {}
+        for cola_id, factura_id, intentos in reservados:
+            xml_firmado = xml_por_factura.get(factura_id)
+            clave_acceso = extraer_clave_acceso(xml_firmado)
+            if not clave_acceso:
+                self.registrar_resultado(cola_id, factura_id, intentos,
+                                         error='El XML firmado no contiene claveAcceso')
+                continue
+            trabajos_por_clave[clave_acceso] = (cola_id, factura_id, intentos, xml_firmado)
+
+        lotes = empaquetar_lotes(
+            [(clave, trabajo[3]) for clave, trabajo in trabajos_por_clave.items()],
+            max_comprobantes=self.lote_masivo_max,
+            max_bytes=self.lote_masivo_bytes
+        )
+        for lote in lotes:
+            error = None
+            try:
+                with medir_etapa('autorizacion_lote'):
+                    resultados = self.cliente.enviar_lote(lote)
+            except ErrorSriTransitorio as e:
+                resultados, error = {}, str(e)
+            except Exception as e:
+                db.session.rollback()
+                print(f"❌ Error enviando lote masivo de {len(lote)} facturas al SRI: {e}")
+                resultados, error = {}, str(e)
+
+            for clave_acceso, _ in lote:
+                cola_id, factura_id, intentos, _ = trabajos_por_clave[clave_acceso]
+                resultado = resultados.get(clave_acceso)
+                self.registrar_resultado(
+                    cola_id, factura_id, intentos, resultado=resultado,
+                    error=None if resultado else (error or 'Sin respuesta en el lote masivo'),
+                    confirmar=False
+                )
+            db.session.commit()
+            print(f"📦 Lote masivo SRI: {len(resultados)}/{len(lote)} comprobantes con respuesta")
+
+    # ------------------------------------------------------------------
+    # Hilo en segundo plano
+    # ------------------------------------------------------------------
+
+    def notificar(self):
+        """Despertar al worker (p. ej. justo después de encolar una factura)"""
+        self._despertar.set()
+
+    def asegurar_hilo(self):
+        """Arrancar el hilo del worker en este proceso (también tras un fork)"""
+        if self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._hilo is not None and self._hilo.is_alive():
+                return
+            self._detener.clear()
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._bucle, name='cola-sri', daemon=True)
+            self._hilo.start()
+
+    def detener(self, timeout=5.0):
+        """Detener el hilo del worker"""
+        self._detener.set()
+        self._despertar.set()
+        if self._hilo is not None and self._pid == os.getpid():
+            self._hilo.join(timeout)
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            procesados = 0
+            try:
+                with self.app.app_context():
+                    procesados = self.procesar_pendientes()
+            except Exception as e:
+                print(f"⚠️  Error en worker de cola SRI: {e}")
+            finally:
+                with self.app.app_context():
+                    db.session.remove()
+
+            if procesados < self.tamano_lote:
+                # Cola vacía o sin trabajos vencidos: esperar aviso o intervalo
+                self._despertar.wait(self.intervalo)
+                self._despertar.clear()
+
+
+# Instancia global
+_procesador = None
+
+
+def init_cola_sri(app):
+    """
+    Crear el procesador de la cola SRI desde la configuración
+
+    Con SRI_WORKER=True el hilo del worker se arranca en cada proceso de la
+    app (en el primer request); con False la cola la procesa worker_sri.py.
+    """
+    global _procesador
+    if _procesador is not None:
+        _procesador.detener()
+
+    _procesador = ProcesadorColaSri(
+        app,
+        crear_cliente_sri(app.config),
+        tamano_lote=app.config.get('SRI_LOTE', 10),
+        max_intentos=app.config.get('SRI_MAX_INTENTOS', 8),
+        backoff_base=app.config.get('SRI_BACKOFF_BASE', 5.0),
+        backoff_max=app.config.get('SRI_BACKOFF_MAX', 3600.0),
+        intervalo=app.config.get('SRI_INTERVALO', 2.0),
+        lote_masivo_min=app.config.get('SRI_LOTE_MASIVO_MIN', 0),
+        lote_masivo_max=app.config.get('SRI_LOTE_MASIVO_MAX', 50),
+        lote_masivo_bytes=app.config.get('SRI_LOTE_MASIVO_BYTES', 500_000)
+    )
+
+    if app.config.get('SRI_WORKER', True):
+        app.before_request(_procesador.asegurar_hilo)
+    return _procesador
+
+
+def get_cola_sri():
+    """Obtener procesador de la cola SRI"""
+    if _procesador is None:
+        raise RuntimeError("Cola SRI no inicializada. Llamar init_cola_sri() primero.")
+    return _procesador
@@ -0,0 +1,288 @@
+"""
+Tokens de Verificación Autocontenidos (QR)
+- Número de factura, total, fecha y key id del emisor firmados con Ed25519
+- Formato binario compacto en base64url (~124 caracteres) para el QR
+- Se validan solo con la clave pública: un verificador sin acceso a la BD
+  puede correr en cualquier número de nodos
+"""
+import re
+import json
+import base64
+import struct
+import threading
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+from sqlalchemy.exc import IntegrityError
+
+from models.base import db
+from services.key_registry import KeyRegistry
+from services.firmantes import get_firmante
+
+
+# Clave de configuración con el par Ed25519 de los tokens
+CLAVE_CONFIG_TOKEN = 'ed25519_qr_keys'
+
+VERSION_TOKEN = 1
+
+# versión | key id | establecimiento | punto de emisión | secuencial | fecha (epoch s) | total (centavos)
+_FORMATO = struct.Struct('>B8sHHIIQ')
+_LARGO_FIRMA = 64
+
+_PATRON_NUMERO = re.compile(r'(\d{3})-(\d{3})-(\d{9})')
+
+
+def _b64url(datos):
+    return base64.urlsafe_b64encode(datos).rstrip(b'=').decode('ascii')
+
+
+def _desde_b64url(texto):
+    return base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+
+
+def empaquetar(numero_factura, total, fecha_emision, key_id):
+    """
+    Datos del token en binario (lo que se firma)
+
+    Args:
+        numero_factura: 'EEE-PPP-SSSSSSSSS'
+        total: Decimal o float con 2 decimales
+        fecha_emision: datetime
+        key_id: Identificador de la clave (16 caracteres hex)
+    """
+    coincidencia = _PATRON_NUMERO.fullmatch(numero_factura or '')
+    if not coincidencia:
+        raise ValueError(f"Número de factura no válido para token: {numero_factura}")
+    establecimiento, punto, secuencial = (int(parte) for parte in coincidencia.groups())
+
+    if fecha_emision.tzinfo is None:
+        fecha_emision = fecha_emision.replace(tzinfo=timezone.utc)
+    centavos = int((Decimal(str(total)) * 100).quantize(Decimal('1')))
+
+    return _FORMATO.pack(VERSION_TOKEN, bytes.fromhex(key_id), establecimiento, punto,
+                         secuencial, int(fecha_emision.timestamp()), centavos)
+
+
+def desempaquetar(datos):
+    """
+    Campos de un token en binario
+
+    Returns:
+        dict con version, key_id, numero_factura, fecha_emision (datetime) y total (Decimal)
+    """
+    version, key_id, establecimiento, punto, secuencial, fecha, centavos = _FORMATO.unpack(datos)
+    return {
+        'version': version,
+        'key_id': key_id.hex(),
+        'numero_factura': f"{establecimiento:03d}-{punto:03d}-{secuencial:09d}",
+        # Naive en UTC, igual que fecha_emision en la BD
+        'fecha_emision': datetime.fromtimestamp(fecha, timezone.utc).replace(tzinfo=None),
+        'total': Decimal(centavos) / 100
+    }
+
+
+class EmisorTokens:
+    """
+    Firma de tokens con la clave privada Ed25519 del emisor
+
+    Args:
+        private_key_pem: Clave privada Ed25519 (PEM)
+        public_key_pem: Clave pública correspondiente (PEM), define el key id
+    """
+
+    def __init__(self, private_key_pem, public_key_pem):
+        self.key_id = KeyRegistry.calcular_key_id(public_key_pem)
+        self.public_key_pem = public_key_pem
+        self._clave = serialization.load_pem_private_key(
+            private_key_pem.encode('utf-8'), password=None
+        )
+
+    def emitir(self, numero_factura, total, fecha_emision):
+        """Token firmado (base64url, determinista para los mismos datos)"""
+        datos = empaquetar(numero_factura, total, fecha_emision, self.key_id)
+        return _b64url(datos + self._clave.sign(datos))
+
+    def emitir_factura(self, factura):
+        """Token de una factura (o fila con numero_factura, total y fecha_emision)"""
+        return self.emitir(factura.numero_factura, factura.total, factura.fecha_emision)
+
+
+class VerificadorTokens:
+    """
+    Validación de tokens sin base de datos
+
+    Args:
+        claves_publicas: dict {key_id: PEM de la clave pública Ed25519}
+    """
+
+    def __init__(self, claves_publicas):
+        self._claves = {}
+        for key_id, pem in claves_publicas.items():
+            clave = serialization.load_pem_public_key(pem.encode('utf-8'))
+            if not isinstance(clave, Ed25519PublicKey):
+                raise ValueError(f"La clave {key_id} no es Ed25519")
+            self._claves[key_id] = clave
+
+    @property
+    def key_ids(self):
+        return tuple(self._claves)
+
+    def verificar(self, token):
+        """
+        Validar firma y contenido del token
+
+        Returns:
+            dict con status (VALIDA, INVALIDA o CLAVE_DESCONOCIDA), valida, mensaje
+            y, si es válido, los datos firmados de la factura
+        """
+        invalido = {
+            'status': 'INVALIDA',
+            'valida': False,
+            'mensaje': 'El código de verificación no es válido o fue modificado'
+        }
+        try:
+            datos = _desde_b64url(token)
+        except (ValueError, TypeError):
+            return invalido
+        if len(datos) != _FORMATO.size + _LARGO_FIRMA:
+            return invalido
+
+        mensaje, firma = datos[:_FORMATO.size], datos[_FORMATO.size:]
+        campos = desempaquetar(mensaje)
+        if campos['version'] != VERSION_TOKEN:
+            return invalido
+
+        clave = self._claves.get(campos['key_id'])
+        if clave is None:
+            return {
+                'status': 'CLAVE_DESCONOCIDA',
+                'valida': False,
+                'mensaje': 'El código fue firmado con una clave que este verificador no conoce'
+            }
+        try:
+            clave.verify(firma, mensaje)
+        except InvalidSignature:
+            return invalido
+
+        return {
+            'status': 'VALIDA',
+            'valida': True,
+            'mensaje': 'Datos firmados por el emisor (verificación sin consulta a la base de datos)',
+            'factura': {
+                'numero_factura': campos['numero_factura'],
+                'fecha_emision': campos['fecha_emision'].strftime('%d/%m/%Y %H:%M:%S'),
+                'total': float(campos['total']),
+                'algoritmo_firma': 'Ed25519',
+                'key_id': campos['key_id']
+            }
+        }
+
+
+def generar_par_claves():
+    """Nuevo par Ed25519 en PEM (privada, pública)"""
+    return get_firmante('ed25519').generar_par_claves()
+
+
+def obtener_claves_token(crear=True):
+    """
+    Par Ed25519 de la tabla configuracion
+
+    Args:
+        crear: Generarlo y guardarlo si no existe (solo el emisor; el
+            verificador público nunca escribe en la BD)
+
+    Returns:
+        dict {'private_key': PEM, 'public_key': PEM}, o None si no existe y crear=False
+    """
+    from models.configuracion import Configuracion
+
+    config_token = Configuracion.query.filter_by(clave=CLAVE_CONFIG_TOKEN).first()
+    if config_token and config_token.valor:
+        return json.loads(config_token.valor)
+    if not crear:
+        return None
+
+    print("🔑 Generando par de claves Ed25519 para tokens de QR...")
+    private_pem, public_pem = generar_par_claves()
+    claves = {'private_key': private_pem, 'public_key': public_pem}
+    db.session.add(Configuracion(
+        clave=CLAVE_CONFIG_TOKEN,
+        valor=json.dumps(claves),
+        descripcion='Claves Ed25519 para tokens de verificación en el QR'
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Otro worker creó el par al mismo tiempo: usar el suyo
+        db.session.rollback()
+        return obtener_claves_token(crear=False)
+    return claves
+
+
+def cargar_claves_publicas(ruta):
+    """Claves públicas {key_id: PEM} desde un archivo JSON (nodos sin BD)"""
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
+
+
+# Instancias globales (las claves se leen de la BD en el primer uso)
+_habilitado = False
+_ruta_claves_publicas = None
+_emisor = None
+_verificador = None
+_lock = threading.Lock()
+
+
+def init_tokens_verificacion(app):
+    """Leer configuración de los tokens del QR"""
+    global _habilitado, _ruta_claves_publicas, _emisor, _verificador
+    _habilitado = app.config.get('QR_TOKEN', False)
+    _ruta_claves_publicas = app.config.get('QR_TOKEN_CLAVES_PUBLICAS') or None
+    _emisor = None
+    _verificador = None
+    if _ruta_claves_publicas:
+        # Verificador sin BD: las claves públicas vienen de un archivo
+        _verificador = VerificadorTokens(cargar_claves_publicas(_ruta_claves_publicas))
+        print(f"🔏 Verificador de tokens QR con {len(_verificador.key_ids)} clave(s) pública(s)")
+
+
+def get_emisor_tokens():
+    """
+    Emisor de tokens o None si QR_TOKEN está deshabilitado
+    (requiere contexto de aplicación la primera vez)
+    """
+    global _emisor
+    if not _habilitado:
+        return None
+    if _emisor is None:
+        with _lock:
+            if _emisor is None:
+                claves = obtener_claves_token()
+                _emisor = EmisorTokens(claves['private_key'], claves['public_key'])
+    return _emisor
+
+
+def get_verificador_tokens():
+    """
+    Verificador de tokens (del archivo QR_TOKEN_CLAVES_PUBLICAS o de la BD una sola vez)
+
+    Solo lee las claves: None si QR_TOKEN está deshabilitado y no hay archivo;
+    sin par guardado todavía no hay tokens emitidos y se usa un verificador
+    vacío (sin guardarlo, para leer el par cuando el emisor lo cree).
+    """
+    global _verificador
+    if _verificador is None:
+        if not _habilitado:
+            return None
+        with _lock:
+            if _verificador is None:
+                claves = obtener_claves_token(crear=False)
+                if claves is None:
+                    return VerificadorTokens({})
+                _verificador = VerificadorTokens({
+                    KeyRegistry.calcular_key_id(claves['public_key']): claves['public_key']
+                })
+    return _verificador
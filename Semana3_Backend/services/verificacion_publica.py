@@ -0,0 +1,198 @@
+"""
+Verificación Pública de Facturas (escaneo del QR)
+- Caché TTL por hash del resultado de verificar_integridad
+- Invalidación al cambiar estado_sri (ver aplicar_resultado en sri_service)
+- Limitador token bucket por IP para que una ráfaga no agote la CPU
+"""
+import re
+import time
+import threading
+from collections import OrderedDict
+
+from services.metrics import VERIFICACION_CACHE, VERIFICACION_LIMITADAS
+
+
+# Estados que ya no cambian: su verificación se puede guardar más tiempo
+ESTADOS_FINALES = ('AUTORIZADO', 'RECHAZADO')
+
+_PATRON_HASH = re.compile(r'[0-9a-f]{64}')
+
+
+class CacheTTL:
+    """Diccionario acotado con expiración por entrada (descarta lo menos usado)"""
+
+    def __init__(self, capacidad=10000, reloj=time.monotonic):
+        self.capacidad = capacidad
+        self._reloj = reloj
+        self._datos = OrderedDict()  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            if entrada[0] <= self._reloj():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return entrada[1]
+
+    def guardar(self, clave, valor, ttl):
+        if self.capacidad <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            self._datos[clave] = (self._reloj() + ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def __len__(self):
+        return len(self._datos)
+
+
+class LimitadorTokenBucket:
+    """
+    Token bucket por clave (IP del cliente)
+
+    Args:
+        tasa: Tokens que se recuperan por segundo
+        rafaga: Capacidad del balde (peticiones seguidas permitidas)
+        max_clientes: Baldes en memoria (se descartan los menos recientes)
+    """
+
+    def __init__(self, tasa=2.0, rafaga=20, max_clientes=10000, reloj=time.monotonic):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        self.max_clientes = max_clientes
+        self._reloj = reloj
+        self._baldes = OrderedDict()  # clave -> [tokens, ultima_recarga]
+        self._lock = threading.Lock()
+
+    def permitir(self, clave):
+        """
+        Consumir un token
+
+        Returns:
+            tuple (permitido, segundos hasta el próximo token)
+        """
+        ahora = self._reloj()
+        with self._lock:
+            balde = self._baldes.get(clave)
+            if balde is None:
+                balde = [float(self.rafaga), ahora]
+                self._baldes[clave] = balde
+                while len(self._baldes) > self.max_clientes:
+                    self._baldes.popitem(last=False)
+            else:
+                balde[0] = min(self.rafaga, balde[0] + (ahora - balde[1]) * self.tasa)
+                balde[1] = ahora
+                self._baldes.move_to_end(clave)
+
+            if balde[0] >= 1:
+                balde[0] -= 1
+                return True, 0.0
+            return False, (1 - balde[0]) / self.tasa if self.tasa > 0 else float('inf')
+
+
+class VerificacionPublica:
+    """
+    Caché y limitador del endpoint público /facturas/verificar/<hash>
+
+    Args:
+        ttl_final: Segundos en caché de facturas AUTORIZADO/RECHAZADO
+        ttl_pendiente: Segundos en caché de facturas PENDIENTE y hashes inexistentes
+            (acota lo desactualizado si el estado cambia en otro proceso)
+        capacidad: Resultados en caché por proceso
+        tasa, rafaga: Parámetros del token bucket por IP
+    """
+
+    def __init__(self, ttl_final=3600, ttl_pendiente=10, capacidad=10000, tasa=2.0, rafaga=20):
+        self.ttl_final = ttl_final
+        self.ttl_pendiente = ttl_pendiente
+        self.cache = CacheTTL(capacidad)
+        self.limitador = LimitadorTokenBucket(tasa, rafaga)
+        # Un cálculo a la vez por hash (evita N verificaciones RSA de la misma factura)
+        self._locks = [threading.Lock() for _ in range(64)]
+
+    def permitir(self, ip):
+        permitido, espera = self.limitador.permitir(ip)
+        if not permitido:
+            VERIFICACION_LIMITADAS.inc()
+        return permitido, espera
+
+    def ttl(self, resultado):
+        """TTL según el estado de la factura verificada"""
+        if resultado.get('status') == 'VALIDA' and resultado['factura']['estado_sri'] in ESTADOS_FINALES:
+            return self.ttl_final
+        if resultado.get('status') == 'ERROR':
+            return 0
+        return self.ttl_pendiente
+
+    def verificar(self, hash_sha256, calcular):
+        """
+        Resultado de la verificación (desde la caché si está)
+
+        Args:
+            calcular: Función hash -> resultado (FacturaService.verificar_integridad)
+        """
+        if not _PATRON_HASH.fullmatch(hash_sha256):
+            # Ni siquiera es un SHA-256: no consulta BD ni ocupa caché
+            return {
+                'status': 'NO_ENCONTRADA',
+                'valida': False,
+                'mensaje': 'Factura no encontrada en el sistema'
+            }
+
+        resultado = self.cache.obtener(hash_sha256)
+        if resultado is not None:
+            VERIFICACION_CACHE.inc(resultado='hit')
+            return resultado
+
+        with self._locks[hash(hash_sha256) % len(self._locks)]:
+            resultado = self.cache.obtener(hash_sha256)
+            if resultado is not None:
+                VERIFICACION_CACHE.inc(resultado='hit')
+                return resultado
+
+            VERIFICACION_CACHE.inc(resultado='miss')
+            resultado = calcular(hash_sha256)
+            self.cache.guardar(hash_sha256, resultado, self.ttl(resultado))
+            return resultado
+
+    def invalidar(self, hash_sha256):
+        self.cache.invalidar(hash_sha256)
+
+
+# Instancia global
+_verificacion = None
+
+
+def init_verificacion_publica(app):
+    """Inicializar caché y limitador desde la configuración"""
+    global _verificacion
+    _verificacion = VerificacionPublica(
+        ttl_final=app.config.get('VERIFICACION_CACHE_TTL', 3600),
+        ttl_pendiente=app.config.get('VERIFICACION_CACHE_TTL_PENDIENTE', 10),
+        capacidad=app.config.get('VERIFICACION_CACHE_TAMANO', 10000),
+        tasa=app.config.get('VERIFICACION_TASA', 2.0),
+        rafaga=app.config.get('VERIFICACION_RAFAGA', 20)
+    )
+    return _verificacion
+
+
+def get_verificacion_publica():
+    """Obtener caché de verificación pública"""
+    if _verificacion is None:
+        raise RuntimeError("VerificacionPublica no inicializada. Llamar init_verificacion_publica() primero.")
+    return _verificacion
+
+
+def invalidar_verificacion(hash_sha256):
+    """Descartar la verificación en caché de una factura (si hay caché en este proceso)"""
+    if _verificacion is not None:
+        _verificacion.invalidar(hash_sha256)
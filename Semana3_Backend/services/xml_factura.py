@@ -0,0 +1,264 @@
+"""
+Plantilla XML de Factura (esquema SRI simplificado)
+Esqueleto precompilado con los nodos constantes; por factura solo se
+rellenan los campos variables. Las facturas con muchos detalles se
+escriben en streaming con etree.xmlfile sin construir el árbol completo.
+"""
+import copy
+import hashlib
+from decimal import Decimal
+from lxml import etree
+
+
+# Namespace de la firma XML
+NS_DS = 'http://www.w3.org/2000/09/xmldsig#'
+
+# Campos que cambian en cada factura (nombres de etiqueta únicos en la cabecera)
+CAMPOS_CABECERA = (
+    'razonSocial', 'ruc', 'claveAcceso', 'estab', 'ptoEmi', 'secuencial',
+    'fechaEmision', 'tipoIdentificacionComprador', 'razonSocialComprador',
+    'identificacionComprador', 'direccionComprador', 'totalSinImpuestos',
+    'baseImponible', 'valor', 'importeTotal'
+)
+
+# Hijos de <detalle> que cambian, en orden (descuento es constante)
+CAMPOS_DETALLE = ('codigoPrincipal', 'descripcion', 'cantidad', 'precioUnitario',
+                  'precioTotalSinImpuesto')
+
+
+def elemento_firma(hash_sha256, firma, key_id=None):
+    """
+    Elemento ds:Signature de la factura
+
+    Args:
+        firma: Firma en base64, o FirmaMerkle (firma de la raíz y prueba de
+            inclusión, que va en ds:Object)
+        key_id: Clave que firmó (ds:KeyInfo/ds:KeyName)
+
+    Returns:
+        tuple (elemento, firma_base64, prueba o None)
+    """
+    firma_base64, prueba = (firma, None) if isinstance(firma, str) else firma
+    signature = etree.Element(f"{{{NS_DS}}}Signature", nsmap={'ds': NS_DS})
+    etree.SubElement(signature, f"{{{NS_DS}}}SignatureValue").text = firma_base64
+    etree.SubElement(signature, f"{{{NS_DS}}}DigestValue").text = hash_sha256
+    if key_id is not None:
+        key_info = etree.SubElement(signature, f"{{{NS_DS}}}KeyInfo")
+        etree.SubElement(key_info, f"{{{NS_DS}}}KeyName").text = key_id
+    if prueba is not None:
+        etree.SubElement(signature, f"{{{NS_DS}}}Object", Id='merkle').text = prueba
+    return signature, firma_base64, prueba
+
+
+def _texto(valor):
+    """
+    Texto de nodo: nunca None (así <a></a> coincide con la forma canónica)
+
+    Los retornos de carro se normalizan a salto de línea: un parser XML los
+    normaliza igual, así el hash del streaming coincide con la forma canónica
+    en la cabecera y en los detalles.
+    """
+    if valor is None:
+        return ''
+    return str(valor).replace('\r\n', '\n').replace('\r', '\n')
+
+
+class PlantillaFactura:
+    """Esqueleto de factura construido una sola vez por proceso"""
+
+    def __init__(self):
+        self._raiz = self._construir_esqueleto()
+        nodos = list(self._raiz.iter())
+        self._indices = [
+            (campo, next(i for i, nodo in enumerate(nodos) if nodo.tag == campo))
+            for campo in CAMPOS_CABECERA
+        ]
+
+        self._detalle = etree.Element('detalle')
+        for campo in ('codigoPrincipal', 'descripcion', 'cantidad', 'precioUnitario',
+                      'descuento', 'precioTotalSinImpuesto'):
+            etree.SubElement(self._detalle, campo).text = '0.00' if campo == 'descuento' else ''
+        hijos = [hijo.tag for hijo in self._detalle]
+        self._indices_detalle = [hijos.index(campo) for campo in CAMPOS_DETALLE]
+
+    @staticmethod
+    def _construir_esqueleto():
+        """Árbol con los nodos constantes ya rellenos y los variables vacíos"""
+        root = etree.Element("factura", version="1.0.0")
+
+        # InfoTributaria
+        info_tributaria = etree.SubElement(root, "infoTributaria")
+        etree.SubElement(info_tributaria, "ambiente").text = "1"  # 1=Pruebas, 2=Producción
+        etree.SubElement(info_tributaria, "tipoEmision").text = "1"  # Normal
+        etree.SubElement(info_tributaria, "razonSocial")
+        etree.SubElement(info_tributaria, "nombreComercial").text = "Mi Empresa"
+        etree.SubElement(info_tributaria, "ruc")
+        etree.SubElement(info_tributaria, "claveAcceso")
+        etree.SubElement(info_tributaria, "codDoc").text = "01"  # 01=Factura
+        etree.SubElement(info_tributaria, "estab")
+        etree.SubElement(info_tributaria, "ptoEmi")
+        etree.SubElement(info_tributaria, "secuencial")
+        etree.SubElement(info_tributaria, "dirMatriz").text = "Av. Principal 123, Quito"
+
+        # InfoFactura
+        info_factura = etree.SubElement(root, "infoFactura")
+        etree.SubElement(info_factura, "fechaEmision")
+        etree.SubElement(info_factura, "dirEstablecimiento").text = "Av. Principal 123"
+        etree.SubElement(info_factura, "obligadoContabilidad").text = "SI"
+        etree.SubElement(info_factura, "tipoIdentificacionComprador")
+        etree.SubElement(info_factura, "razonSocialComprador")
+        etree.SubElement(info_factura, "identificacionComprador")
+        etree.SubElement(info_factura, "direccionComprador")
+        etree.SubElement(info_factura, "totalSinImpuestos")
+        etree.SubElement(info_factura, "totalDescuento").text = "0.00"
+
+        # Total con impuestos
+        totales_impuestos = etree.SubElement(info_factura, "totalConImpuestos")
+        total_impuesto = etree.SubElement(totales_impuestos, "totalImpuesto")
+        etree.SubElement(total_impuesto, "codigo").text = "2"  # IVA
+        etree.SubElement(total_impuesto, "codigoPorcentaje").text = "2"  # 15%
+        etree.SubElement(total_impuesto, "baseImponible")
+        etree.SubElement(total_impuesto, "valor")
+
+        etree.SubElement(info_factura, "propina").text = "0.00"
+        etree.SubElement(info_factura, "importeTotal")
+        etree.SubElement(info_factura, "moneda").text = "DOLAR"
+
+        etree.SubElement(root, "detalles")
+        return root
+
+    def cabecera(self, valores):
+        """
+        Copia del esqueleto con los campos variables rellenos
+
+        Args:
+            valores: dict {campo: texto} con todos los CAMPOS_CABECERA
+
+        Returns:
+            Elemento raíz con <detalles> vacío
+        """
+        raiz = copy.deepcopy(self._raiz)
+        nodos = list(raiz.iter())
+        for campo, indice in self._indices:
+            nodos[indice].text = _texto(valores[campo])
+        return raiz
+
+    def rellenar_detalle(self, detalle, fila):
+        """Escribir una fila (CAMPOS_DETALLE en orden) en un elemento <detalle>"""
+        for indice, valor in zip(self._indices_detalle, fila):
+            detalle[indice].text = valor
+        return detalle
+
+    def nuevo_detalle(self, fila=None):
+        """Elemento <detalle> nuevo (relleno con la fila si se indica)"""
+        detalle = copy.deepcopy(self._detalle)
+        return self.rellenar_detalle(detalle, fila) if fila else detalle
+
+    def construir(self, valores, filas):
+        """Árbol completo de la factura (modo árbol, facturas normales)"""
+        raiz = self.cabecera(valores)
+        detalles = raiz[2]
+        for fila in filas:
+            detalles.append(self.nuevo_detalle(fila))
+        return raiz
+
+
+class FacturaStreaming:
+    """
+    Factura grande pendiente de escribir: cabecera en árbol y detalles como filas
+
+    firmar_xml la escribe con escribir_firmada() en lugar de serializar un árbol.
+    """
+
+    def __init__(self, plantilla, cabecera, filas):
+        self.plantilla = plantilla
+        self.cabecera = cabecera
+        self.filas = filas
+
+    def escribir_firmada(self, firmar, key_id=None):
+        """
+        Escribir la factura en streaming calculando el hash mientras se escribe
+
+        La salida es compacta y su cuerpo coincide con la forma canónica
+        (C14N) del documento sin ds:Signature, igual que en el modo árbol.
+
+        Args:
+            firmar: Función hash_hex -> firma_base64 o FirmaMerkle
+            key_id: Clave que firma (va en ds:KeyInfo)
+
+        Returns:
+            dict con hash_sha256, firma_digital, prueba_merkle, key_id, xml_firmado
+        """
+        salida = _SalidaConHash()
+        detalle = self.plantilla.nuevo_detalle()
+
+        with etree.xmlfile(salida, encoding='UTF-8') as xf:
+            xf.write_declaration()
+            xf.flush()
+            salida.hashear = True
+
+            with xf.element('factura', version='1.0.0'):
+                xf.write(self.cabecera[0])  # infoTributaria
+                xf.write(self.cabecera[1])  # infoFactura
+                with xf.element('detalles'):
+                    for fila in self.filas:
+                        # Un solo elemento reutilizado: se serializa y se sobrescribe
+                        xf.write(self.plantilla.rellenar_detalle(detalle, fila))
+                xf.flush()
+                salida.hashear = False
+
+                # El documento canónico sin firma termina aquí
+                salida.hash.update(b'</factura>')
+                hash_sha256 = salida.hash.hexdigest()
+                signature, firma_base64, prueba = elemento_firma(hash_sha256, firmar(hash_sha256), key_id)
+                xf.write(signature)
+
+        return {
+            'hash_sha256': hash_sha256,
+            'firma_digital': firma_base64,
+            'prueba_merkle': prueba,
+            'key_id': key_id,
+            'xml_firmado': b''.join(salida.partes).decode('utf-8')
+        }
+
+
+class _SalidaConHash:
+    """Destino de etree.xmlfile que acumula los bytes y opcionalmente los hashea"""
+
+    def __init__(self):
+        self.partes = []
+        self.hash = hashlib.sha256()
+        self.hashear = False
+
+    def write(self, datos):
+        datos = bytes(datos)
+        self.partes.append(datos)
+        if self.hashear:
+            self.hash.update(datos)
+
+
+def filas_detalle(items):
+    """Convertir items a filas de texto (CAMPOS_DETALLE en orden)"""
+    filas = []
+    for idx, item in enumerate(items, 1):
+        subtotal_item = Decimal(str(item['cantidad'])) * Decimal(str(item['precio_unitario']))
+        filas.append((
+            _texto(item.get('codigo', f"PROD{idx:03d}")),
+            _texto(item['nombre']),
+            str(item['cantidad']),
+            f"{item['precio_unitario']:.2f}",
+            f"{subtotal_item:.2f}"
+        ))
+    return filas
+
+
+# Instancia por proceso (el esqueleto no cambia)
+_plantilla = None
+
+
+def get_plantilla_factura():
+    """Obtener plantilla precompilada del proceso"""
+    global _plantilla
+    if _plantilla is None:
+        _plantilla = PlantillaFactura()
+    return _plantilla
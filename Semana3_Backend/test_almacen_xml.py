@@ -0,0 +1,48 @@
+"""
+Prueba del almacén de XML firmados: compresión, lectura por lotes y
+descarga en streaming (con respaldo para facturas con xml_firmado antiguo)
+"""
+from models import db, DocumentoXml
+from services.almacen_xml import AlmacenXml, iterar_descomprimido, leer_xml_facturas
+
+
+XML = ('<?xml version="1.0" encoding="UTF-8"?>\n<factura id="comprobante">'
+       + ''.join(f'\n  <detalle><descripcion>Ñandú {i}</descripcion><cantidad>{i}</cantidad></detalle>'
+                 for i in range(2000))
+       + '\n</factura>')
+
+
+def test_compresion_y_streaming():
+    documento = AlmacenXml('gzip').documento('f' * 64, XML)
+    assert documento.tamano == len(XML.encode('utf-8'))
+    assert len(documento.contenido) < documento.tamano / 5
+
+    bloques = list(iterar_descomprimido(documento, tamano_bloque=1024))
+    assert len(bloques) > 1
+    assert b''.join(bloques).decode('utf-8') == XML
+
+
+def test_descarga_xml_desde_almacen_y_columna_antigua(app, crear_factura, cabeceras):
+    crear_factura(hash_sha256='a' * 64)
+    crear_factura(hash_sha256='b' * 64, xml_firmado='<factura>antigua</factura>')
+    AlmacenXml('gzip').guardar('a' * 64, XML)
+    db.session.commit()
+
+    assert leer_xml_facturas([1, 2]) == {1: XML, 2: '<factura>antigua</factura>'}
+
+    cliente_http = app.test_client()
+
+    respuesta = cliente_http.get('/api/v1/facturas/1/xml', headers=cabeceras)
+    assert respuesta.status_code == 200
+    assert respuesta.is_streamed
+    assert respuesta.data.decode('utf-8') == XML
+    assert int(respuesta.headers['Content-Length']) == len(XML.encode('utf-8'))
+    assert 'factura_001_001_000000001.xml' in respuesta.headers['Content-Disposition']
+
+    no_modificado = cliente_http.get('/api/v1/facturas/1/xml',
+                                     headers={**cabeceras, 'If-None-Match': respuesta.headers['ETag']})
+    assert no_modificado.status_code == 304
+
+    antigua = cliente_http.get('/api/v1/facturas/2/xml', headers=cabeceras)
+    assert antigua.data == b'<factura>antigua</factura>'
+    assert DocumentoXml.query.count() == 1
@@ -0,0 +1,30 @@
+"""
+Prueba de la precarga antes del fork: llavero creado, claves parseadas y
+ninguna conexión abierta al terminar
+"""
+from models import db, Configuracion
+from routes.factura_routes import get_factura_service
+from services.arranque import precargar, reiniciar_tras_fork
+from services.key_registry import get_key_registry, CLAVE_CONFIG_FIRMA
+
+
+def test_precargar_deja_claves_listas_sin_conexiones(crear_app):
+    app = crear_app(en_archivo=True)
+    get_key_registry().invalidar()
+    try:
+        resultado = precargar(app)
+        with app.app_context():
+            assert db.engine.pool.checkedout() == 0
+            assert Configuracion.query.filter_by(clave=CLAVE_CONFIG_FIRMA).count() == 1
+
+        assert resultado['key_id'] == get_factura_service().key_id
+        estadisticas = get_key_registry().estadisticas()
+        assert estadisticas['claves_privadas'] == 1 and estadisticas['claves_publicas'] >= 1
+
+        # El primer request después del fork ya no parsea claves
+        reiniciar_tras_fork(app)
+        with app.app_context():
+            get_factura_service().firmar_xml('<factura/>')
+        assert get_key_registry().estadisticas()['misses'] == estadisticas['misses']
+    finally:
+        del get_factura_service._service
@@ -0,0 +1,46 @@
+"""
+Prueba del escritor de auditoría por lotes: los eventos encolados llegan a
+audit_log en INSERT agrupados y nada se pierde al detener el escritor
+"""
+from sqlalchemy import event
+
+from models import db, AuditLog
+from services.audit_sink import AuditSink, POLITICA_DESCARTAR
+
+
+def test_eventos_escritos_por_lotes_y_vaciados_al_detener(crear_app):
+    app = crear_app(en_archivo=True)
+    sink = AuditSink(app, tamano_lote=50, intervalo=0.05)
+
+    ejecuciones = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, sql, params, context, executemany:
+                     ejecuciones.append(sql) if 'INSERT INTO audit_log' in sql else None)
+
+    for i in range(230):
+        sink.registrar(usuario_id=None, accion='LOGIN', entidad='usuarios', entidad_id=i)
+    sink.detener()
+
+    with app.app_context():
+        assert AuditLog.query.count() == 230
+    assert sink.estadisticas()['escritos'] == 230
+    # Agrupados: muchas menos sentencias que eventos
+    assert len(ejecuciones) < 230 / 10
+
+
+def test_cola_llena_descarta_eventos(crear_app):
+    app = crear_app(en_archivo=True)
+    sink = AuditSink(app, capacidad=5, politica=POLITICA_DESCARTAR)
+    sink._asegurar_hilo = lambda: None  # Sin hilo escritor: la cola no se vacía
+
+    for i in range(8):
+        sink.registrar(usuario_id=None, accion='LOGIN', entidad='usuarios', entidad_id=i)
+
+    estadisticas = sink.estadisticas()
+    assert estadisticas['pendientes'] == 5
+    assert estadisticas['descartados'] == 3
+
+    sink.flush()
+    with app.app_context():
+        assert AuditLog.query.count() == 5
@@ -0,0 +1,132 @@
+"""
+Prueba de la cola de autorización SRI contra el servidor SRI simulado:
+facturas PENDIENTE pasan a AUTORIZADO/RECHAZADO y los fallos se reintentan
+"""
+import time
+import base64
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from models import db, Factura, ColaSri, FacturaResumenDiario
+from services.sri_service import (
+    ProcesadorColaSri, ClienteSriSoap, marcar_pendiente, generar_clave_lote, digito_modulo11
+)
+from services.factura_service import FacturaService
+from services.firmantes import get_firmante
+from mock_sri import ServidorSriSimulado
+
+
+@pytest.fixture
+def configuracion_app():
+    """El procesador abre sus propias sesiones: BD en archivo"""
+    return {'en_archivo': True}
+
+
+@pytest.fixture
+def encolar(app, crear_factura):
+    """Crear facturas PENDIENTE encoladas (con su fila en el resumen diario)"""
+    def _encolar(num_facturas):
+        for i in range(num_facturas):
+            clave = f"{i:049d}"
+            factura = crear_factura(
+                fecha_emision=datetime.now(),
+                xml_firmado=f"<factura><infoTributaria><claveAcceso>{clave}</claveAcceso></infoTributaria></factura>"
+            )
+            marcar_pendiente(factura)
+            FacturaResumenDiario.acumular(datetime.now().date(), 'PENDIENTE', factura.usuario_id,
+                                          factura.cliente_id, total=Decimal('11.50'))
+        db.session.commit()
+    return _encolar
+
+
+def test_cola_autoriza_y_reintenta(app, encolar):
+    sri = ServidorSriSimulado(consultas_en_proceso=0).iniciar()
+    try:
+        encolar(3)
+        cliente = ClienteSriSoap(sri.url_recepcion, sri.url_autorizacion, timeout=5)
+        procesador = ProcesadorColaSri(app, cliente, tamano_lote=10, backoff_base=0.01, backoff_max=0.01)
+
+        # Primer envío: el SRI cae en las dos primeras llamadas
+        sri.fallos_forzados = 2
+        assert procesador.procesar_pendientes() == 3
+        reintentos = ColaSri.query.filter_by(estado=ColaSri.PENDIENTE).all()
+        assert len(reintentos) == 2
+        assert all(t.intentos == 1 and t.ultimo_error for t in reintentos)
+
+        # Tras el backoff se reintenta y todo queda autorizado
+        time.sleep(0.05)
+        assert procesador.procesar_pendientes() == 2
+
+        facturas = Factura.query.all()
+        assert all(f.estado_sri == 'AUTORIZADO' for f in facturas)
+        assert all(len(f.num_autorizacion) == 49 for f in facturas)
+        assert ColaSri.query.filter_by(estado=ColaSri.COMPLETADO).count() == 3
+
+        resumen = {r.estado_sri: r.cantidad for r in FacturaResumenDiario.query.all()}
+        assert resumen == {'PENDIENTE': 0, 'AUTORIZADO': 3}
+    finally:
+        sri.detener()
+
+
+def test_cola_registra_rechazo(app, encolar):
+    sri = ServidorSriSimulado(tasa_rechazos=1.0).iniciar()
+    try:
+        encolar(1)
+        cliente = ClienteSriSoap(sri.url_recepcion, sri.url_autorizacion, timeout=5)
+        procesador = ProcesadorColaSri(app, cliente)
+
+        procesador.procesar_pendientes()
+        factura = Factura.query.one()
+        trabajo = ColaSri.query.one()
+        assert factura.estado_sri == 'RECHAZADO'
+        assert factura.num_autorizacion is None
+        assert trabajo.estado == ColaSri.COMPLETADO
+        assert 'FIRMA INVALIDA' in trabajo.ultimo_error
+    finally:
+        sri.detener()
+
+
+def test_cola_envia_lotes_masivos(app, encolar):
+    sri = ServidorSriSimulado().iniciar()
+    try:
+        encolar(5)
+        cliente = ClienteSriSoap(sri.url_recepcion, sri.url_autorizacion, timeout=5)
+        procesador = ProcesadorColaSri(app, cliente, lote_masivo_min=2, lote_masivo_max=2)
+
+        # Un comprobante ya llegó al SRI en un envío anterior (error 43 en el lote)
+        ya_recibido = Factura.query.first()
+        sri.atender(
+            f'<s:Envelope xmlns:s="http://schemas.xmlsoap.org/soap/envelope/"><s:Body>'
+            f'<validarComprobante><xml>{base64.b64encode(ya_recibido.xml_firmado.encode()).decode()}</xml>'
+            f'</validarComprobante></s:Body></s:Envelope>'.encode()
+        )
+
+        assert procesador.procesar_pendientes() == 5
+        assert sri.llamadas['validarComprobante'] == 1 + 3  # 5 comprobantes en lotes de 2
+        assert sri.llamadas['autorizacionComprobanteLote'] == 3
+        assert sri.llamadas['autorizacionComprobante'] == 1  # solo el ya recibido
+        # La clave de cada lote lleva la serie de sus comprobantes
+        assert all(clave[24:30] == '000000' for clave in sri.lotes)
+
+        assert all(f.estado_sri == 'AUTORIZADO' for f in Factura.query.all())
+        assert ColaSri.query.filter_by(estado=ColaSri.COMPLETADO).count() == 5
+    finally:
+        sri.detener()
+
+
+def test_claves_de_acceso_con_serie():
+    clave_lote = generar_clave_lote('1790012345001', '2', serie='002003', fecha=datetime(2025, 1, 15))
+    assert len(clave_lote) == 49
+    assert clave_lote[:10] == '1501202500' and clave_lote[23:30] == '2002003'
+    assert int(clave_lote[-1]) == digito_modulo11(clave_lote[:-1])
+
+    private_pem, public_pem = get_firmante('ed25519').generar_par_claves()
+    servicio = FacturaService.sin_bd({'algoritmo': 'ed25519', 'private_key': private_pem,
+                                      'public_key': public_pem})
+    clave = servicio._generar_clave_acceso({'numero_factura': '002-003-000000042',
+                                            'fecha_emision': datetime(2025, 1, 15)})
+    assert len(clave) == 49
+    assert clave[24:30] == '002003' and clave[30:39] == '000000042'
+    assert int(clave[-1]) == digito_modulo11(clave[:-1])
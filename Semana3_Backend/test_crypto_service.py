@@ -0,0 +1,34 @@
+"""
+Prueba del descifrado por lotes de clientes: subconjunto de campos, orden
+de las filas y resultado por fila cuando un cifrado fue alterado
+"""
+from models import Cliente
+from services.crypto_service import get_crypto_service, MARCA_ERROR_DESCIFRADO
+
+
+def _cliente(crypto, identificacion, texto):
+    cifrado = crypto.cifrar_aes_gcm(texto)
+    return Cliente(tipo_identificacion='CEDULA', identificacion=identificacion,
+                   nombres_enc=cifrado['ciphertext'], iv=cifrado['iv'], tag=cifrado['tag'])
+
+
+def test_decrypt_clientes_subconjunto_y_fila_alterada(app):
+    crypto = get_crypto_service()
+    bueno = _cliente(crypto, '1700000001', 'Ana|Pérez|Quito|0999999999|ana@correo.ec')
+    alterado = _cliente(crypto, '1700000002', 'Luis|Mora|Cuenca||')
+    alterado.tag = bytes([alterado.tag[0] ^ 1]) + alterado.tag[1:]
+    vacio = Cliente(tipo_identificacion='CEDULA', identificacion='1700000003', nombres_enc=b'', iv=b'', tag=b'')
+
+    resultados = crypto.decrypt_clientes([bueno, alterado, vacio], fields=('apellidos', 'email'))
+
+    assert resultados[0] == {'datos': {'apellidos': 'Pérez', 'email': 'ana@correo.ec'}, 'error': None}
+    # La fila alterada no interrumpe el lote: trae su error y campos marcados
+    assert resultados[1]['error']
+    assert resultados[1]['datos'] == {'apellidos': MARCA_ERROR_DESCIFRADO, 'email': MARCA_ERROR_DESCIFRADO}
+    assert resultados[2] == {'datos': {'apellidos': '', 'email': ''}, 'error': None}
+
+    # Sin fields se devuelven todos los campos
+    assert crypto.decrypt_clientes([bueno])[0]['datos'] == {
+        'nombres': 'Ana', 'apellidos': 'Pérez', 'direccion': 'Quito',
+        'telefono': '0999999999', 'email': 'ana@correo.ec'
+    }
@@ -0,0 +1,100 @@
+"""
+Prueba de POST /facturas/lote: un resultado por factura (entradas válidas e
+inválidas mezcladas), límite FACTURA_LOTE_MAX y numeración sin huecos aunque
+falle alguna factura del lote
+"""
+import pytest
+
+from models import Factura, SecuencialFactura
+from services import factura_service
+from services.firmantes import rotar_clave
+
+ITEM = {'codigo': 'P1', 'nombre': 'Producto', 'cantidad': 2, 'precio_unitario': 10}
+
+
+def _lote(app, cabeceras, facturas):
+    return app.test_client().post('/api/v1/facturas/lote', headers=cabeceras, json={'facturas': facturas})
+
+
+def test_lote_con_entradas_invalidas(app, cliente, cabeceras):
+    respuesta = _lote(app, cabeceras, [
+        {'cliente_id': cliente, 'items': [ITEM]},
+        {'cliente_id': cliente, 'items': [{**ITEM, 'cantidad': 'abc'}]},
+        {'cliente_id': str(cliente), 'items': [ITEM, ITEM]},              # mismo cuerpo que POST /facturas
+        {'cliente_id': 999, 'items': [ITEM]},
+        {'cliente_id': 'uno', 'items': [ITEM]},
+        {'cliente_id': cliente, 'items': []},
+        {'cliente_id': cliente, 'items': [{'nombre': 'Sin precio', 'cantidad': 1}]},
+        'no es un objeto',
+    ])
+    assert respuesta.status_code == 200
+    datos = respuesta.get_json()
+    resultados = datos['resultados']
+    assert [r['indice'] for r in resultados] == list(range(8))
+    assert [r['success'] for r in resultados] == [True, False, True, False, False, False, False, False]
+    assert datos['creadas'] == 2 and datos['errores'] == 6
+
+    assert 'numéricos' in resultados[1]['error']
+    assert resultados[3]['error'] == 'Cliente 999 no encontrado'
+    assert resultados[4]['error'] == 'cliente_id debe ser un número entero'
+    assert resultados[2]['factura']['total'] == 46.0
+
+    numeros = [r['factura']['numero_factura'] for r in resultados if r['success']]
+    assert numeros == ['001-001-000000001', '001-001-000000002']
+    assert Factura.query.count() == 2
+
+
+def test_lote_sin_huecos_si_falla_un_documento(app, cliente, cabeceras):
+    # Sin 'nombre' pasa la validación y los totales pero falla al generar el XML
+    respuesta = _lote(app, cabeceras, [
+        {'cliente_id': cliente, 'items': [ITEM]},
+        {'cliente_id': cliente, 'items': [{'cantidad': 1, 'precio_unitario': 5}]},
+        {'cliente_id': cliente, 'items': [ITEM]},
+    ])
+    resultados = respuesta.get_json()['resultados']
+    assert [r['success'] for r in resultados] == [True, False, True]
+    assert resultados[1]['error'].startswith('Error generando documento')
+    assert [resultados[i]['factura']['numero_factura'] for i in (0, 2)] == [
+        '001-001-000000001', '001-001-000000002'
+    ]
+    assert SecuencialFactura.query.one().ultimo == 2
+
+    # Todas fallan: el contador no avanza
+    respuesta = _lote(app, cabeceras, [{'cliente_id': cliente, 'items': [{'cantidad': 1, 'precio_unitario': 5}]}])
+    assert respuesta.get_json()['creadas'] == 0
+    assert SecuencialFactura.query.one().ultimo == 2
+
+    siguiente = app.test_client().post('/api/v1/facturas', headers=cabeceras,
+                                       json={'cliente_id': cliente, 'items': [ITEM]})
+    assert siguiente.get_json()['numero_factura'] == '001-001-000000003'
+
+    # El verificador público acepta las facturas del lote
+    for i in (0, 2):
+        hash_sha256 = resultados[i]['factura']['hash_sha256']
+        verificacion = app.test_client().get(f'/api/v1/facturas/verificar/{hash_sha256}')
+        assert verificacion.get_json()['status'] == 'VALIDA'
+
+
+@pytest.mark.parametrize('configuracion_app', [{'FACTURA_LOTE_MAX': 2}])
+def test_lote_supera_maximo(app, cliente, cabeceras):
+    respuesta = _lote(app, cabeceras, [{'cliente_id': cliente, 'items': [ITEM]}] * 3)
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['error'] == 'El lote no puede superar 2 facturas'
+    assert _lote(app, cabeceras, []).status_code == 400
+    assert Factura.query.count() == 0
+
+
+def test_pool_de_lote_se_renueva_al_cambiar_la_clave(app):
+    opciones = {'xml_compacto': False, 'xml_streaming_min': 1000}
+    try:
+        pool = factura_service._obtener_pool_lote({'key_id': 'a'}, opciones, 1)
+        assert factura_service._obtener_pool_lote({'key_id': 'a'}, opciones, 1) is pool
+        otro = factura_service._obtener_pool_lote({'key_id': 'b'}, opciones, 1)
+        assert otro is not pool
+        assert factura_service._obtener_pool_lote({'key_id': 'b'}, {**opciones, 'xml_compacto': True}, 1) is not otro
+
+        # Rotar la clave descarta el pool: el próximo lote lo crea con la clave nueva
+        rotar_clave('ed25519')
+        assert factura_service._pool_lote is None
+    finally:
+        factura_service._cerrar_pool_lote()
@@ -0,0 +1,97 @@
+"""
+Prueba de la firma por lotes Merkle: pruebas de inclusión, agrupación de
+hilos concurrentes en una firma y verificación de facturas del lote
+"""
+import hashlib
+import threading
+from datetime import datetime
+
+import pytest
+
+from app import create_app
+from config import TestingConfig
+from services.crypto_service import get_crypto_service
+from services.factura_service import FacturaService
+from services.firma_merkle import FirmadorMerkle, construir_arbol, serializar_prueba, raiz_de_prueba
+
+
+HASHES = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(9)]
+
+
+def test_pruebas_de_inclusion():
+    for cantidad in range(1, len(HASHES) + 1):
+        raiz, rutas = construir_arbol(HASHES[:cantidad])
+        for hash_sha256, ruta in zip(HASHES, rutas):
+            assert raiz_de_prueba(hash_sha256, serializar_prueba(raiz, ruta)) == raiz
+
+    raiz, rutas = construir_arbol(HASHES)
+    prueba = serializar_prueba(raiz, rutas[3])
+    assert raiz_de_prueba(HASHES[4], prueba) is None
+    assert raiz_de_prueba(HASHES[3], prueba.replace(':I', ':D', 1)) is None
+    assert raiz_de_prueba(HASHES[3], 'basura') is None
+
+
+def test_hilos_concurrentes_comparten_una_firma():
+    raices = []
+    firmador = FirmadorMerkle(lambda raiz: raices.append(raiz) or f"firma-{raiz[:8]}",
+                              ventana=0.2, max_hojas=len(HASHES))
+    resultados = {}
+    barrera = threading.Barrier(len(HASHES))
+
+    def firmar(hash_sha256):
+        barrera.wait()
+        resultados[hash_sha256] = firmador.firmar(hash_sha256)
+
+    hilos = [threading.Thread(target=firmar, args=(h,)) for h in HASHES]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    # Se llenó max_hojas: una sola raíz para los 9 hilos
+    assert len(raices) == 1
+    for hash_sha256, firma in resultados.items():
+        assert firma.firma == f"firma-{raices[0][:8]}"
+        assert raiz_de_prueba(hash_sha256, firma.prueba) == raices[0]
+
+
+def test_lote_firmado_con_una_raiz():
+    class Config(TestingConfig):
+        FACTURA_LOTE_WORKERS = 1
+
+    app = create_app(Config)
+    with app.app_context():
+        private_pem, public_pem = get_crypto_service().generar_par_claves_rsa()
+        servicio = FacturaService.sin_bd({'private_key': private_pem, 'public_key': public_pem},
+                                         xml_streaming_min=3)
+        servicio.firmador_merkle = FirmadorMerkle(servicio._firmar_hash)
+
+        cliente = {'tipo_identificacion': 'CEDULA', 'identificacion': '1712345678',
+                   'nombres': 'Ana', 'apellidos': 'Pérez', 'direccion': 'Quito'}
+        trabajos = []
+        for numero, cantidad_items in ((1, 1), (2, 5), (3, 2)):  # La 2 se escribe en streaming
+            items = [{'nombre': f'P{i}', 'cantidad': 1, 'precio_unitario': 2.5} for i in range(cantidad_items)]
+            datos = servicio._preparar_datos_factura(f'001-001-{numero:09d}', servicio.calcular_totales(items))
+            datos['fecha_emision'] = datetime(2025, 1, 15)
+            trabajos.append((datos, cliente, items))
+
+        documentos = servicio._procesar_documentos(trabajos)
+        assert len({documento['firma_digital'] for documento in documentos}) == 1
+        for documento in documentos:
+            assert '@FIRMA:' not in documento['xml_firmado']
+            assert documento['prueba_merkle'] in documento['xml_firmado']
+            assert servicio.verificar_documento(documento['hash_sha256'], documento['firma_digital'],
+                                                documento['prueba_merkle'])
+
+        # La prueba de otra factura no sirve
+        assert not servicio.verificar_documento(documentos[0]['hash_sha256'], documentos[0]['firma_digital'],
+                                                documentos[1]['prueba_merkle'])
+
+
+def test_merkle_requiere_numeracion_por_bloques(crear_app):
+    # Con bloque 1 la ventana se esperaría con el contador bloqueado
+    with pytest.raises(ValueError, match='FACTURA_BLOQUE_SECUENCIAL'):
+        crear_app(FIRMA_MERKLE=True, FACTURA_BLOQUE_SECUENCIAL=1)
+    app = crear_app(FIRMA_MERKLE=True, FACTURA_BLOQUE_SECUENCIAL=50)
+    with app.app_context():
+        assert FacturaService().firmador_merkle is not None
@@ -0,0 +1,60 @@
+"""
+Prueba de los algoritmos de firma: RSA, ECDSA P-256 y Ed25519, y rotación
+de la clave activa sin perder la verificación de facturas anteriores
+"""
+import json
+from decimal import Decimal
+
+from models import db, Factura, Configuracion
+from services.factura_service import FacturaService
+from services.firmantes import FIRMANTES, get_firmante
+from services.key_registry import get_key_registry
+
+XML = '<factura><infoTributaria><secuencial>000000001</secuencial></infoTributaria></factura>'
+
+
+def test_firmar_y_verificar_cada_algoritmo():
+    for algoritmo in ('rsa', 'ecdsa-p256', 'ed25519'):
+        firmante = get_firmante(algoritmo)
+        private_pem, public_pem = firmante.generar_par_claves()
+        servicio = FacturaService.sin_bd({'algoritmo': algoritmo, 'private_key': private_pem,
+                                          'public_key': public_pem})
+        documento = servicio.firmar_xml(XML)
+        assert f'<ds:KeyName>{servicio.key_id}</ds:KeyName>' in documento['xml_firmado']
+        assert servicio.verificar_firma(documento['hash_sha256'], documento['firma_digital'], documento['key_id'])
+        assert not servicio.verificar_firma('0' * 64, documento['firma_digital'], documento['key_id'])
+    assert set(FIRMANTES) == {'rsa', 'ecdsa-p256', 'ed25519'}
+
+
+def test_rotacion_conserva_facturas_anteriores(app):
+    # Instalación anterior a los key id: solo la fila rsa_keys
+    private_pem, public_pem = get_firmante('rsa').generar_par_claves()
+    db.session.add(Configuracion(clave='rsa_keys', valor=json.dumps(
+        {'private_key': private_pem, 'public_key': public_pem})))
+    db.session.commit()
+
+    servicio_rsa = FacturaService()
+    antigua = servicio_rsa.firmar_xml(XML)
+    db.session.add(Factura(
+        cliente_id=1, usuario_id=1, numero_factura='001-001-000000001',
+        subtotal=Decimal('10.00'), iva=Decimal('1.50'), total=Decimal('11.50'), items=[],
+        hash_sha256=antigua['hash_sha256'], firma_digital=antigua['firma_digital'], key_id=None
+    ))
+    db.session.commit()
+
+    app.config['FIRMA_ALGORITMO'] = 'ed25519'
+    get_key_registry().invalidar()
+    servicio_ed25519 = FacturaService()
+    assert servicio_ed25519.key_id != servicio_rsa.key_id
+    assert servicio_ed25519.key_id_heredada == servicio_rsa.key_id
+
+    nueva = servicio_ed25519.firmar_xml(XML.replace('000000001', '000000002'))
+    assert len(nueva['firma_digital']) == 88  # 64 bytes en base64
+
+    resultado = servicio_ed25519.verificar_integridad(antigua['hash_sha256'])
+    assert resultado['status'] == 'VALIDA'
+    assert resultado['factura']['algoritmo_firma'] == 'RSA-2048 PSS SHA-256'
+    assert servicio_ed25519.verificar_firma(nueva['hash_sha256'], nueva['firma_digital'], nueva['key_id'])
+
+    # Una instancia creada antes de la rotación relee el llavero al ver un key id nuevo
+    assert servicio_rsa.verificar_firma(nueva['hash_sha256'], nueva['firma_digital'], nueva['key_id'])
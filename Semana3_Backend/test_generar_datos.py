@@ -0,0 +1,42 @@
+"""
+Prueba del generador de datos sintéticos: clientes descifrables, facturas
+firmadas y verificables, contador de secuenciales y resumen diario al día
+"""
+from sqlalchemy import func
+
+from models import db, Usuario, Cliente, Factura, DocumentoXml, ColaSri, FacturaResumenDiario
+from models.secuencial import SecuencialFactura
+from services.crypto_service import get_crypto_service
+from services.factura_service import FacturaService
+from generar_datos import generar, datos_cliente
+
+
+def test_generar_clientes_y_facturas_verificables(app):
+    db.session.add(Usuario(username='t', email='t@test.com', password_hash='x',
+                           nombres='T', apellidos='K', rol='ADMIN'))
+    db.session.commit()
+
+    generar(clientes=15, facturas=50, dias=30, workers=1, lote=20, semilla=7)
+
+    assert Cliente.query.count() == 15
+    assert Factura.query.count() == DocumentoXml.query.count() == 50
+    assert db.session.query(func.sum(FacturaResumenDiario.cantidad)).scalar() == 50
+    assert ColaSri.query.count() == Factura.query.filter_by(estado_sri='PENDIENTE').count()
+    assert SecuencialFactura.query.one().ultimo == 50
+
+    # Numeración correlativa en el orden de las fechas
+    facturas = Factura.query.order_by(Factura.numero_factura).all()
+    assert facturas[-1].numero_factura == '001-001-000000050'
+    assert all(a.fecha_emision <= b.fecha_emision for a, b in zip(facturas[:20], facturas[1:20]))
+
+    cliente = Cliente.query.order_by(Cliente.id).first()
+    descifrado = get_crypto_service().decrypt_clientes([cliente])[0]
+    assert descifrado['datos'] == datos_cliente(7, 0)
+
+    servicio = FacturaService()
+    for factura in facturas[::10]:
+        resultado = servicio.verificar_integridad(factura.hash_sha256)
+        assert resultado['status'] == 'VALIDA'
+
+    # El contador sigue después del rango cargado
+    assert servicio.generar_numero_factura() == '001-001-000000051'
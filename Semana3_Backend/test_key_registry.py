@@ -0,0 +1,51 @@
+"""
+Prueba del registro de claves parseadas: se vacía cuando cambia la fila
+rsa_keys o claves_firma en configuracion (y no con otras filas)
+"""
+import json
+
+import pytest
+
+from models import db, Configuracion
+from services.crypto_service import get_crypto_service
+from services.key_registry import get_key_registry, CLAVE_CONFIG_RSA, CLAVE_CONFIG_FIRMA
+
+
+def _misses():
+    return get_key_registry().estadisticas()['misses']
+
+
+@pytest.mark.parametrize('clave', [CLAVE_CONFIG_RSA, CLAVE_CONFIG_FIRMA])
+def test_cambio_de_claves_en_configuracion_invalida_el_registro(app, clave):
+    registro = get_key_registry()
+    crypto = get_crypto_service()
+    privada_vieja, _ = crypto.generar_par_claves_rsa()
+    privada_nueva, publica_nueva = crypto.generar_par_claves_rsa()
+
+    fila = Configuracion(clave=clave, valor=json.dumps({'private_key': privada_vieja}))
+    db.session.add(fila)
+    db.session.commit()
+    vieja = registro.obtener_clave_privada(privada_vieja, key_id='activa')
+
+    # Otra fila de configuracion no toca el registro
+    db.session.add(Configuracion(clave='otra', valor='1'))
+    db.session.commit()
+    misses = _misses()
+    assert registro.obtener_clave_privada(privada_nueva, key_id='activa') is vieja
+    assert _misses() == misses
+
+    # Cambiar la fila: el mismo key id vuelve a parsearse y devuelve la clave nueva
+    fila.valor = json.dumps({'private_key': privada_nueva})
+    db.session.commit()
+    nueva = registro.obtener_clave_privada(privada_nueva, key_id='activa')
+    assert _misses() == misses + 1
+    assert nueva is not vieja
+    assert nueva.public_key().public_numbers() == \
+        registro.obtener_clave_publica(publica_nueva).public_numbers()
+
+    # Borrarla también invalida
+    db.session.delete(fila)
+    db.session.commit()
+    misses = _misses()
+    registro.obtener_clave_privada(privada_nueva, key_id='activa')
+    assert _misses() == misses + 1
@@ -0,0 +1,67 @@
+"""
+Prueba: el listado de facturas ejecuta un número constante de consultas
+(sin N+1 sobre Cliente/Usuario) sin importar el tamaño de la página
+"""
+import os
+from decimal import Decimal
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+
+from models import db, Usuario, Cliente, Factura
+from services.crypto_service import get_crypto_service
+
+
+def _crear_datos(num_facturas):
+    """Crear usuario, un cliente por factura y las facturas"""
+    crypto = get_crypto_service()
+    usuario = Usuario(username='admin', email='admin@test.com', password_hash='x',
+                      nombres='Admin', apellidos='Test', rol='ADMIN')
+    db.session.add(usuario)
+    db.session.flush()
+
+    for i in range(num_facturas):
+        iv = os.urandom(12)
+        cifrado = crypto._aesgcm.encrypt(iv, f'Nombre{i}|Apellido{i}|Dir|099|c{i}@test.com'.encode('utf-8'), None)
+        cliente = Cliente(tipo_identificacion='CEDULA', identificacion=f'{i:010d}',
+                          nombres_enc=cifrado[:-16], tag=cifrado[-16:], iv=iv)
+        db.session.add(cliente)
+        db.session.flush()
+        db.session.add(Factura(
+            cliente_id=cliente.id, usuario_id=usuario.id,
+            numero_factura=f'001-001-{i + 1:09d}',
+            subtotal=Decimal('10.00'), iva=Decimal('1.50'), total=Decimal('11.50'),
+            items=[{'nombre': 'Producto', 'cantidad': 1, 'precio_unitario': 10}],
+            hash_sha256=f'{i:064x}', firma_digital='firma'
+        ))
+    db.session.commit()
+    return create_access_token(identity=usuario.id, additional_claims={'rol': 'ADMIN'})
+
+
+def _contar_consultas(app, num_facturas):
+    """Número de sentencias SQL que ejecuta GET /facturas con una página de num_facturas"""
+    with app.app_context():
+        token = _crear_datos(num_facturas)
+
+        consultas = []
+
+        def contar(conn, cursor, statement, parameters, context, executemany):
+            consultas.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            respuesta = app.test_client().get(
+                f'/api/v1/facturas?per_page={num_facturas}',
+                headers={'Authorization': f'Bearer {token}'}
+            )
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+            db.drop_all()
+
+    assert respuesta.status_code == 200
+    assert len(respuesta.json['facturas']) == num_facturas
+    assert respuesta.json['facturas'][-1]['cliente']['nombres'].startswith('Nombre')
+    return len(consultas)
+
+
+def test_listar_facturas_consultas_constantes(crear_app):
+    assert _contar_consultas(crear_app(), 2) == _contar_consultas(crear_app(), 25)
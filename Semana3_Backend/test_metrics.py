@@ -0,0 +1,77 @@
+"""
+Prueba de /metrics: formato de texto Prometheus, consultas y tiempo de BD
+por request, etapas de crear_factura y limpieza tras una consulta fallida
+"""
+import re
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from models import db
+
+
+# nombre{etiquetas} valor
+_MUESTRA = re.compile(r'([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_]\w*="(?:[^"\\]|\\.)*",?)*\})? (\S+)')
+
+
+def _leer_metricas(cliente_http):
+    """Muestras de /metrics {nombre{etiquetas}: valor}, validando el formato"""
+    respuesta = cliente_http.get('/metrics')
+    assert respuesta.status_code == 200
+    assert respuesta.mimetype == 'text/plain'
+
+    muestras, tipos = {}, {}
+    for linea in respuesta.get_data(as_text=True).splitlines():
+        if linea.startswith('# HELP '):
+            continue
+        if linea.startswith('# TYPE '):
+            _, _, nombre, tipo = linea.split(' ')
+            assert tipo in ('counter', 'histogram')
+            tipos[nombre] = tipo
+            continue
+        coincidencia = _MUESTRA.fullmatch(linea)
+        assert coincidencia, linea
+        nombre = coincidencia.group(1)
+        # Cada muestra pertenece a una métrica declarada antes con # TYPE
+        assert nombre in tipos or re.sub(r'_(bucket|sum|count)$', '', nombre) in tipos, linea
+        muestras[nombre + (coincidencia.group(2) or '')] = float(coincidencia.group(3))
+    return muestras
+
+
+def _diferencia(antes, despues, clave):
+    return despues.get(clave, 0) - antes.get(clave, 0)
+
+
+def test_metricas_de_un_request(app, cabeceras, cliente):
+    cliente_http = app.test_client()
+    antes = _leer_metricas(cliente_http)
+
+    respuesta = cliente_http.post('/api/v1/facturas', headers=cabeceras, json={
+        'cliente_id': cliente,
+        'items': [{'nombre': 'Producto', 'cantidad': 2, 'precio_unitario': 5}]
+    })
+    assert respuesta.status_code == 201
+    despues = _leer_metricas(cliente_http)
+
+    ruta = 'ruta="/api/v1/facturas/"'
+    assert _diferencia(antes, despues, f'http_request_duration_seconds_count{{metodo="POST",{ruta},estado="201"}}') == 1
+    assert _diferencia(antes, despues, f'db_queries_per_request_count{{{ruta}}}') == 1
+    consultas = _diferencia(antes, despues, f'db_queries_per_request_sum{{{ruta}}}')
+    assert consultas >= 3
+    assert _diferencia(antes, despues, 'db_queries_total') >= consultas
+    assert _diferencia(antes, despues, f'db_query_seconds_per_request_sum{{{ruta}}}') > 0
+
+    # Buckets acumulativos: +Inf igual a la cuenta
+    assert despues[f'db_queries_per_request_bucket{{{ruta},le="+Inf"}}'] == \
+        despues[f'db_queries_per_request_count{{{ruta}}}']
+
+    for etapa in ('xml', 'firma', 'commit'):
+        assert _diferencia(antes, despues, f'factura_etapa_duration_seconds_count{{etapa="{etapa}"}}') == 1
+        assert _diferencia(antes, despues, f'factura_etapa_duration_seconds_sum{{etapa="{etapa}"}}') > 0
+
+
+def test_consulta_fallida_no_deja_inicio_en_la_conexion(app):
+    with db.engine.connect() as conexion:
+        with pytest.raises(OperationalError):
+            conexion.execute(db.text('SELECT * FROM tabla_inexistente'))
+        assert conexion.info.get('_metricas_inicio') == []
@@ -0,0 +1,93 @@
+"""
+Prueba de la paginación por cursor: recorrer todas las páginas con empates
+en fecha_emision sin repetir ni saltar filas, y cursores alterados -> 400
+"""
+import json
+import base64
+from datetime import datetime, timedelta
+
+from models import db, Cliente, Factura
+from services.pagination import codificar_cursor, leer_limite, LIMITE_MAXIMO
+
+
+FECHA = datetime(2025, 5, 1, 10, 0, 0)
+
+
+def _recorrer(cliente_http, url, cabeceras, extraer):
+    """
+    Seguir next_cursor hasta la última página
+
+    Args:
+        extraer: Función respuesta JSON -> (filas, next_cursor)
+
+    Returns:
+        tuple: (filas en orden, número de páginas)
+    """
+    filas, cursor, paginas = [], '', 0
+    while cursor is not None:
+        respuesta = cliente_http.get(f'{url}&cursor={cursor}', headers=cabeceras)
+        assert respuesta.status_code == 200, respuesta.get_json()
+        pagina, cursor = extraer(respuesta.get_json())
+        filas.extend(pagina)
+        paginas += 1
+    return filas, paginas
+
+
+def test_recorrer_facturas_con_empates_en_fecha(app, crear_factura, cabeceras):
+    # 13 facturas en 3 instantes: las páginas de 4 cortan dentro de cada empate
+    for i in range(13):
+        crear_factura(fecha_emision=FECHA - timedelta(hours=i % 3))
+    db.session.commit()
+
+    filas, paginas = _recorrer(app.test_client(), '/api/v1/facturas?fields=id,fecha_emision&limit=4',
+                               cabeceras, lambda datos: (datos['facturas'], datos['next_cursor']))
+    esperado = [
+        factura.id for factura in
+        Factura.query.order_by(Factura.fecha_emision.desc(), Factura.id.desc()).all()
+    ]
+    assert [fila['id'] for fila in filas] == esperado
+    assert len(set(esperado)) == 13 and paginas == 4
+
+
+def test_recorrer_clientes(app, crear_factura, cabeceras):
+    for i in range(6):
+        db.session.add(Cliente(tipo_identificacion='CEDULA', identificacion=f'09000000{i:02d}',
+                               nombres_enc=b'', iv=b'', tag=b''))
+    db.session.commit()
+
+    filas, _ = _recorrer(
+        app.test_client(), '/api/v1/clientes?limit=3', cabeceras,
+        lambda datos: (datos['data']['clientes'], datos['data']['pagination']['next_cursor'])
+    )
+    assert [fila['id'] for fila in filas] == [cliente.id for cliente in Cliente.query.order_by(Cliente.id)]
+
+
+def test_cursor_invalido_responde_400(app, factura, cabeceras):
+    def crudo(valor):
+        return base64.urlsafe_b64encode(json.dumps(valor).encode()).decode().rstrip('=')
+
+    cursores = [
+        'basura!!',
+        crudo({'a': 1, 'b': 2}),
+        crudo(['2025-05-01', 1]),                       # fecha sin marcar como datetime
+        crudo([{'dt': '2025-05-01T10:00:00'}, '1']),     # id como texto
+        crudo([{'dt': '2025-05-01T10:00:00'}, True]),
+        crudo([{'dt': '2025-05-01T10:00:00'}, 2 ** 70]),
+        crudo([{'dt': 'ayer'}, 1]),
+        codificar_cursor([1]),                          # otra clave de orden
+    ]
+    cliente_http = app.test_client()
+    for cursor in cursores:
+        respuesta = cliente_http.get(f'/api/v1/facturas?fields=id&cursor={cursor}', headers=cabeceras)
+        assert respuesta.status_code == 400, cursor
+        assert respuesta.get_json()['error'] == 'Cursor inválido'
+
+    respuesta = cliente_http.get(f'/api/v1/clientes?cursor={crudo(["1"])}', headers=cabeceras)
+    assert respuesta.status_code == 400
+
+
+def test_leer_limite():
+    assert leer_limite(None) == 20
+    assert leer_limite('abc') == 20
+    assert leer_limite('0') == 1
+    assert leer_limite(10 ** 6) == LIMITE_MAXIMO
@@ -0,0 +1,33 @@
+"""
+Prueba del pool de conexiones configurable: /health reporta la saturación y
+el límite por ruta no afecta a SQLite
+"""
+from flask_jwt_extended import create_access_token
+
+from config import Config
+from models import db
+
+
+def test_health_reporta_pool_y_reportes_funcionan(crear_app):
+    app = crear_app(en_archivo=True, SQLALCHEMY_ENGINE_OPTIONS=dict(
+        Config.SQLALCHEMY_ENGINE_OPTIONS, pool_size=2, max_overflow=2
+    ))
+    cliente = app.test_client()
+    with app.app_context():
+        token = create_access_token(identity='1')
+
+        # Una conexión tomada fuera del request: 1 de 4 en uso
+        conexion = db.engine.connect()
+        respuesta = cliente.get('/health')
+        conexion.close()
+
+    datos = respuesta.get_json()
+    assert datos['database'] == 'connected'
+    assert datos['pool']['clase'] == 'QueuePool'
+    assert datos['pool']['tamano'] == 2 and datos['pool']['en_uso'] == 1
+    assert datos['pool']['saturacion'] == 0.25
+
+    respuesta = cliente.get('/api/v1/facturas/estadisticas',
+                            headers={'Authorization': f'Bearer {token}'})
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()['total_facturas'] == 0
@@ -0,0 +1,48 @@
+"""
+Prueba: el QR de una factura se genera bajo demanda (SVG o PNG), se sirve
+desde la caché LRU y responde 304 cuando el ETag coincide
+"""
+from services.qr_service import CacheLRU, get_qr_service
+from services.metrics import QR_CACHE
+
+
+def test_qr_bajo_demanda_con_etag(app, factura, cabeceras):
+    cliente_http = app.test_client()
+    fallos_antes = QR_CACHE.valor(resultado='miss')
+
+    svg = cliente_http.get('/api/v1/facturas/1/qr?formato=svg', headers=cabeceras)
+    assert svg.status_code == 200
+    assert svg.mimetype == 'image/svg+xml'
+    assert b'<svg' in svg.data
+    assert svg.headers['Cache-Control'] == 'private, max-age=86400'
+
+    png = cliente_http.get('/api/v1/facturas/1/qr', headers=cabeceras)
+    assert png.data.startswith(b'\x89PNG')
+    assert png.headers['ETag'] != svg.headers['ETag']
+
+    # Segundo pedido: misma imagen desde la caché, sin volver a renderizar
+    repetido = cliente_http.get('/api/v1/facturas/1/qr?formato=svg', headers=cabeceras)
+    assert repetido.data == svg.data
+    assert QR_CACHE.valor(resultado='miss') - fallos_antes == 2
+
+    no_modificado = cliente_http.get(
+        '/api/v1/facturas/1/qr?formato=svg',
+        headers={**cabeceras, 'If-None-Match': svg.headers['ETag']}
+    )
+    assert no_modificado.status_code == 304
+    assert no_modificado.data == b''
+
+    assert cliente_http.get('/api/v1/facturas/1/qr?formato=gif', headers=cabeceras).status_code == 400
+    assert cliente_http.get('/api/v1/facturas/99/qr', headers=cabeceras).status_code == 404
+    assert get_qr_service().url_verificacion('a' * 64).endswith('/verificar/' + 'a' * 64)
+
+
+def test_cache_lru_acotada():
+    cache = CacheLRU(capacidad=2)
+    cache.guardar('a', b'1')
+    cache.guardar('b', b'2')
+    cache.obtener('a')           # 'a' pasa a ser la más reciente
+    cache.guardar('c', b'3')     # se descarta 'b'
+    assert cache.obtener('b') is None
+    assert cache.obtener('a') == b'1' and cache.obtener('c') == b'3'
+    assert len(cache) == 2
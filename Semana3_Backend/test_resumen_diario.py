@@ -0,0 +1,74 @@
+"""
+Prueba del resumen diario que sirve /facturas/estadisticas: tras crear,
+autorizar y rechazar facturas coincide con un agregado directo sobre factura
+y con reconstruir()
+"""
+from datetime import datetime
+
+from models import db, Factura, FacturaResumenDiario
+from services.sri_service import aplicar_resultado
+
+
+def _estadisticas(app, cabeceras):
+    respuesta = app.test_client().get('/api/v1/facturas/estadisticas', headers=cabeceras)
+    assert respuesta.status_code == 200
+    return respuesta.get_json()
+
+
+def _agregado_directo():
+    """Lo que estadisticas calcularía leyendo la tabla factura"""
+    primer_dia_mes = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    facturas = Factura.query.all()
+    del_mes = [f for f in facturas if f.fecha_emision >= primer_dia_mes]
+    estados = {}
+    for factura in facturas:
+        estados[factura.estado_sri] = estados.get(factura.estado_sri, 0) + 1
+    return {
+        'total_facturas': len(facturas),
+        'total_facturado': round(float(sum(f.total for f in facturas)), 2),
+        'facturas_mes': len(del_mes),
+        'total_mes': round(float(sum(f.total for f in del_mes)), 2),
+        'estados': estados
+    }
+
+
+def _filas_resumen():
+    return sorted(
+        (fila.fecha, fila.estado_sri, fila.usuario_id, fila.cliente_id, fila.cantidad, fila.total)
+        for fila in FacturaResumenDiario.query.all() if fila.cantidad
+    )
+
+
+def test_estadisticas_coinciden_con_factura_y_reconstruir(app, cliente, cabeceras):
+    cliente_http = app.test_client()
+    ids = []
+    for precio in (10, 20, 30, 40, 55.5):
+        respuesta = cliente_http.post('/api/v1/facturas', headers=cabeceras, json={
+            'cliente_id': cliente,
+            'items': [{'codigo': 'P1', 'nombre': 'Producto', 'cantidad': 2, 'precio_unitario': precio}]
+        })
+        assert respuesta.status_code == 201
+        ids.append(respuesta.get_json()['id'])
+
+    assert _estadisticas(app, cabeceras)['estados'] == {'PENDIENTE': 5}
+
+    # Respuestas del SRI: dos autorizadas, una rechazada y una repetida que no cuenta
+    ahora = datetime.now()
+    for factura_id, estado in ((ids[0], 'AUTORIZADO'), (ids[1], 'AUTORIZADO'), (ids[2], 'RECHAZADO')):
+        assert aplicar_resultado(factura_id, {'estado': estado, 'num_autorizacion': None,
+                                              'fecha_autorizacion': ahora})
+    assert not aplicar_resultado(ids[0], {'estado': 'RECHAZADO', 'num_autorizacion': None,
+                                          'fecha_autorizacion': ahora})
+    db.session.commit()
+
+    estadisticas = _estadisticas(app, cabeceras)
+    estadisticas['total_facturado'] = round(estadisticas['total_facturado'], 2)
+    estadisticas['total_mes'] = round(estadisticas['total_mes'], 2)
+    assert estadisticas == _agregado_directo()
+    assert estadisticas['estados'] == {'AUTORIZADO': 2, 'RECHAZADO': 1, 'PENDIENTE': 2}
+
+    # Recalcular desde cero da las mismas filas y la misma respuesta
+    incremental = _filas_resumen()
+    FacturaResumenDiario.reconstruir()
+    assert _filas_resumen() == incremental
+    assert _estadisticas(app, cabeceras)['estados'] == estadisticas['estados']
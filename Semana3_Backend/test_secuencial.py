@@ -0,0 +1,60 @@
+"""
+Prueba de estrés: el asignador de números de factura no entrega duplicados
+con varios hilos pidiendo números en paralelo
+"""
+import threading
+
+from models import db
+from services.secuencial_service import AsignadorSecuencial
+
+
+HILOS = 8
+NUMEROS_POR_HILO = 25
+
+
+def _asignar_en_paralelo(crear_app, tamano_bloque):
+    """Pedir números desde varios hilos y devolver todos los asignados"""
+    app = crear_app(en_archivo=True, SQLALCHEMY_ENGINE_OPTIONS={'connect_args': {'timeout': 30}})
+
+    asignador = AsignadorSecuencial(tamano_bloque)
+    asignados = []
+    errores = []
+    lock = threading.Lock()
+
+    def trabajador():
+        with app.app_context():
+            try:
+                for _ in range(NUMEROS_POR_HILO):
+                    numero = asignador.siguiente('001', '002')
+                    db.session.commit()
+                    with lock:
+                        asignados.append(numero)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                db.session.remove()
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(HILOS)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    assert not errores, errores
+    return asignados
+
+
+def test_asignacion_sin_duplicados_en_transaccion(crear_app):
+    asignados = _asignar_en_paralelo(crear_app, tamano_bloque=1)
+    total = HILOS * NUMEROS_POR_HILO
+    assert len(asignados) == total
+    assert len(set(asignados)) == total
+    # Sin huecos: exactamente 1..total
+    assert sorted(asignados) == [AsignadorSecuencial.formatear('001', '002', n) for n in range(1, total + 1)]
+
+
+def test_asignacion_sin_duplicados_por_bloques(crear_app):
+    asignados = _asignar_en_paralelo(crear_app, tamano_bloque=10)
+    assert len(asignados) == HILOS * NUMEROS_POR_HILO
+    assert len(set(asignados)) == len(asignados)
+    assert all(numero.startswith('001-002-') for numero in asignados)
@@ -0,0 +1,98 @@
+"""
+Prueba de los tokens firmados del QR: ida y vuelta, detección de cambios
+y verificación sin BD con las claves públicas en un archivo
+"""
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from models import db, Configuracion
+from services import token_verificacion
+from services.token_verificacion import (
+    CLAVE_CONFIG_TOKEN, EmisorTokens, VerificadorTokens, generar_par_claves, get_emisor_tokens,
+    obtener_claves_token, _b64url, _desde_b64url
+)
+
+FECHA = datetime(2025, 3, 14, 15, 9, 26)
+
+
+def test_token_ida_y_vuelta_y_alterado():
+    emisor = EmisorTokens(*generar_par_claves())
+    verificador = VerificadorTokens({emisor.key_id: emisor.public_key_pem})
+
+    token = emisor.emitir('001-002-000000123', Decimal('1234.56'), FECHA)
+    assert len(token) <= 130
+    resultado = verificador.verificar(token)
+    assert resultado['status'] == 'VALIDA'
+    assert resultado['factura'] == {
+        'numero_factura': '001-002-000000123',
+        'fecha_emision': '14/03/2025 15:09:26',
+        'total': 1234.56,
+        'algoritmo_firma': 'Ed25519',
+        'key_id': emisor.key_id
+    }
+
+    # Cambiar un byte del total invalida la firma
+    datos = bytearray(_desde_b64url(token))
+    datos[24] ^= 1
+    assert verificador.verificar(_b64url(bytes(datos)))['status'] == 'INVALIDA'
+    assert verificador.verificar('basura!')['status'] == 'INVALIDA'
+
+    otro = EmisorTokens(*generar_par_claves())
+    assert verificador.verificar(otro.emitir('001-002-000000123', 1, FECHA))['status'] == 'CLAVE_DESCONOCIDA'
+
+
+@pytest.mark.parametrize('configuracion_app', [{'QR_TOKEN': True}])
+def test_qr_con_token_y_verificador_sin_bd(app, crear_factura, cabeceras, crear_app, tmp_path):
+    crear_factura(numero_factura='001-001-000000007', fecha_emision=FECHA)
+    db.session.commit()
+
+    cliente_http = app.test_client()
+    con_token = cliente_http.get('/api/v1/facturas/1/qr', headers=cabeceras)
+    assert con_token.status_code == 200
+
+    token = get_emisor_tokens().emitir('001-001-000000007', Decimal('11.50'), FECHA)
+    resultado = cliente_http.get(f'/api/v1/facturas/verificar-token/{token}').get_json()
+    assert resultado['valida'] and resultado['factura']['total'] == 11.50
+
+    claves = cliente_http.get('/api/v1/facturas/claves-token').get_json()
+
+    # Nodo verificador: solo el archivo de claves públicas
+    archivo = tmp_path / 'claves.json'
+    archivo.write_text(json.dumps(claves))
+
+    verificador = crear_app(QR_TOKEN_CLAVES_PUBLICAS=str(archivo)).test_client()
+    assert verificador.get(f'/api/v1/facturas/verificar-token/{token}').get_json()['status'] == 'VALIDA'
+
+
+@pytest.mark.parametrize('configuracion_app', [{'QR_TOKEN': False}, {'QR_TOKEN': True}])
+def test_verificar_token_no_crea_claves(app, configuracion_app):
+    token = EmisorTokens(*generar_par_claves()).emitir('001-001-000000001', 1, FECHA)
+    respuesta = app.test_client().get(f'/api/v1/facturas/verificar-token/{token}')
+
+    if configuracion_app['QR_TOKEN']:
+        # Sin par guardado no se emitió ningún token
+        assert respuesta.status_code == 200
+        assert respuesta.get_json()['status'] == 'CLAVE_DESCONOCIDA'
+    else:
+        assert respuesta.status_code == 404
+    assert Configuracion.query.filter_by(clave=CLAVE_CONFIG_TOKEN).count() == 0
+
+
+@pytest.mark.parametrize('configuracion_app', [{'en_archivo': True}])
+def test_claves_token_creadas_a_la_vez_por_otro_worker(app, monkeypatch):
+    ajenas = generar_par_claves()
+
+    def generar_mientras_otro_worker_guarda():
+        # El otro worker confirma su par en su propia conexión
+        with db.engine.begin() as conexion:
+            conexion.execute(Configuracion.__table__.insert().values(
+                clave=CLAVE_CONFIG_TOKEN,
+                valor=json.dumps({'private_key': ajenas[0], 'public_key': ajenas[1]})
+            ))
+        return generar_par_claves()
+
+    monkeypatch.setattr(token_verificacion, 'generar_par_claves', generar_mientras_otro_worker_guarda)
+    assert obtener_claves_token()['public_key'] == ajenas[1]
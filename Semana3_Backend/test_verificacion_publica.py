@@ -0,0 +1,81 @@
+"""
+Prueba de la verificación pública: caché por hash invalidada al cambiar
+estado_sri y token bucket por IP (HTTP 429 con Retry-After)
+"""
+from datetime import datetime
+
+from models import db, Factura
+from services.verificacion_publica import LimitadorTokenBucket, get_verificacion_publica
+from services.sri_service import aplicar_resultado, marcar_pendiente
+
+
+HASH = 'c' * 64
+
+
+def test_cache_invalidada_al_autorizar(app, crear_factura):
+    factura = crear_factura(hash_sha256=HASH)
+    marcar_pendiente(factura)
+    db.session.commit()
+
+    calculos = []
+
+    def calcular(hash_sha256):
+        calculos.append(hash_sha256)
+        estado = db.session.execute(
+            db.select(Factura.estado_sri).where(Factura.hash_sha256 == hash_sha256)
+        ).scalar()
+        return {'status': 'VALIDA', 'valida': True, 'factura': {'estado_sri': estado}}
+
+    verificacion = get_verificacion_publica()
+    assert verificacion.verificar(HASH, calcular)['factura']['estado_sri'] == 'PENDIENTE'
+    assert verificacion.verificar(HASH, calcular)['factura']['estado_sri'] == 'PENDIENTE'
+    assert len(calculos) == 1
+
+    aplicar_resultado(factura.id, {'estado': 'AUTORIZADO', 'num_autorizacion': '1' * 49,
+                                   'fecha_autorizacion': datetime.now()})
+    db.session.commit()
+    assert verificacion.verificar(HASH, calcular)['factura']['estado_sri'] == 'AUTORIZADO'
+    assert len(calculos) == 2
+
+    # Hashes mal formados no llegan a la BD
+    assert verificacion.verificar('no-es-un-hash', calcular)['status'] == 'NO_ENCONTRADA'
+    assert len(calculos) == 2
+
+
+def test_limite_por_ip(crear_app):
+    app = crear_app(VERIFICACION_RAFAGA=3, VERIFICACION_TASA=0.5)
+    cliente_http = app.test_client()
+    estados = [
+        cliente_http.get('/api/v1/facturas/verificar/xyz', environ_base={'REMOTE_ADDR': '10.0.0.1'})
+        for _ in range(4)
+    ]
+    assert [r.status_code for r in estados] == [200, 200, 200, 429]
+    assert estados[-1].headers['Retry-After'] == '2'
+
+    # Otra IP tiene su propio balde
+    otra = cliente_http.get('/api/v1/facturas/verificar/xyz', environ_base={'REMOTE_ADDR': '10.0.0.2'})
+    assert otra.status_code == 200
+
+
+def test_limite_por_ip_detras_de_proxy(crear_app):
+    app = crear_app(VERIFICACION_RAFAGA=1, VERIFICACION_TASA=0.01, PROXY_X_FOR=1)
+    cliente_http = app.test_client()
+
+    def verificar(reenviado):
+        return cliente_http.get('/api/v1/facturas/verificar/xyz', environ_base={'REMOTE_ADDR': '10.0.0.1'},
+                                headers={'X-Forwarded-For': reenviado}).status_code
+
+    # Cada cliente detrás del proxy tiene su propio balde
+    assert [verificar('200.1.1.1'), verificar('200.1.1.2'), verificar('200.1.1.1')] == [200, 200, 429]
+    # Solo se confía en el último salto: anteponer una IP falsa no evita el límite
+    assert verificar('1.2.3.4, 200.1.1.2') == 429
+
+
+def test_token_bucket_recarga():
+    ahora = [0.0]
+    limitador = LimitadorTokenBucket(tasa=1.0, rafaga=2, reloj=lambda: ahora[0])
+    assert limitador.permitir('ip')[0] and limitador.permitir('ip')[0]
+    permitido, espera = limitador.permitir('ip')
+    assert not permitido and espera == 1.0
+    ahora[0] = 1.0
+    assert limitador.permitir('ip')[0]
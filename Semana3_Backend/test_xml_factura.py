@@ -0,0 +1,45 @@
+"""
+Prueba del XML de factura: el hash del modo streaming coincide con la forma
+canónica (C14N) del documento y con el del modo árbol, también con texto
+que el parser normaliza o escapa (\r, &, <, no ASCII)
+"""
+import hashlib
+from datetime import datetime
+
+from lxml import etree
+
+from services.crypto_service import get_crypto_service
+from services.factura_service import FacturaService
+from services.xml_factura import FacturaStreaming, NS_DS
+
+
+CLIENTE = {'tipo_identificacion': 'CEDULA', 'identificacion': '1712345678',
+           'nombres': 'Ana\r\nMaría', 'apellidos': 'Pérez & <Hijos>',
+           'direccion': 'Av. Amazonas\rN° 12 & Colón'}
+ITEMS = [{'codigo': f'P<{i}>\r', 'nombre': f'Café «{i}» &\r\nAzúcar\r', 'cantidad': 1,
+          'precio_unitario': 2.5} for i in range(3)]
+
+
+def _firmar(servicio):
+    datos = servicio._preparar_datos_factura('001-001-000000007', servicio.calcular_totales(ITEMS))
+    datos['fecha_emision'] = datetime(2025, 1, 15)
+    xml = servicio._construir_xml(datos, CLIENTE, ITEMS)
+    return xml, servicio.firmar_xml(xml, compacto=True, firmar=lambda hash_sha256: 'firma')
+
+
+def test_hash_streaming_igual_a_c14n_y_modo_arbol(app):
+    private_pem, public_pem = get_crypto_service().generar_par_claves_rsa()
+    clave = {'private_key': private_pem, 'public_key': public_pem}
+
+    xml, streaming = _firmar(FacturaService.sin_bd(clave, xml_streaming_min=2))
+    assert isinstance(xml, FacturaStreaming)
+    _, arbol = _firmar(FacturaService.sin_bd(clave))
+
+    # Re-parsear lo escrito y hashear la forma canónica sin ds:Signature
+    raiz = etree.fromstring(streaming['xml_firmado'].encode('utf-8'))
+    raiz.remove(raiz.find(f'{{{NS_DS}}}Signature'))
+    canonico = hashlib.sha256(etree.tostring(raiz, method='c14n')).hexdigest()
+
+    assert streaming['hash_sha256'] == canonico == arbol['hash_sha256']
+    assert raiz.findtext('infoFactura/razonSocialComprador') == 'Ana\nMaría Pérez & <Hijos>'
+    assert raiz.findtext('detalles/detalle/descripcion') == 'Café «0» &\nAzúcar\n'
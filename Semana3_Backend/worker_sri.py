@@ -0,0 +1,44 @@
+"""
+Worker de la cola de autorización SRI
+Procesa cola_sri fuera de los procesos web (usar con SRI_WORKER=False)
+
+Uso:
+    python worker_sri.py
+    python worker_sri.py --una-vez   # Procesar lo vencido y salir
+"""
+import time
+import argparse
+from app import create_app
+from models.base import db
+from services.sri_service import get_cola_sri
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker de la cola SRI')
+    parser.add_argument('--una-vez', action='store_true', help='Vaciar lo vencido y terminar')
+    args = parser.parse_args()
+
+    app = create_app()
+    procesador = get_cola_sri()
+
+    print("=" * 70)
+    print(f"📨 Worker SRI iniciado (cliente: {app.config.get('SRI_CLIENTE')})")
+    print("=" * 70)
+
+    with app.app_context():
+        try:
+            while True:
+                procesados = procesador.procesar_pendientes()
+                if procesados:
+                    print(f"✅ {procesados} facturas procesadas")
+                    continue
+                db.session.remove()
+                if args.una_vez:
+                    break
+                time.sleep(procesador.intervalo)
+        except KeyboardInterrupt:
+            print("\n👋 Worker SRI detenido")
+
+
+if __name__ == '__main__':
+    main()
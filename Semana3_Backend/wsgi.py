@@ -0,0 +1,14 @@
+"""
+Punto de Entrada WSGI para Producción
+La app se crea y precarga al importar el módulo: con preload_app de gunicorn
+eso ocurre una sola vez en el maestro y los workers la heredan lista.
+
+Uso:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import create_app
+from services.arranque import precargar
+
+
+app = create_app()
+precargar(app)
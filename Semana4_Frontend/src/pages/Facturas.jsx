@@ -9,6 +9,7 @@ export default function Facturas() {
   const [showModal, setShowModal] = useState(false);
   const [showDetailModal, setShowDetailModal] = useState(false);
   const [selectedFactura, setSelectedFactura] = useState(null);
+  const [qrUrl, setQrUrl] = useState(null);
   const [formData, setFormData] = useState({
     cliente_id: '',
     items: [{ codigo: '', nombre: '', cantidad: 1, precio_unitario: 0, iva_porcentaje: 15 }],
@@ -24,7 +25,7 @@ export default function Facturas() {
   const loadFacturas = async () => {
     try {
       setLoading(true);
-      const response = await api.get('/facturas?per_page=100');
+      const response = await api.get('/facturas?per_page=100&fields=id,numero_factura,fecha_emision,total,estado_sri,cliente');
       setFacturas(response.data.data?.facturas || response.data.facturas || []);
     } catch (error) {
       console.error('Error cargando facturas:', error);
@@ -128,12 +129,29 @@ export default function Facturas() {
       const response = await api.get(`/facturas/${factura.id}`);
       setSelectedFactura(response.data);
       setShowDetailModal(true);
+      cargarQR(factura.id);
     } catch (error) {
       console.error('Error cargando detalle:', error);
       alert('Error al cargar detalle de factura');
     }
   };
 
+  // El QR se genera bajo demanda en el backend (PNG con ETag, cacheable)
+  const cargarQR = async (facturaId) => {
+    try {
+      const response = await api.get(`/facturas/${facturaId}/qr?formato=png`, {
+        responseType: 'blob'
+      });
+      setQrUrl((anterior) => {
+        if (anterior) window.URL.revokeObjectURL(anterior);
+        return window.URL.createObjectURL(response.data);
+      });
+    } catch (error) {
+      console.error('Error cargando QR:', error);
+      setQrUrl(null);
+    }
+  };
+
   const descargarXML = async (facturaId) => {
     try {
       const response = await api.get(`/facturas/${facturaId}/xml`, {
@@ -476,9 +494,9 @@ export default function Facturas() {
                 {/* QR Code */}
                 <div className="flex flex-col items-center">
                   <p className="text-sm text-gray-500 mb-3">Código QR de Verificación</p>
-                  {selectedFactura.qr_image && (
+                  {qrUrl && (
                     <img
-                      src={selectedFactura.qr_image}
+                      src={qrUrl}
                       alt="QR Factura"
                       className="w-64 h-64 border-2 border-gray-300 rounded-lg"
                     />
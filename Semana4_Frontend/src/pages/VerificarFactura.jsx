@@ -1,8 +1,10 @@
 import { useState, useEffect } from 'react';
-import { useParams, useNavigate } from 'react-router-dom';
+import { useParams, useNavigate, useSearchParams } from 'react-router-dom';
 
 export default function VerificarFactura() {
   const { hash } = useParams();
+  const [searchParams] = useSearchParams();
+  const token = searchParams.get('t');
   const navigate = useNavigate();
   const [verificacion, setVerificacion] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -40,12 +42,37 @@ export default function VerificarFactura() {
     }
   };
 
-  // Verificar automáticamente si viene hash en la URL
+  // Token firmado del QR: se valida con la clave pública, sin consultar la BD
+  const verificarToken = async (tokenQR) => {
+    try {
+      setLoading(true);
+      setError('');
+      setVerificacion(null);
+
+      const response = await fetch(`http://localhost:5000/api/v1/facturas/verificar-token/${tokenQR}`);
+      const data = await response.json();
+
+      // Sin clave conocida se recurre a la verificación completa por hash
+      if (data.status === 'CLAVE_DESCONOCIDA' && hash) {
+        return verificarFactura(hash);
+      }
+      setVerificacion(data);
+    } catch (err) {
+      console.error('Error verificando token:', err);
+      setError('Error al verificar factura. Por favor, intente nuevamente.');
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // Verificar automáticamente si viene hash (o token) en la URL
   useEffect(() => {
-    if (hash) {
+    if (token) {
+      verificarToken(token);
+    } else if (hash) {
       verificarFactura(hash);
     }
-  }, [hash]);
+  }, [hash, token]);
 
   const handleSubmit = (e) => {
     e.preventDefault();
@@ -68,7 +95,7 @@ export default function VerificarFactura() {
                 Verificación de Factura Electrónica
               </h1>
               <p className="text-gray-600 mt-1">
-                Sistema de verificación pública con firma digital RSA-2048
+                Sistema de verificación pública con firma digital (RSA, ECDSA o Ed25519)
               </p>
             </div>
           </div>
@@ -161,6 +188,7 @@ export default function VerificarFactura() {
                       </p>
                     </div>
 
+                    {verificacion.factura.cliente && (
                     <div className="border-b pb-3">
                       <p className="text-sm text-gray-500 mb-1">Cliente</p>
                       <p className="text-lg font-medium text-gray-900">
@@ -170,6 +198,7 @@ export default function VerificarFactura() {
                         CI/RUC: {verificacion.factura.identificacion}
                       </p>
                     </div>
+                    )}
 
                     <div className="border-b pb-3">
                       <p className="text-sm text-gray-500 mb-1">Fecha de Emisión</p>
@@ -188,6 +217,17 @@ export default function VerificarFactura() {
 
                   {/* Columna derecha */}
                   <div className="space-y-4">
+                    {verificacion.factura.key_id ? (
+                    <div className="border-b pb-3">
+                      <p className="text-sm text-gray-500 mb-1">Clave del Emisor (Ed25519)</p>
+                      <p className="text-sm font-mono text-gray-700 break-all">
+                        {verificacion.factura.key_id}
+                      </p>
+                      <p className="text-xs text-gray-500 mt-1">
+                        Datos firmados en el QR. El estado SRI se consulta verificando por hash.
+                      </p>
+                    </div>
+                    ) : (<>
                     <div className="border-b pb-3">
                       <p className="text-sm text-gray-500 mb-1">Estado SRI</p>
                       <span className="inline-block px-3 py-1 bg-green-100 text-green-800 rounded-full font-medium">
@@ -208,6 +248,7 @@ export default function VerificarFactura() {
                         {verificacion.factura.fecha_autorizacion}
                       </p>
                     </div>
+                    </>)}
 
                     <div className="bg-blue-50 rounded-lg p-4">
                       <div className="flex items-start gap-3">
@@ -215,7 +256,7 @@ export default function VerificarFactura() {
                         <div>
                           <p className="font-medium text-blue-900">Firma Digital Válida</p>
                           <p className="text-sm text-blue-700">
-                            La firma RSA-2048 ha sido verificada correctamente
+                            La firma {verificacion.factura.algoritmo_firma || 'RSA-2048'} ha sido verificada correctamente
                           </p>
                         </div>
                       </div>
@@ -235,7 +276,7 @@ export default function VerificarFactura() {
                         <p className="font-mono text-xs break-all text-gray-700">{hash}</p>
                       </div>
                       <div className="text-gray-600 mt-3">
-                        <p>✓ Algoritmo de firma: RSA-2048 con PSS padding</p>
+                        <p>✓ Algoritmo de firma: {verificacion.factura.algoritmo_firma || 'RSA-2048 PSS SHA-256'}</p>
                         <p>✓ Función hash: SHA-256</p>
                         <p>✓ Integridad del documento: Verificada</p>
                         <p>✓ Autenticidad del emisor: Confirmada</p>
@@ -10,6 +10,10 @@
 
 -- Eliminar tablas si existen (para recrear schema limpio)
 DROP TABLE IF EXISTS audit_log CASCADE;
+DROP TABLE IF EXISTS cola_sri CASCADE;
+DROP TABLE IF EXISTS documento_xml CASCADE;
+DROP TABLE IF EXISTS factura_resumen_diario CASCADE;
+DROP TABLE IF EXISTS secuencial_factura CASCADE;
 DROP TABLE IF EXISTS factura CASCADE;
 DROP TABLE IF EXISTS cliente CASCADE;
 DROP TABLE IF EXISTS usuario CASCADE;
@@ -117,10 +121,11 @@ CREATE TABLE factura (
     xml_firmado TEXT,
     hash_sha256 VARCHAR(64) NOT NULL UNIQUE,
     firma_digital TEXT NOT NULL,
+    prueba_merkle TEXT,
+    key_id VARCHAR(16),
     num_autorizacion VARCHAR(49),
     fecha_autorizacion TIMESTAMP,
-    estado_sri VARCHAR(20) DEFAULT 'AUTORIZADO',
-    qr_image TEXT,
+    estado_sri VARCHAR(20) DEFAULT 'PENDIENTE',
     qr_data TEXT,
     observaciones TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -133,12 +138,13 @@ CREATE TABLE factura (
     
     CONSTRAINT chk_factura_numero_factura CHECK (numero_factura ~ '^[0-9]{3}-[0-9]{3}-[0-9]{9}$'),
     CONSTRAINT chk_factura_total_positivo CHECK (total >= 0),
-    CONSTRAINT chk_factura_estado CHECK (estado_sri IN ('AUTORIZADO', 'RECHAZADO')),
+    CONSTRAINT chk_factura_estado CHECK (estado_sri IN ('PENDIENTE', 'AUTORIZADO', 'RECHAZADO')),
     CONSTRAINT chk_factura_hash_sha256 CHECK (LENGTH(hash_sha256) = 64)
 );
 
 CREATE INDEX idx_factura_numero ON factura(numero_factura);
 CREATE INDEX idx_factura_fecha ON factura(fecha_emision);
+CREATE INDEX idx_factura_fecha_id ON factura(fecha_emision, id);
 CREATE INDEX idx_factura_cliente ON factura(cliente_id);
 CREATE INDEX idx_factura_usuario ON factura(usuario_id);
 CREATE INDEX idx_factura_estado ON factura(estado_sri);
@@ -148,10 +154,97 @@ CREATE INDEX idx_factura_num_autorizacion ON factura(num_autorizacion);
 COMMENT ON TABLE factura IS 'Facturas electrónicas con firma digital RSA-2048 y hash SHA-256';
 COMMENT ON COLUMN factura.items IS 'Array JSON con productos: [{codigo, nombre, cantidad, precio_unitario, iva_porcentaje}]';
 COMMENT ON COLUMN factura.hash_sha256 IS 'Hash SHA-256 del XML para verificar integridad (64 caracteres hex)';
-COMMENT ON COLUMN factura.firma_digital IS 'Firma RSA-2048 con PSS padding del hash (base64)';
+COMMENT ON COLUMN factura.xml_firmado IS 'Solo facturas antiguas: el XML firmado se guarda comprimido en documento_xml (migrar con migrar_xml.py)';
+COMMENT ON COLUMN factura.firma_digital IS 'Firma (RSA-2048 PSS, ECDSA P-256 o Ed25519 según key_id) del hash, o de la raíz Merkle si hay prueba_merkle (base64)';
+COMMENT ON COLUMN factura.prueba_merkle IS 'Modo FIRMA_MERKLE: prueba de inclusión <raiz>:<hermanos> del hash en la raíz firmada';
+COMMENT ON COLUMN factura.key_id IS 'Clave que firmó la factura (llavero claves_firma en configuracion); NULL = clave RSA original';
 COMMENT ON COLUMN factura.num_autorizacion IS 'Número de autorización SRI simulado (49 dígitos)';
-COMMENT ON COLUMN factura.qr_image IS 'Código QR en formato data URI (imagen PNG en base64)';
-COMMENT ON COLUMN factura.qr_data IS 'Datos del QR: URL de verificación con hash';
+COMMENT ON COLUMN factura.qr_data IS 'Datos del QR: URL de verificación con hash (la imagen se genera en GET /facturas/:id/qr)';
+
+-- ============================================================================
+-- TABLA: DOCUMENTO_XML
+-- XML firmados comprimidos, direccionados por el hash de la factura
+-- ============================================================================
+CREATE TABLE documento_xml (
+    hash_sha256 VARCHAR(64) PRIMARY KEY,
+    compresion VARCHAR(10) NOT NULL,
+    tamano INTEGER NOT NULL,
+    contenido BYTEA NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    CONSTRAINT chk_documento_xml_compresion CHECK (compresion IN ('gzip', 'zstd')),
+    CONSTRAINT chk_documento_xml_hash CHECK (LENGTH(hash_sha256) = 64)
+);
+
+-- El contenido ya viene comprimido: evitar que TOAST intente comprimirlo otra vez
+ALTER TABLE documento_xml ALTER COLUMN contenido SET STORAGE EXTERNAL;
+
+COMMENT ON TABLE documento_xml IS 'XML firmados comprimidos (gzip/zstd) fuera de la tabla factura; clave = factura.hash_sha256';
+COMMENT ON COLUMN documento_xml.tamano IS 'Bytes del XML sin comprimir (Content-Length de la descarga)';
+
+-- ============================================================================
+-- TABLA: SECUENCIAL_FACTURA
+-- Contador de numeración por establecimiento y punto de emisión
+-- ============================================================================
+CREATE TABLE secuencial_factura (
+    id SERIAL PRIMARY KEY,
+    establecimiento VARCHAR(3) NOT NULL,
+    punto_emision VARCHAR(3) NOT NULL,
+    ultimo BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    CONSTRAINT uq_secuencial_factura UNIQUE (establecimiento, punto_emision)
+);
+
+COMMENT ON TABLE secuencial_factura IS 'Último secuencial asignado por establecimiento y punto de emisión (incremento atómico con UPDATE ... RETURNING)';
+
+-- ============================================================================
+-- TABLA: COLA_SRI
+-- Facturas pendientes de autorización, procesadas por el worker SRI
+-- ============================================================================
+CREATE TABLE cola_sri (
+    id SERIAL PRIMARY KEY,
+    factura_id INTEGER NOT NULL UNIQUE,
+    estado VARCHAR(20) NOT NULL DEFAULT 'PENDIENTE',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    proximo_intento TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    bloqueado_hasta TIMESTAMP,
+    ultimo_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    
+    CONSTRAINT fk_cola_sri_factura FOREIGN KEY (factura_id) 
+        REFERENCES factura(id) ON DELETE CASCADE,
+    CONSTRAINT chk_cola_sri_estado CHECK (estado IN ('PENDIENTE', 'EN_PROCESO', 'COMPLETADO', 'FALLIDO'))
+);
+
+CREATE INDEX idx_cola_sri_estado_proximo ON cola_sri(estado, proximo_intento);
+
+COMMENT ON TABLE cola_sri IS 'Cola de autorización SRI con reintentos y backoff (SELECT ... FOR UPDATE SKIP LOCKED)';
+
+-- ============================================================================
+-- TABLA: FACTURA_RESUMEN_DIARIO
+-- Totales diarios por estado SRI, usuario y cliente (mantenidos al crear facturas)
+-- ============================================================================
+CREATE TABLE factura_resumen_diario (
+    id SERIAL PRIMARY KEY,
+    fecha DATE NOT NULL,
+    estado_sri VARCHAR(20) NOT NULL,
+    usuario_id INTEGER NOT NULL,
+    cliente_id INTEGER NOT NULL,
+    cantidad INTEGER NOT NULL DEFAULT 0,
+    total NUMERIC(14, 2) NOT NULL DEFAULT 0.00,
+    
+    CONSTRAINT fk_resumen_usuario FOREIGN KEY (usuario_id) 
+        REFERENCES usuario(id) ON DELETE RESTRICT,
+    CONSTRAINT fk_resumen_cliente FOREIGN KEY (cliente_id) 
+        REFERENCES cliente(id) ON DELETE RESTRICT,
+    CONSTRAINT uq_factura_resumen_diario UNIQUE (fecha, estado_sri, usuario_id, cliente_id)
+);
+
+CREATE INDEX idx_resumen_fecha ON factura_resumen_diario(fecha);
+
+COMMENT ON TABLE factura_resumen_diario IS 'Resumen diario de facturación para /facturas/estadisticas (recalcular con reconstruir_resumen.py)';
 
 -- ============================================================================
 -- TABLA: AUDIT_LOG
@@ -244,5 +337,5 @@ INSERT INTO configuracion (clave, valor, tipo_dato, descripcion) VALUES
 -- ============================================================================
 SELECT 
     'Base de datos richard_db creada exitosamente' AS mensaje,
-    'Tablas: empresa, usuario, cliente, factura, audit_log, configuracion' AS tablas_creadas,
+    'Tablas: empresa, usuario, cliente, factura, secuencial_factura, documento_xml, cola_sri, factura_resumen_diario, audit_log, configuracion' AS tablas_creadas,
     'Usuario admin: admin / admin123!' AS acceso_inicial;